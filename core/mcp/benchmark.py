@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the Manager AI MCP server.
+
+Generates synthetic workspaces (tasks shaped like examples/sample_task.md,
+Knowledge/ notes and a BACKLOG.md), then calls every tool handler directly
+through server.call_tool, without an MCP client. Each corpus size runs in
+its own process so module-level state and peak RSS never carry over.
+
+    python benchmark.py --sizes 1000,10000 --output bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import resource
+import subprocess
+import tempfile
+import shutil
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+CATEGORIES = ['technical', 'outreach', 'research', 'writing', 'content', 'admin', 'marketing', 'other']
+PRIORITIES = ['P0', 'P1', 'P2', 'P3']
+STATUSES = ['n', 'n', 'n', 's', 's', 'b', 'd']
+VERBS = ['Review', 'Fix', 'Write', 'Email', 'Research', 'Deploy', 'Plan', 'Update', 'Draft', 'Schedule']
+NOUNS = ['financial reports', 'login bug', 'blog post', 'competitor pricing', 'API gateway', 'team offsite',
+         'onboarding docs', 'investor update', 'billing service', 'hiring plan', 'launch checklist',
+         'customer interviews', 'database migration', 'quarterly budget', 'design review', 'partner contract']
+NAMES = ['Sarah', 'John', 'Priya', 'Marco', 'Lena', 'the CFO', 'marketing', 'the board']
+TAGS = ['finance', 'quarterly', 'reporting', 'backend', 'growth', 'hiring', 'ops', 'customers', 'security']
+LOG_LINES = ['Started initial review', 'Met with {name} to clarify scope', 'Found discrepancy, investigating',
+             'Blocked on input from {name}', 'Drafted first version', 'Shared with {name} for feedback',
+             'Addressed review comments', 'Updated estimates after sync with {name}']
+
+def task_title(rng: random.Random, i: int) -> str:
+    return f"{rng.choice(VERBS)} {rng.choice(NOUNS)} {i}"
+
+def render_task(rng: random.Random, i: int, knowledge_notes: List[str], log_entries: int) -> str:
+    """A task file in the shape of examples/sample_task.md with a long progress log"""
+    created = date(2024, 1, 1) + timedelta(days=rng.randrange(600))
+    lines = [
+        '---',
+        f'title: {task_title(rng, i)}',
+        f'category: {rng.choice(CATEGORIES)}',
+        f'priority: {rng.choice(PRIORITIES)}',
+        f'status: {rng.choice(STATUSES)}',
+        f'estimated_time: {rng.choice([15, 30, 60, 90, 120, 240])}',
+        f'created_date: {created}',
+    ]
+    if rng.random() < 0.6:
+        lines.append(f'due_date: {created + timedelta(days=rng.randrange(1, 60))}')
+    lines.append(f"tags: [{', '.join(rng.sample(TAGS, 3))}]")
+    lines += ['---', '', f'# {task_title(rng, i)}', '', '## Context',
+              f'Need to {rng.choice(VERBS).lower()} the {rng.choice(NOUNS)} before the next '
+              f'meeting with {rng.choice(NAMES)}.', '', '## Next Actions']
+    lines += [f"- [{'x' if rng.random() < 0.4 else ' '}] {rng.choice(VERBS)} {rng.choice(NOUNS)}"
+              for _ in range(rng.randint(3, 7))]
+    lines += ['', '## Notes', f'- Watch for {rng.choice(NOUNS)}']
+    if knowledge_notes:
+        lines.append(f'- Reference: [[Knowledge/{rng.choice(knowledge_notes)}]]')
+    lines += ['', '## Progress Log']
+    day = created
+    for _ in range(log_entries):
+        day += timedelta(days=rng.randint(0, 3))
+        lines.append(f"- {day}: {rng.choice(LOG_LINES).format(name=rng.choice(NAMES))}")
+    return '\n'.join(lines) + '\n'
+
+def generate_corpus(base_dir: Path, size: int, backlog_items: int, log_entries: int, seed: int) -> None:
+    """Write size tasks, size // 10 knowledge notes and a backlog under base_dir"""
+    rng = random.Random(seed)
+    tasks_dir = base_dir / 'Tasks'
+    knowledge_dir = base_dir / 'Knowledge'
+    tasks_dir.mkdir(parents=True, exist_ok=True)
+    knowledge_dir.mkdir(parents=True, exist_ok=True)
+
+    notes = [f"{rng.choice(NOUNS).replace(' ', '-')}-{i}.md" for i in range(max(1, size // 10))]
+    for i, note in enumerate(notes):
+        links = ' '.join(f'[[Knowledge/{rng.choice(notes)}]]' for _ in range(2))
+        (knowledge_dir / note).write_text(
+            f"# {note[:-3].replace('-', ' ').title()}\n\n"
+            f"Guidelines for {rng.choice(NOUNS)} owned by {rng.choice(NAMES)}.\n\nRelated: {links}\n"
+        )
+    for i in range(size):
+        (tasks_dir / f'task-{i:06d}.md').write_text(render_task(rng, i, notes, log_entries))
+
+    backlog = []
+    for i in range(backlog_items):
+        # Roughly a third are near-duplicates of existing task titles
+        if size and rng.random() < 0.3:
+            backlog.append(f"- {task_title(rng, rng.randrange(size))}")
+        else:
+            backlog.append(f"- {rng.choice(VERBS)} {rng.choice(NOUNS)} with {rng.choice(NAMES)}")
+        if rng.random() < 0.2:
+            backlog.append(f"  - ask {rng.choice(NAMES)} first")
+    (base_dir / 'BACKLOG.md').write_text('\n'.join(backlog) + '\n')
+
+def tool_scenarios(size: int, backlog_items: List[str]) -> List[tuple]:
+    """(tool, arguments-factory) pairs; factories get the iteration number.
+
+    Read-only tools come first and mutating ones last, so every measurement
+    sees the same corpus. Destructive tools are pointed at nothing or run
+    against data the benchmark created itself.
+    """
+    sample = 'task-000000.md'
+    return [
+        ('list_tasks', lambda i: {}),
+        ('list_tasks', lambda i: {'priority': 'P0,P1', 'sort_by': 'due_date', 'limit': 50, 'compact': True}),
+        ('get_task_summary', lambda i: {}),
+        ('check_priority_limits', lambda i: {}),
+        ('get_system_status', lambda i: {}),
+        ('process_backlog', lambda i: {}),
+        ('process_backlog', lambda i: {'incremental': True}),
+        ('search', lambda i: {'query': 'financial reports'}),
+        ('search', lambda i: {'query': '"blocked on input" category:technical'}),
+        ('get_backlinks', lambda i: {'path': sample}),
+        ('get_related', lambda i: {'path': sample, 'depth': 2}),
+        ('find_broken_links', lambda i: {}),
+        ('search_archive', lambda i: {'query': 'report'}),
+        ('classify_items', lambda i: {}),
+        ('classify_items', lambda i: {'items': backlog_items}),
+        ('process_backlog_with_dedup', lambda i: {'items': backlog_items[:50]}),
+        ('create_task', lambda i: {'title': f'Benchmark task {i}', 'category': 'technical'}),
+        ('create_tasks', lambda i: {'tasks': [{'title': f'Benchmark batch {i}-{j}'} for j in range(20)]}),
+        ('update_task_status', lambda i: {'task_file': sample, 'status': 'sn'[i % 2]}),
+        ('bulk_update_tasks', lambda i: {'filter': {'category': 'admin', 'priority': 'P3'},
+                                         'updates': {'status': 'sb'[i % 2]}}),
+        ('acknowledge_backlog', lambda i: {'offset': 0}),
+        ('prune_completed_tasks', lambda i: {'days': 365 * 100, 'mode': 'archive'}),
+        ('restore_task', lambda i: {'task_file': 'no-such-task.md'}),
+        ('clear_backlog', lambda i: {}),
+    ]
+
+class IOCounter:
+    """Counts files opened for reading via the 'open' audit event"""
+
+    def __init__(self):
+        self.opened = 0
+        self.active = False
+        sys.addaudithook(self._hook)
+
+    def _hook(self, event: str, args: tuple) -> None:
+        if event == 'open' and self.active:
+            path, mode, flags = args
+            if isinstance(path, (str, bytes, os.PathLike)):
+                reading = ('r' in mode or '+' in mode) if isinstance(mode, str) else (flags & 3) != os.O_WRONLY
+                if reading:
+                    self.opened += 1
+
+def read_bytes_counter() -> Optional[int]:
+    """Bytes read by this process so far (Linux only)"""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size right now (Linux only)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def run_worker(base_dir: Path, size: int, iterations: int) -> Dict[str, Any]:
+    """Benchmark every tool against an already generated workspace"""
+    os.environ['MANAGER_AI_BASE_DIR'] = str(base_dir)
+    io_counter = IOCounter()
+
+    started = time.perf_counter()
+    import logging
+    logging.disable(logging.INFO)
+    import server
+    import_ms = (time.perf_counter() - started) * 1000
+
+    backlog_items = [line[2:] for line in (base_dir / 'BACKLOG.md').read_text().splitlines()
+                     if line.startswith('- ')]
+    listed = {tool.name for tool in asyncio.run(server.handle_list_tools())}
+    results: Dict[str, Any] = {}
+
+    # Resident memory added by loading the task index alone
+    rss_before = current_rss_mb()
+    server.call_tool('get_task_summary', {})
+    rss_after = current_rss_mb()
+    index_rss_mb = round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None
+
+    for tool, make_args in tool_scenarios(size, backlog_items):
+        label = tool
+        suffix = 2
+        while label in results:
+            label = f"{tool}#{suffix}"
+            suffix += 1
+        latencies, opened, read = [], [], []
+        for i in range(iterations):
+            args = make_args(i)
+            bytes_before = read_bytes_counter()
+            io_counter.opened, io_counter.active = 0, True
+            start = time.perf_counter()
+            response = server.call_tool(tool, args)
+            elapsed = (time.perf_counter() - start) * 1000
+            io_counter.active = False
+            bytes_after = read_bytes_counter()
+            latencies.append(elapsed)
+            opened.append(io_counter.opened)
+            if bytes_before is not None and bytes_after is not None:
+                read.append(bytes_after - bytes_before)
+            if i == 0 and response and response[0].text.startswith('Unknown tool'):
+                break
+        # The first call includes lazy index builds, so it is reported separately
+        steady = latencies[1:] or latencies
+        results[label] = {
+            'arguments': make_args(0),
+            'calls': len(latencies),
+            'first_ms': round(latencies[0], 3),
+            'p50_ms': round(percentile(steady, 50), 3),
+            'p95_ms': round(percentile(steady, 95), 3),
+            'max_ms': round(max(steady), 3),
+            'files_opened_first': opened[0],
+            'files_opened_per_call': round(sum(opened[1:] or opened) / len(opened[1:] or opened), 1),
+            'bytes_read_per_call': round(sum(read[1:] or read) / len(read[1:] or read)) if read else None,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+    covered = {tool for tool, _ in tool_scenarios(size, backlog_items)}
+    return {
+        'import_ms': round(import_ms, 3),
+        'index_rss_mb': index_rss_mb,
+        'peak_rss_mb': peak_rss_mb(),
+        'tools': results,
+        'tools_without_scenario': sorted(listed - covered),
+    }
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000', help='Comma-separated task counts (e.g. 1000,10000,100000)')
+    parser.add_argument('--backlog-items', type=int, default=200, help='Items in the generated BACKLOG.md')
+    parser.add_argument('--log-entries', type=int, default=40, help='Progress log lines per task')
+    parser.add_argument('--iterations', type=int, default=20, help='Calls per tool scenario')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='benchmark-results.json', help='JSON file to write results to')
+    parser.add_argument('--workdir', help='Keep generated corpora here instead of a temp directory')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        # Child process: benchmark one corpus and print the results as JSON
+        size = int(args.sizes)
+        print(json.dumps(run_worker(Path(args.worker), size, args.iterations)))
+        return
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix='manager-ai-bench-'))
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('worker', 'output', 'workdir')},
+        'corpora': {},
+    }
+    try:
+        for size in [int(s) for s in args.sizes.split(',') if s.strip()]:
+            base_dir = workdir / f'corpus-{size}'
+            if base_dir.exists():
+                shutil.rmtree(base_dir)
+            start = time.perf_counter()
+            generate_corpus(base_dir, size, args.backlog_items, args.log_entries, args.seed)
+            generate_s = time.perf_counter() - start
+            print(f"Generated {size} tasks in {generate_s:.1f}s; benchmarking...", file=sys.stderr)
+
+            worker = subprocess.run(
+                [sys.executable, __file__, '--worker', str(base_dir), '--sizes', str(size),
+                 '--iterations', str(args.iterations)],
+                capture_output=True, text=True,
+            )
+            if worker.returncode != 0:
+                print(worker.stderr, file=sys.stderr)
+                raise SystemExit(f"Benchmark worker failed for size {size}")
+            result = json.loads(worker.stdout.strip().splitlines()[-1])
+            result['generate_s'] = round(generate_s, 3)
+            report['corpora'][str(size)] = result
+            print(f"  index RSS {result['index_rss_mb']} MB, peak RSS {result['peak_rss_mb']} MB", file=sys.stderr)
+
+            for tool, stats in result['tools'].items():
+                print(f"  {tool:32} p50 {stats['p50_ms']:9.2f} ms  p95 {stats['p95_ms']:9.2f} ms  "
+                      f"files/call {stats['files_opened_per_call']:8.1f}", file=sys.stderr)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -4,19 +4,32 @@ MCP Server for Manager AI - TODO System Management
 """
 
 import os
+import sys
 import json
+import math
+import mmap
+import pickle
+import select
+import sqlite3
+import struct
 import logging
+import base64
+import hashlib
+import threading
+import time
+import asyncio
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, ExitStack
 from pathlib import Path
 from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
-from collections import Counter
+from datetime import date, datetime, timedelta
+from collections import Counter, deque
+from collections.abc import Mapping
 
 import yaml
 import re
-from difflib import SequenceMatcher
-from mcp.server import Server, NotificationOptions
-from mcp.server.models import InitializationOptions
-import mcp.server.stdio
+from mcp.server import Server
 import mcp.types as types
 
 # Set up logging
@@ -26,109 +39,3066 @@ logger = logging.getLogger(__name__)
 # Configuration - use environment variable or current directory
 BASE_DIR = Path(os.environ.get('MANAGER_AI_BASE_DIR', Path.cwd()))
 TASKS_DIR = BASE_DIR / 'Tasks'
+CACHE_DIR = BASE_DIR / '.mcp_cache'
+ARCHIVE_DIR = BASE_DIR / 'Archive'
+KNOWLEDGE_DIR = BASE_DIR / 'Knowledge'
 
-# Ensure directories exist
-TASKS_DIR.mkdir(exist_ok=True, parents=True)
+# Duplicate detection configuration
+DEDUP_CONFIG = {
+    "similarity_threshold": 0.6,  # How similar before flagging as potential duplicate
+    "check_categories": True,     # Same category increases similarity score
+}
+
+# Parallel ingest: refreshes touching at least PARALLEL_INGEST_MIN files use
+# reader threads, plus a parse process pool if MANAGER_AI_INGEST_PROCESSES > 1
+PARALLEL_INGEST_MIN = 64
+INGEST_READ_WORKERS = int(os.environ.get('MANAGER_AI_INGEST_THREADS', '8'))
+INGEST_PROCESSES = int(os.environ.get('MANAGER_AI_INGEST_PROCESSES', '0'))
+INGEST_QUEUE_SIZE = 1024
+INGEST_PARSE_BATCH = 256
+
+# Batch dedup: matrices larger than this are split across a process pool
+BATCH_MATRIX_BUDGET = 256 * 1024 * 1024  # bytes
+BATCH_BYTES_PER_CELL = 48                # float64 working arrays per (item, task) pair
+BATCH_MIN_ITEMS = 8                      # smaller batches use the per-item index
+
+# Use the libyaml-backed loader when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Body characters returned per task by list_tasks
+BODY_PREVIEW_CHARS = 500
+
+# Format of the index snapshot (.mcp_cache/index.snapshot) written on shutdown
+SNAPSHOT_VERSION = 3
+
+# Tasks/ layout marker (see TaskLayout); hex digits of the shard directory names
+TASK_LAYOUT_FILE = '.layout.json'
+SHARD_WIDTH = 2
+
+# Upper bounds (ms) of the per-tool latency histogram buckets; the last is open-ended
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+class ServerMetrics:
+    """Process-wide counters, cache hit rates and per-tool latency histograms.
+
+    Cheap enough to stay on in production; read via get_server_metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self._counters: Counter = Counter()
+            self._caches: Dict[str, List[int]] = {}
+            self._tools: Dict[str, dict] = {}
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def cache(self, name: str, hits: int = 0, misses: int = 0) -> None:
+        with self._lock:
+            entry = self._caches.setdefault(name, [0, 0])
+            entry[0] += hits
+            entry[1] += misses
+
+    def observe(self, tool: str, elapsed_ms: float, error: bool = False) -> None:
+        with self._lock:
+            stats = self._tools.get(tool)
+            if stats is None:
+                stats = self._tools[tool] = {
+                    'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound),
+                          len(LATENCY_BUCKETS_MS))
+            stats['buckets'][bucket] += 1
+
+    @staticmethod
+    def _percentile(buckets: List[int], calls: int, pct: float, max_ms: float) -> float:
+        """Upper bound of the bucket holding the pct-th percentile call"""
+        target = pct / 100 * calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, buckets):
+            seen += count
+            if seen >= target:
+                return min(bound, max_ms)
+        return max_ms
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            tools = {}
+            for tool, stats in sorted(self._tools.items()):
+                calls = stats['calls']
+                labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+                tools[tool] = {
+                    'calls': calls,
+                    'errors': stats['errors'],
+                    'mean_ms': round(stats['total_ms'] / calls, 3),
+                    'p50_ms': self._percentile(stats['buckets'], calls, 50, round(stats['max_ms'], 3)),
+                    'p95_ms': self._percentile(stats['buckets'], calls, 95, round(stats['max_ms'], 3)),
+                    'max_ms': round(stats['max_ms'], 3),
+                    'histogram': {label: n for label, n in zip(labels, stats['buckets']) if n},
+                }
+            caches = {
+                name: {'hits': hits, 'misses': misses,
+                       'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None}
+                for name, (hits, misses) in sorted(self._caches.items())
+            }
+            return {
+                'uptime_s': round(time.time() - self.started, 1),
+                'tools': tools,
+                'counters': dict(sorted(self._counters.items())),
+                'caches': caches,
+            }
+
+METRICS = ServerMetrics()
+
+def read_frontmatter_block(filepath: Path) -> tuple[Optional[bytes], int]:
+    """Read the raw YAML frontmatter block of a markdown file.
+
+    Streams lines until the closing '---' so long bodies are never read.
+    Returns (block, body_offset) where body_offset is the byte position just
+    after the closing marker; (None, 0) if there is no frontmatter.
+    """
+    with open(filepath, 'rb') as f:
+        first = f.readline()
+        if not first.startswith(b'---'):
+            return None, 0
+        offset = len(first)
+        lines = [first[3:]]
+        for line in f:
+            if line.rstrip() == b'---':
+                offset += 3
+                break
+            lines.append(line)
+            offset += len(line)
+    block = b''.join(lines)
+    METRICS.count('files_read')
+    METRICS.count('frontmatter_bytes_parsed', len(block))
+    return block, offset
+
+def _load_frontmatter(block: bytes) -> dict:
+    """Parse a frontmatter block, raising on anything but a mapping"""
+    metadata = yaml.load(block.decode('utf-8'), Loader=YAML_LOADER)
+    if metadata is not None and not isinstance(metadata, dict):
+        raise ValueError("frontmatter is not a mapping")
+    return metadata or {}
+
+def read_frontmatter(filepath: Path) -> tuple[dict, int]:
+    """Read and parse only the frontmatter of a markdown file.
+
+    Returns (metadata, body_offset); ({}, 0) if there is no usable frontmatter.
+    """
+    block, offset = read_frontmatter_block(filepath)
+    if block is None:
+        return {}, 0
+    try:
+        return _load_frontmatter(block), offset
+    except Exception as e:
+        logger.error(f"Error parsing YAML in {filepath}: {e}")
+        return {}, 0
+
+def read_body(filepath: Path, offset: int, limit: int = BODY_PREVIEW_CHARS) -> str:
+    """Read up to limit characters of a file's body starting at a byte offset"""
+    with open(filepath, 'rb') as f:
+        f.seek(offset)
+        # Enough bytes for limit characters of UTF-8 plus CRLF line endings
+        data = f.read(limit * 5)
+    METRICS.count('files_read')
+    METRICS.count('body_bytes_read', len(data))
+    text = data.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+    return text[:limit]
+
+def calculate_similarity(text1: str, text2: str) -> float:
+    """Calculate similarity between two strings (0-1 score)"""
+    from difflib import SequenceMatcher
+    return SequenceMatcher(None, text1.lower(), text2.lower()).ratio()
+
+# Common words ignored by extract_keywords
+STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'with', 'from', 'up', 'out'})
+KEYWORD_RE = re.compile(r'\b\w+\b')
+
+def extract_keywords(text: str) -> set:
+    """Extract meaningful keywords from text"""
+    # Remove common words and extract meaningful terms
+    words = KEYWORD_RE.findall(text.lower())
+    return {w for w in words if w not in STOP_WORDS and len(w) > 2}
+
+def find_similar_tasks(item: str, existing_tasks: List[Dict[str, Any]], config: dict = DEDUP_CONFIG) -> List[Dict[str, Any]]:
+    """Find tasks similar to the given item"""
+    similar = []
+    item_keywords = extract_keywords(item)
+    
+    for task in existing_tasks:
+        # Skip completed tasks
+        if task.get('status') == 'd':
+            continue
+            
+        # Calculate title similarity
+        title = task.get('title', '')
+        title_similarity = calculate_similarity(item, title)
+        
+        # Calculate keyword overlap
+        task_keywords = extract_keywords(title)
+        if item_keywords and task_keywords:
+            keyword_overlap = len(item_keywords & task_keywords) / len(item_keywords | task_keywords)
+        else:
+            keyword_overlap = 0
+        
+        # Combined score
+        similarity_score = (title_similarity * 0.7) + (keyword_overlap * 0.3)
+        
+        # Check if it's a potential duplicate
+        if similarity_score >= config['similarity_threshold']:
+            similar.append({
+                'title': title,
+                'filename': task.get('filename', ''),
+                'category': task.get('category', ''),
+                'status': task.get('status', ''),
+                'similarity_score': round(similarity_score, 2)
+            })
+    
+    # Sort by similarity score
+    similar.sort(key=lambda x: x['similarity_score'], reverse=True)
+    return similar[:3]  # Return top 3 matches
+
+def _similarity_ratio_bound(shared_grams: int, len_a: int, len_b: int) -> float:
+    """Upper bound on SequenceMatcher.ratio() from shared character trigrams.
+
+    The matching blocks form a common subsequence of length M. Each
+    unmatched character of a breaks at most 3 of its trigrams and each gap
+    in b at most 2, so shared >= 5M - 2(len_a + len_b + 1).
+    """
+    total = len_a + len_b
+    if total == 0:
+        return 1.0
+    matches = min(len_a, len_b, (shared_grams + 2 * (total + 1)) / 5)
+    return 2.0 * matches / total
+
+def _char_trigrams(text: str) -> Counter:
+    return Counter(text[i:i + 3] for i in range(len(text) - 2))
+
+class DedupIndex:
+    """Inverted index over active task titles for find_similar_tasks.
+
+    Character trigram postings give an upper bound on each task's combined
+    score, so SequenceMatcher only runs on tasks that could still reach the
+    threshold or the top 3. Results are identical to find_similar_tasks over
+    the same tasks in sequence order.
+    """
+
+    def __init__(self):
+        # seq -> (task, title_lower, title_keywords)
+        self._docs: Dict[int, tuple] = {}
+        self._doc_grams: Dict[int, Counter] = {}
+        self._grams: Dict[str, Dict[int, int]] = {}
+        self._keywords: Dict[str, set] = {}
+        self._by_length: Dict[int, set] = {}
+        # Held by readers while scoring; TaskIndex only ever try-acquires it
+        # while holding its own lock, queueing changes when it is busy
+        self.lock = threading.Lock()
+        # Bumped on every change; keys the cached arrays used by batch scoring
+        self._version = 0
+        self._arrays: Optional[dict] = None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __getstate__(self) -> dict:
+        # Sent to worker processes by find_similar_batch; locks don't pickle
+        state = self.__dict__.copy()
+        del state['lock']
+        state['_arrays'] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def add(self, seq: int, task: Dict[str, Any]) -> None:
+        """Index (or re-index) a task; completed tasks are not indexed"""
+        self.remove(seq)
+        if task.get('status') == 'd':
+            return
+        title = task.get('title', '')
+        title = '' if title is None else str(title)
+        title_lower = title.lower()
+        keywords = extract_keywords(title)
+        grams = _char_trigrams(title_lower)
+
+        self._version += 1
+        self._docs[seq] = (task, title_lower, keywords)
+        self._doc_grams[seq] = grams
+        for gram, count in grams.items():
+            self._grams.setdefault(gram, {})[seq] = count
+        for keyword in keywords:
+            self._keywords.setdefault(keyword, set()).add(seq)
+        self._by_length.setdefault(len(title_lower), set()).add(seq)
+
+    def remove(self, seq: int) -> None:
+        doc = self._docs.pop(seq, None)
+        if doc is None:
+            return
+        self._version += 1
+        _task, title_lower, keywords = doc
+        for gram in self._doc_grams.pop(seq):
+            postings = self._grams[gram]
+            del postings[seq]
+            if not postings:
+                del self._grams[gram]
+        for keyword in keywords:
+            postings = self._keywords[keyword]
+            postings.discard(seq)
+            if not postings:
+                del self._keywords[keyword]
+        bucket = self._by_length[len(title_lower)]
+        bucket.discard(seq)
+        if not bucket:
+            del self._by_length[len(title_lower)]
+
+    def find_similar(self, item: str, config: dict = DEDUP_CONFIG) -> List[Dict[str, Any]]:
+        """Indexed equivalent of find_similar_tasks"""
+        threshold = config['similarity_threshold']
+        item_lower = item.lower()
+        scored = self.candidates(item_lower, extract_keywords(item), threshold)
+        scored.sort(key=lambda c: (-c[0], c[1]))
+        return self._format(self._verify(item_lower, scored, threshold))
+
+    def candidates(self, item_lower: str, item_keywords: set, threshold: float) -> List[tuple]:
+        """(score bound, seq, keyword_overlap) for every task that could reach threshold.
+
+        Tasks left out provably score below threshold against item_lower.
+        """
+        item_len = len(item_lower)
+        shared_grams: Dict[int, int] = {}
+        for gram, count in _char_trigrams(item_lower).items():
+            for seq, doc_count in self._grams.get(gram, {}).items():
+                shared_grams[seq] = shared_grams.get(seq, 0) + min(count, doc_count)
+
+        shared_keywords: Dict[int, int] = {}
+        for keyword in item_keywords:
+            for seq in self._keywords.get(keyword, ()):
+                shared_keywords[seq] = shared_keywords.get(seq, 0) + 1
+
+        # Every shared keyword is also a shared trigram, so tasks without a
+        # shared trigram have zero keyword overlap and only need a length check
+        candidates = []
+        for length, seqs in self._by_length.items():
+            bound = _similarity_ratio_bound(0, item_len, length) * 0.7
+            if bound + 1e-9 >= threshold:
+                candidates.extend((bound, seq, 0.0) for seq in seqs if seq not in shared_grams)
+
+        for seq, shared in shared_grams.items():
+            _task, title_lower, keywords = self._docs[seq]
+            common = shared_keywords.get(seq, 0)
+            if item_keywords and keywords:
+                keyword_overlap = common / (len(item_keywords) + len(keywords) - common)
+            else:
+                keyword_overlap = 0
+            bound = _similarity_ratio_bound(shared, item_len, len(title_lower)) * 0.7 + keyword_overlap * 0.3
+            if bound + 1e-9 >= threshold:
+                candidates.append((bound, seq, keyword_overlap))
+        return candidates
+
+    def _verify(self, item_lower: str, scored: List[tuple], threshold: float) -> List[tuple]:
+        """Score (bound, seq, keyword_overlap) candidates in bound order.
+
+        Stops as soon as no remaining bound can displace the current top 3.
+        Returns (rounded_score, seq) pairs.
+        """
+        from difflib import SequenceMatcher
+        similar = []
+        for bound, seq, keyword_overlap in scored:
+            if len(similar) >= 3 and round(bound + 1e-9, 2) < similar[2][0]:
+                break
+            title_lower = self._docs[seq][1]
+            title_similarity = SequenceMatcher(None, item_lower, title_lower).ratio()
+            similarity_score = (title_similarity * 0.7) + (keyword_overlap * 0.3)
+            if similarity_score >= threshold:
+                similar.append((round(similarity_score, 2), seq))
+                similar.sort(key=lambda s: (-s[0], s[1]))
+        return similar[:3]
+
+    def _format(self, similar: List[tuple]) -> List[Dict[str, Any]]:
+        results = []
+        for score, seq in similar:
+            task = self._docs[seq][0]
+            results.append({
+                'title': task.get('title', ''),
+                'filename': task.get('filename', ''),
+                'category': task.get('category', ''),
+                'status': task.get('status', ''),
+                'similarity_score': score
+            })
+        return results
+
+    def find_similar_batch(self, items: List[str], config: dict = DEDUP_CONFIG) -> List[List[Dict[str, Any]]]:
+        """Score a whole batch of items at once.
+
+        Trigram and keyword overlaps for every (item, task) pair are computed
+        as matrices with NumPy, and SequenceMatcher only runs where the bound
+        matrix allows a match. Batches whose matrices exceed
+        BATCH_MATRIX_BUDGET are split into chunks scored in a process pool.
+        Falls back to per-item find_similar when NumPy is not installed.
+        """
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            return [self.find_similar(item, config) for item in items]
+        if len(items) < BATCH_MIN_ITEMS or not self._docs:
+            return [self.find_similar(item, config) for item in items]
+
+        threshold = config['similarity_threshold']
+        rows_per_chunk = max(1, BATCH_MATRIX_BUDGET // (len(self._docs) * BATCH_BYTES_PER_CELL))
+        if len(items) <= rows_per_chunk:
+            similar = self._score_matrix(items, threshold)
+        else:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            chunks = [items[i:i + rows_per_chunk] for i in range(0, len(items), rows_per_chunk)]
+            workers = min(len(chunks), os.cpu_count() or 1)
+            # spawn rather than fork: the server process runs watcher/executor threads
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_dedup_worker, initargs=(self,)) as pool:
+                similar = []
+                for chunk_result in pool.map(_score_dedup_chunk, chunks, [threshold] * len(chunks)):
+                    similar.extend(chunk_result)
+        return [self._format(s) for s in similar]
+
+    def _matrix_arrays(self) -> dict:
+        """Per-task arrays for batch scoring, rebuilt only after index changes"""
+        import numpy as np
+
+        if self._arrays is not None and self._arrays['version'] == self._version:
+            return self._arrays
+        seqs = sorted(self._docs)
+        alphabet: Dict[str, int] = {}
+        char_rows, char_cols, char_counts = [], [], []
+        for row, seq in enumerate(seqs):
+            for char, count in Counter(self._docs[seq][1]).items():
+                char_rows.append(row)
+                char_cols.append(alphabet.setdefault(char, len(alphabet)))
+                char_counts.append(count)
+        char_matrix = np.zeros((len(seqs), max(1, len(alphabet))), dtype=np.int32)
+        char_matrix[char_rows, char_cols] = char_counts
+        self._arrays = {
+            'version': self._version,
+            'seqs': seqs,
+            'column': {seq: i for i, seq in enumerate(seqs)},
+            'title_lengths': np.array([len(self._docs[seq][1]) for seq in seqs], dtype=np.float64),
+            'keyword_counts': np.array([len(self._docs[seq][2]) for seq in seqs], dtype=np.float64),
+            'alphabet': alphabet,
+            'char_matrix': char_matrix,
+            'postings': {},
+        }
+        return self._arrays
+
+    def _score_matrix(self, items: List[str], threshold: float) -> List[List[tuple]]:
+        import numpy as np
+
+        arrays = self._matrix_arrays()
+        seqs, column = arrays['seqs'], arrays['column']
+        title_lengths, keyword_counts = arrays['title_lengths'], arrays['keyword_counts']
+        posting_arrays = arrays['postings']
+        n = len(seqs)
+
+        def gram_postings(gram: str) -> tuple:
+            if gram not in posting_arrays:
+                postings = self._grams.get(gram, {})
+                posting_arrays[gram] = (
+                    np.fromiter((column[seq] for seq in postings), dtype=np.int64, count=len(postings)),
+                    np.fromiter(postings.values(), dtype=np.int64, count=len(postings)),
+                )
+            return posting_arrays[gram]
+
+        # Flattened (row * n + column) indices so one bincount fills each matrix
+        gram_index, gram_weight, kw_index = [], [], []
+        item_lowers, item_keywords = [], []
+        for row, item in enumerate(items):
+            item_lower = item.lower()
+            keywords = extract_keywords(item)
+            item_lowers.append(item_lower)
+            item_keywords.append(keywords)
+            for gram, count in _char_trigrams(item_lower).items():
+                cols, counts = gram_postings(gram)
+                if len(cols):
+                    gram_index.append(cols + row * n)
+                    gram_weight.append(np.minimum(counts, count))
+            for keyword in keywords:
+                seqs_with_keyword = self._keywords.get(keyword)
+                if seqs_with_keyword:
+                    kw_index.append(np.fromiter((column[seq] for seq in seqs_with_keyword), dtype=np.int64) + row * n)
+
+        m = len(items)
+        empty = np.zeros(0, dtype=np.int64)
+        shared_grams = np.bincount(np.concatenate(gram_index) if gram_index else empty,
+                                   weights=np.concatenate(gram_weight) if gram_weight else None,
+                                   minlength=m * n).reshape(m, n)
+        shared_keywords = np.bincount(np.concatenate(kw_index) if kw_index else empty,
+                                      minlength=m * n).reshape(m, n).astype(np.float64)
+
+        item_lengths = np.array([len(t) for t in item_lowers], dtype=np.float64)[:, None]
+        item_keyword_counts = np.array([len(k) for k in item_keywords], dtype=np.float64)[:, None]
+
+        # Shared characters (as multisets) bound the match count directly,
+        # the same bound SequenceMatcher.quick_ratio() uses
+        alphabet, char_matrix = arrays['alphabet'], arrays['char_matrix']
+        item_chars = np.zeros((m, char_matrix.shape[1]), dtype=np.int32)
+        for row, item_lower in enumerate(item_lowers):
+            for char, count in Counter(item_lower).items():
+                if char in alphabet:
+                    item_chars[row, alphabet[char]] = count
+        shared_chars = np.zeros((m, n), dtype=np.int32)
+        for col in np.nonzero(item_chars.any(axis=0))[0]:
+            shared_chars += np.minimum(item_chars[:, col, None], char_matrix[None, :, col])
+
+        total = item_lengths + title_lengths
+        matches = np.minimum(np.minimum(item_lengths, title_lengths), (shared_grams + 2 * (total + 1)) / 5)
+        matches = np.minimum(matches, shared_chars)
+        ratio_bound = np.where(total == 0, 1.0, 2.0 * matches / np.maximum(total, 1))
+        union = item_keyword_counts + keyword_counts - shared_keywords
+        with np.errstate(divide='ignore', invalid='ignore'):
+            keyword_overlap = np.where((item_keyword_counts > 0) & (keyword_counts > 0),
+                                       shared_keywords / union, 0.0)
+        bounds = ratio_bound * 0.7 + keyword_overlap * 0.3
+
+        results = []
+        for row in range(m):
+            cols = np.nonzero(bounds[row] + 1e-9 >= threshold)[0]
+            # Highest bound first, ties in sequence (column) order
+            cols = cols[np.lexsort((cols, -bounds[row, cols]))]
+            scored = [(float(bounds[row, c]), seqs[c], float(keyword_overlap[row, c])) for c in cols]
+            results.append(self._verify(item_lowers[row], scored, threshold))
+        return results
+
+# Worker-side state for DedupIndex.find_similar_batch
+_WORKER_DEDUP: Optional[DedupIndex] = None
+
+def _init_dedup_worker(dedup: DedupIndex) -> None:
+    global _WORKER_DEDUP
+    _WORKER_DEDUP = dedup
+
+def _score_dedup_chunk(items: List[str], threshold: float) -> List[List[tuple]]:
+    return _WORKER_DEDUP._score_matrix(items, threshold)
+
+def _cluster_candidates(texts: List[str], threshold: float):
+    """Yield (a, b, keyword_overlap) for each pair a < b that could reach threshold.
+
+    Pairs are ordered by b. Only pairs whose score provably misses
+    threshold are left out: those over DedupIndex's trigram bound (see
+    _similarity_ratio_bound) and, with NumPy, those over the shared
+    character (SequenceMatcher.quick_ratio()) bound as well. With NumPy
+    the shared trigram, keyword and character counts of each text against
+    all earlier ones are computed in one vectorized pass; without it each
+    text is looked up in a DedupIndex of the earlier ones.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        dedup = DedupIndex()
+        for b, text in enumerate(texts):
+            for _bound, a, keyword_overlap in dedup.candidates(text, extract_keywords(text), threshold):
+                yield a, b, keyword_overlap
+            dedup.add(b, {'title': text})
+        return
+
+    # Postings of keywords and of numbered trigram occurrences ("abc" twice
+    # gives ("abc", 1) and ("abc", 2)), so common postings count the
+    # min(count_a, count_b) shared trigrams DedupIndex works with
+    gram_postings: Dict[tuple, List[int]] = {}
+    keyword_postings: Dict[str, List[int]] = {}
+    gram_features, keyword_features = [], []
+    alphabet: Dict[str, int] = {}
+    rows, cols, counts = [], [], []
+    for i, text in enumerate(texts):
+        features = []
+        for gram, count in _char_trigrams(text).items():
+            for k in range(count):
+                postings = gram_postings.setdefault((gram, k), [])
+                postings.append(i)
+                features.append(postings)
+        gram_features.append(features)
+        keywords = []
+        for keyword in extract_keywords(text):
+            postings = keyword_postings.setdefault(keyword, [])
+            postings.append(i)
+            keywords.append(postings)
+        keyword_features.append(keywords)
+        for char, count in Counter(text).items():
+            rows.append(i)
+            cols.append(alphabet.setdefault(char, len(alphabet)))
+            counts.append(count)
+    n = len(texts)
+    char_matrix = np.zeros((n, max(1, len(alphabet))), dtype=np.int32)
+    char_matrix[rows, cols] = counts
+    lengths = np.array([len(t) for t in texts], dtype=np.float64)
+    keyword_counts = np.array([len(k) for k in keyword_features], dtype=np.float64)
+    arrays: Dict[int, Any] = {}
+
+    def shared_with_earlier(features: List[List[int]], b: int):
+        # Postings are ascending, so each is cut at b to count only a < b
+        parts = []
+        for postings in features:
+            array = arrays.get(id(postings))
+            if array is None:
+                array = arrays[id(postings)] = np.array(postings, dtype=np.int64)
+            parts.append(array[:np.searchsorted(array, b)])
+        if not parts:
+            return np.zeros(b, dtype=np.float64)
+        return np.bincount(np.concatenate(parts), minlength=b)[:b].astype(np.float64)
+
+    for b in range(1, n):
+        shared_grams = shared_with_earlier(gram_features[b], b)
+        common = shared_with_earlier(keyword_features[b], b)
+        union = keyword_counts[:b] + keyword_counts[b] - common
+        keyword_overlap = np.divide(common, union, out=np.zeros(b), where=(union > 0) & (common > 0))
+        total = lengths[:b] + lengths[b]
+        matches = np.minimum(np.minimum(lengths[:b], lengths[b]), (shared_grams + 2 * (total + 1)) / 5)
+        ratio_bound = np.divide(2.0 * matches, total, out=np.ones(b), where=total > 0)
+        keep = np.nonzero(ratio_bound * 0.7 + keyword_overlap * 0.3 + 1e-9 >= threshold)[0]
+        if not len(keep):
+            continue
+        shared_chars = np.minimum(char_matrix[keep], char_matrix[b]).sum(axis=1)
+        quick_bound = np.divide(2.0 * shared_chars, total[keep], out=np.ones(len(keep)), where=total[keep] > 0)
+        keep = keep[quick_bound * 0.7 + keyword_overlap[keep] * 0.3 + 1e-9 >= threshold]
+        for a, overlap in zip(keep.tolist(), keyword_overlap[keep].tolist()):
+            yield a, b, overlap
+
+def cluster_items(items: List[str], threshold: float) -> List[List[int]]:
+    """Group a batch of items that are duplicates of one another.
+
+    Items equal after lowercasing and collapsing whitespace are grouped
+    outright. The remaining distinct texts are joined (union-find) when
+    their find_similar_tasks score reaches threshold. Every pair not ruled
+    out by the bounds in _cluster_candidates is scored, except pairs
+    already in one cluster, so the clusters equal those of a full pairwise
+    comparison. Returns clusters as lists of item indices in input order,
+    ordered by their first member.
+    """
+    from difflib import SequenceMatcher
+
+    texts: Dict[str, int] = {}
+    text_of_item = []
+    for item in items:
+        text_of_item.append(texts.setdefault(' '.join(item.lower().split()), len(texts)))
+    distinct = list(texts)
+
+    parent = list(range(len(distinct)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b, keyword_overlap in _cluster_candidates(distinct, threshold):
+        root_a, root_b = find(a), find(b)
+        if root_a == root_b:
+            continue
+        matcher = SequenceMatcher(None, distinct[a], distinct[b])
+        if matcher.quick_ratio() * 0.7 + keyword_overlap * 0.3 + 1e-9 < threshold:
+            continue
+        if matcher.ratio() * 0.7 + keyword_overlap * 0.3 >= threshold:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters: Dict[int, List[int]] = {}
+    for index, text_id in enumerate(text_of_item):
+        clusters.setdefault(find(text_id), []).append(index)
+    return sorted(clusters.values(), key=lambda members: members[0])
+
+def _parse_frontmatter_batch(blocks: List[tuple]) -> List[tuple]:
+    """Parse (filename, block, offset) tuples; runs in ingest worker processes"""
+    parsed = []
+    for filename, block, offset in blocks:
+        try:
+            parsed.append((filename, _load_frontmatter(block), offset, None))
+        except Exception as e:
+            parsed.append((filename, {}, 0, str(e)))
+    return parsed
+
+def ingest_task_files(tasks_dir: Path, filenames: List[str]):
+    """Read and parse many task files (paths relative to tasks_dir) in parallel.
+
+    INGEST_READ_WORKERS threads read frontmatter blocks into a bounded queue,
+    so slow (e.g. network) filesystems overlap their per-file latency while
+    memory stays bounded. Blocks are parsed in this thread, or in batches on
+    an INGEST_PROCESSES-sized process pool when that is set. Yields
+    (filename, metadata, body_offset) in completion order; unreadable or
+    malformed files are logged and yielded with empty metadata.
+    """
+    import queue
+
+    # Plain string paths: pathlib would intern every filename, and CPython's
+    # intern table never shrinks back
+    root = os.fspath(tasks_dir)
+    names = queue.SimpleQueue()
+    for filename in filenames:
+        names.put(filename)
+    blocks: queue.Queue = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+    workers = max(1, min(INGEST_READ_WORKERS, len(filenames)))
+    done = object()
+
+    def reader() -> None:
+        while True:
+            try:
+                filename = names.get_nowait()
+            except queue.Empty:
+                blocks.put(done)
+                return
+            try:
+                block, offset = read_frontmatter_block(os.path.join(root, filename))
+            except Exception as e:
+                logger.error(f"Error reading {tasks_dir / filename}: {e}")
+                block, offset = None, 0
+            blocks.put((filename, block, offset))
+
+    threads = [threading.Thread(target=reader, name='ingest-reader', daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    def read_blocks():
+        finished = 0
+        while finished < workers:
+            item = blocks.get()
+            if item is done:
+                finished += 1
+            else:
+                yield item
+
+    if INGEST_PROCESSES <= 1:
+        for filename, block, offset in read_blocks():
+            if block is None:
+                yield filename, {}, 0
+                continue
+            try:
+                yield filename, _load_frontmatter(block), offset
+            except Exception as e:
+                logger.error(f"Error parsing YAML in {tasks_dir / filename}: {e}")
+                yield filename, {}, 0
+        return
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+    def handle(parsed: List[tuple]):
+        for filename, metadata, offset, error in parsed:
+            if error:
+                logger.error(f"Error parsing YAML in {tasks_dir / filename}: {error}")
+            yield filename, metadata, offset
+
+    with ProcessPoolExecutor(max_workers=INGEST_PROCESSES, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = set()
+        batch = []
+        for filename, block, offset in read_blocks():
+            if block is None:
+                yield filename, {}, 0
+                continue
+            batch.append((filename, block, offset))
+            if len(batch) >= INGEST_PARSE_BATCH:
+                pending.add(pool.submit(_parse_frontmatter_batch, batch))
+                batch = []
+            # Keep a bounded number of batches in flight
+            while len(pending) >= INGEST_PROCESSES * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield from handle(future.result())
+        if batch:
+            pending.add(pool.submit(_parse_frontmatter_batch, batch))
+        for future in pending:
+            yield from handle(future.result())
+
+class MetadataCache:
+    """SQLite cache of parsed frontmatter, keyed by filename + mtime + size.
+
+    Lets a freshly started server validate the index with a stat pass
+    instead of re-parsing every task file. Rows store the pickled metadata
+    (frontmatter may contain dates) and the body offset; files without
+    usable frontmatter are stored with NULL metadata so they are not
+    re-read on every start either.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(exist_ok=True, parents=True)
+            try:
+                self._conn = self._open()
+            except sqlite3.DatabaseError as e:
+                logger.warning(f"Rebuilding unreadable metadata cache {self.path}: {e}")
+                self.path.unlink(missing_ok=True)
+                self._conn = self._open()
+        return self._conn
+
+    def _open(self) -> sqlite3.Connection:
+        # Access is serialized by TaskIndex's lock, so sharing across threads is safe
+        conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS tasks")
+            conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "filename TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, "
+            "metadata BLOB, body_offset INTEGER)"
+        )
+        return conn
+
+    def load(self) -> List[tuple]:
+        """Return (filename, stat_key, metadata or None, body_offset) rows"""
+        try:
+            rows = self._connect().execute(
+                "SELECT filename, mtime_ns, size, metadata, body_offset FROM tasks ORDER BY rowid"
+            ).fetchall()
+        except sqlite3.DatabaseError as e:
+            logger.error(f"Error reading metadata cache: {e}")
+            return []
+        entries = []
+        for filename, mtime_ns, size, blob, body_offset in rows:
+            try:
+                metadata = pickle.loads(blob) if blob is not None else None
+            except Exception:
+                continue
+            entries.append((filename, (mtime_ns, size), metadata, body_offset))
+        return entries
+
+    def save(self, upserts: List[tuple], deletes: List[str]) -> None:
+        """Apply (filename, stat_key, metadata, body_offset) upserts and deletes in one transaction"""
+        if not upserts and not deletes:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany("DELETE FROM tasks WHERE filename = ?", [(f,) for f in deletes])
+                conn.executemany(
+                    "INSERT OR REPLACE INTO tasks (filename, mtime_ns, size, metadata, body_offset) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(filename, stat_key[0], stat_key[1],
+                      pickle.dumps(metadata, protocol=pickle.HIGHEST_PROTOCOL) if metadata is not None else None,
+                      body_offset)
+                     for filename, stat_key, metadata, body_offset in upserts],
+                )
+        except (sqlite3.DatabaseError, pickle.PicklingError) as e:
+            logger.error(f"Error writing metadata cache: {e}")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+def _count_key(value: Any) -> Any:
+    """Make a frontmatter value usable as a Counter key"""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return str(value)
+
+def _estimated_minutes(task: Dict[str, Any]) -> float:
+    value = task.get('estimated_time', 30)
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 30
+
+class _Missing:
+    """Placeholder for absent frontmatter fields that unpickles to the same object"""
+
+    def __reduce__(self):
+        return 'MISSING_FIELD'
+
+MISSING_FIELD = _Missing()
+
+class TaskAggregates:
+    """Running counts and time totals over the indexed tasks.
+
+    Updated as each task enters or leaves the index, so the summary tools
+    read a handful of small counters instead of scanning every task.
+    Missing fields are kept under MISSING and resolved to the tools'
+    defaults at read time.
+    """
+
+    MISSING = MISSING_FIELD
+
+    def __init__(self):
+        self.total = 0
+        self.active = 0
+        self.by_status = Counter()
+        self.active_by_status = Counter()
+        self.active_by_priority = Counter()
+        self.active_by_category = Counter()
+        self.active_minutes_by_priority = Counter()
+
+    def _apply(self, task: Dict[str, Any], sign: int) -> None:
+        status = _count_key(task.get('status', self.MISSING))
+        self.total += sign
+        self._bump(self.by_status, status, sign)
+        if status == 'd':
+            return
+        priority = _count_key(task.get('priority', self.MISSING))
+        self.active += sign
+        self._bump(self.active_by_status, status, sign)
+        self._bump(self.active_by_priority, priority, sign)
+        self._bump(self.active_by_category, _count_key(task.get('category', self.MISSING)), sign)
+        self._bump(self.active_minutes_by_priority, priority, sign * _estimated_minutes(task))
+
+    @staticmethod
+    def _bump(counter: Counter, key: Any, delta: float) -> None:
+        counter[key] += delta
+        if not counter[key]:
+            del counter[key]
+
+    def add(self, task: Dict[str, Any]) -> None:
+        self._apply(task, 1)
+
+    def remove(self, task: Dict[str, Any]) -> None:
+        self._apply(task, -1)
+
+    def counts(self, counter: Counter, default: str) -> Dict[Any, int]:
+        """Copy a counter, folding tasks without the field into default"""
+        result: Dict[Any, int] = {}
+        for key, count in counter.items():
+            key = default if key is self.MISSING else key
+            result[key] = result.get(key, 0) + count
+        return result
+
+class TaskRecord(Mapping):
+    """Frontmatter of one indexed task, stored compactly.
+
+    The common fields live in slots rather than a per-task dict (an unset
+    slot is an absent key), and categorical values, tags, dates and
+    frontmatter keys are interned so each distinct value is one object
+    shared by the whole corpus (dates and tag tuples through the owning
+    index's shared table). Other keys go to a small dict. Records are
+    read-only mappings; tools copy them into dicts (to_dict()) only when
+    rendering JSON.
+    """
+
+    FIELDS = ('title', 'category', 'priority', 'status', 'estimated_time', 'created_date', 'due_date', 'tags')
+    __slots__ = FIELDS + ('filename', '_extra')
+    _SLOTTED = frozenset(FIELDS + ('filename',))
+    _INTERNED = frozenset(('category', 'priority', 'status'))
+
+    def __init__(self, metadata: Mapping, filename: str, shared: Optional[Dict[Any, Any]] = None):
+        if shared is None:
+            shared = {}
+        extra = None
+        for key, value in metadata.items():
+            if key in self._SLOTTED:
+                if type(value) is str and key in self._INTERNED:
+                    value = sys.intern(value)
+                elif type(value) is date:
+                    value = shared.setdefault(value, value)
+                elif type(value) is list and key == 'tags' and all(type(tag) is str for tag in value):
+                    value = tuple(sys.intern(tag) for tag in value)
+                    value = shared.setdefault(value, value)
+                setattr(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[sys.intern(key) if type(key) is str else key] = value
+        self.filename = filename
+        self._extra = extra
+
+    def to_dict(self) -> dict:
+        """A plain dict copy, for JSON output"""
+        result = {}
+        for field in self.FIELDS:
+            value = getattr(self, field, MISSING_FIELD)
+            if value is not MISSING_FIELD:
+                result[field] = value
+        if self._extra is not None:
+            result.update(self._extra)
+        result['filename'] = self.filename
+        return result
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._SLOTTED:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._SLOTTED:
+            return getattr(self, key, default)
+        return self._extra.get(key, default) if self._extra is not None else default
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._SLOTTED:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for field in self.FIELDS:
+            if hasattr(self, field):
+                yield field
+        if self._extra is not None:
+            yield from self._extra
+        yield 'filename'
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+class TaskLayout:
+    """Where task files live under Tasks/.
+
+    "flat" keeps every task at Tasks/<filename>. "hash" puts it under
+    Tasks/<first SHARD_WIDTH hex digits of md5(filename)>/, so no directory
+    grows past a few thousand entries even with millions of tasks. The
+    layout is recorded in Tasks/.layout.json (absent means flat) and decides
+    where new files go; readers accept files in either place, so a tree
+    mid-migration stays fully usable.
+    """
+
+    KINDS = ('flat', 'hash')
+
+    def __init__(self, kind: str = 'flat', width: int = SHARD_WIDTH, migrating: bool = False):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown task layout: {kind} (expected one of {', '.join(self.KINDS)})")
+        self.kind = kind
+        self.width = width
+        self.migrating = migrating
+
+    @classmethod
+    def load(cls, tasks_dir: Path) -> 'TaskLayout':
+        try:
+            with open(tasks_dir / TASK_LAYOUT_FILE) as f:
+                data = json.load(f)
+            return cls(data.get('layout', 'flat'), int(data.get('width', SHARD_WIDTH)), bool(data.get('migrating')))
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError, AttributeError) as e:
+            logger.error(f"Ignoring invalid {tasks_dir / TASK_LAYOUT_FILE}: {e}")
+            return cls()
+
+    def save(self, tasks_dir: Path) -> None:
+        marker = tasks_dir / TASK_LAYOUT_FILE
+        if self.kind == 'flat' and not self.migrating:
+            marker.unlink(missing_ok=True)
+            return
+        data = {'layout': self.kind, 'width': self.width}
+        if self.migrating:
+            data['migrating'] = True
+        error, = write_files_atomic([(marker, json.dumps(data).encode())])
+        if error:
+            raise OSError(error)
+
+    def is_shard_dir(self, name: str) -> bool:
+        """Whether a subdirectory of Tasks/ may hold tasks.
+
+        Only named shards (width lowercase hex digits) count, and only under
+        the hash layout or mid-migration; other subdirectories (templates,
+        attachments) are never read as tasks.
+        """
+        return ((self.kind == 'hash' or self.migrating) and len(name) == self.width
+                and all(c in '0123456789abcdef' for c in name))
+
+    def shard(self, filename: str) -> str:
+        return hashlib.md5(filename.encode('utf-8', 'surrogateescape')).hexdigest()[:self.width]
+
+    def relpath(self, filename: str) -> str:
+        """Path of filename relative to Tasks/ under this layout"""
+        if self.kind == 'hash':
+            return f"{self.shard(filename)}/{filename}"
+        return filename
+
+    def locate(self, tasks_dir: Path, filename: str) -> Path:
+        """Existing path of a task not (yet) in the index, else where to create it"""
+        path = tasks_dir / self.relpath(filename)
+        if not path.exists():
+            other = filename if self.kind == 'hash' else TaskLayout('hash', self.width).relpath(filename)
+            if (tasks_dir / other).exists():
+                return tasks_dir / other
+        return path
+
+def migrate_task_layout(tasks_dir: Path, kind: str, width: int = SHARD_WIDTH) -> dict:
+    """Move every task file to its place in the given layout, one rename at a time.
+
+    The target is recorded in the marker (as migrating) before the first
+    move, so new tasks already land in their final place, and the server
+    keeps reading both places meanwhile. Directories are streamed with
+    scandir and files already in place are skipped, so an interrupted run
+    is resumed by running it again. Files whose target already exists are
+    left alone and reported; the marker is only finalized once none remain.
+    """
+    target = TaskLayout(kind, width, migrating=True)
+    tasks_dir.mkdir(exist_ok=True, parents=True)
+    target.save(tasks_dir)
+    moved = in_place = 0
+    conflicts = []
+    touched = set()
+    shards = sorted(p for p in tasks_dir.iterdir() if target.is_shard_dir(p.name) and p.is_dir())
+    # Visit destinations first, so files moved by this run are not counted as in place
+    for directory in (shards + [tasks_dir] if kind == 'hash' else [tasks_dir] + shards):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.md') or not entry.is_file():
+                    continue
+                source = Path(entry.path)
+                dest = tasks_dir / target.relpath(entry.name)
+                if source == dest:
+                    in_place += 1
+                    continue
+                if dest.exists():
+                    conflicts.append(source.relative_to(tasks_dir).as_posix())
+                    continue
+                dest.parent.mkdir(exist_ok=True)
+                os.rename(source, dest)
+                touched.update((source.parent, dest.parent))
+                moved += 1
+                if moved % 1000 == 0:
+                    logger.info(f"Moved {moved} task files")
+        if directory != tasks_dir:
+            try:
+                directory.rmdir()
+            except OSError:
+                pass
+    for directory in touched:
+        fsync_dir(directory)
+    if not conflicts:
+        TaskLayout(kind, width).save(tasks_dir)
+    return {"layout": kind, "moved": moved, "already_in_place": in_place, "conflicts": conflicts,
+            "complete": not conflicts}
+
+class TaskIndex:
+    """Long-lived index of task frontmatter, keyed by filename.
+
+    Files are re-parsed only when their mtime or size changes, so repeated
+    tool calls cost one stat pass instead of a full read-and-parse of Tasks/.
+    Only frontmatter is kept; bodies are read on demand via body_content().
+    Files may sit in Tasks/ or one shard directory below it (see
+    TaskLayout); path() maps a filename to its file without touching disk.
+    Tasks are returned as the index's own (read-only) TaskRecords.
+    """
+
+    def __init__(self, tasks_dir: Path, cache: Optional[MetadataCache] = None):
+        self.tasks_dir = tasks_dir
+        self.layout = TaskLayout.load(tasks_dir)
+        self.cache = cache
+        self._warmed = cache is None
+        self._dirty: set = set()
+        self._tasks: Dict[str, TaskRecord] = {}
+        self._stats: Dict[str, tuple] = {}
+        # filename -> path relative to Tasks/, for every file seen by a scan
+        self._paths: Dict[str, str] = {}
+        self._seqs: Dict[str, int] = {}
+        self._body_offsets: Dict[str, int] = {}
+        self._next_seq = 0
+        self._lock = threading.RLock()
+        self._aggregates = TaskAggregates()
+        # Distinct dates and tag tuples, so records share one object per value
+        # (see _record); dropped with the index
+        self._shared: Dict[Any, Any] = {}
+        # Built on first duplicate check, then maintained incrementally
+        self._dedup: Optional[DedupIndex] = None
+        # (seq, task or None) changes not yet applied to it because a batch
+        # was scoring; see _dedup_update()
+        self._dedup_pending: deque = deque()
+        # Callbacks (filename, path, task or None, body_offset) for other indexes
+        self._listeners: List[Any] = []
+        # Set while a watcher keeps the index live; queries then skip the stat pass
+        self.watched = False
+        # Set while a loaded snapshot is being validated in the background
+        self.validating = False
+        self._loaded = False
+        # Bumped whenever a task enters, changes or leaves the index
+        self.generation = 0
+        self._local = threading.local()
+
+    def path(self, filename: str) -> Path:
+        """File of a task: where the last scan saw it, else per the layout"""
+        relpath = self._paths.get(filename)
+        if relpath is not None:
+            return self.tasks_dir / relpath
+        return self.layout.locate(self.tasks_dir, filename)
+
+    def find(self, filename: str) -> Path:
+        """Like path(), but checked against disk for tools addressing one task by name.
+
+        Costs at most a few stats, not a scan, so it also finds files that
+        were created or moved (e.g. by a migration) since the last refresh.
+        """
+        relpath = self._paths.get(filename)
+        if relpath is not None and (self.tasks_dir / relpath).exists():
+            return self.tasks_dir / relpath
+        self.layout = TaskLayout.load(self.tasks_dir)
+        return self.layout.locate(self.tasks_dir, filename)
+
+    def _load(self, filename: str, stat_key: tuple) -> None:
+        """(Re-)parse a single task file into the index"""
+        task_file = self.path(filename)
+        try:
+            metadata, body_offset = read_frontmatter(task_file)
+        except Exception as e:
+            logger.error(f"Error reading {task_file}: {e}")
+            metadata, body_offset = {}, 0
+        self._store(filename, stat_key, metadata, body_offset)
+
+    def _store(self, filename: str, stat_key: tuple, metadata: dict, body_offset: int) -> None:
+        self._stats[filename] = stat_key
+        self._dirty.add(filename)
+        if metadata:
+            self._body_offsets[filename] = body_offset
+            self._set(filename, self._record(metadata, filename))
+        else:
+            self._remove(filename)
+
+    def _record(self, metadata: dict, filename: str) -> TaskRecord:
+        # Values no longer held by any task stay in the table until it is
+        # reset; records keep their values, later ones just stop sharing them
+        if len(self._shared) > 2 * len(self._tasks) + 1024:
+            self._shared = {}
+        return TaskRecord(metadata, filename, self._shared)
+
+    def _set(self, filename: str, task: TaskRecord) -> None:
+        # Sequence numbers follow dict insertion order, so the dedup index
+        # breaks score ties the same way a scan over tasks() would
+        self.generation += 1
+        previous = self._tasks.get(filename)
+        if previous is None:
+            self._seqs[filename] = self._next_seq
+            self._next_seq += 1
+        else:
+            self._aggregates.remove(previous)
+        self._aggregates.add(task)
+        self._tasks[filename] = task
+        if self._dedup is not None:
+            self._dedup_update(self._seqs[filename], task)
+        for listener in self._listeners:
+            listener(filename, self.path(filename), task, self._body_offsets.get(filename, 0))
+
+    def _remove(self, filename: str) -> None:
+        previous = self._tasks.pop(filename, None)
+        if previous is not None:
+            self.generation += 1
+            self._aggregates.remove(previous)
+            self._body_offsets.pop(filename, None)
+            seq = self._seqs.pop(filename)
+            if self._dedup is not None:
+                self._dedup_update(seq, None)
+            for listener in self._listeners:
+                listener(filename, self.path(filename), None, 0)
+
+    def _drop(self, filename: str) -> None:
+        self._stats.pop(filename, None)
+        self._dirty.add(filename)
+        self._remove(filename)
+        self._paths.pop(filename, None)
+
+    def _dedup_update(self, seq: int, task: Optional[TaskRecord]) -> None:
+        """Queue a dedup index change and apply it now unless a batch is scoring.
+
+        Called with the index lock held, so it must never wait for the dedup
+        lock: a long find_similar() would stall every index reader.
+        """
+        self._dedup_pending.append((seq, task))
+        self._drain_dedup()
+
+    def _drain_dedup(self) -> None:
+        # Whoever releases the dedup lock drains again, so nothing queued
+        # while it was held is left behind
+        dedup = self._dedup
+        while self._dedup_pending and dedup.lock.acquire(blocking=False):
+            try:
+                self._apply_dedup_pending(dedup)
+            finally:
+                dedup.lock.release()
+
+    def _apply_dedup_pending(self, dedup: DedupIndex) -> None:
+        """Apply queued changes in order (the caller holds dedup.lock)"""
+        while self._dedup_pending:
+            seq, task = self._dedup_pending.popleft()
+            if task is None:
+                dedup.remove(seq)
+            else:
+                dedup.add(seq, task)
+
+    @property
+    def dedup(self) -> DedupIndex:
+        with self._lock:
+            if self._dedup is None:
+                dedup = DedupIndex()
+                for filename, task in self._tasks.items():
+                    dedup.add(self._seqs[filename], task)
+                self._dedup = dedup
+            return self._dedup
+
+    def add_listener(self, listener) -> None:
+        """Subscribe to task changes, replaying every current task first"""
+        with self._lock:
+            self.sync()
+            for filename, task in self._tasks.items():
+                listener(filename, self.path(filename), task, self._body_offsets.get(filename, 0))
+            self._listeners.append(listener)
+
+    def _warm(self) -> None:
+        """Seed the index from the metadata cache; refresh() then patches it"""
+        self._warmed = True
+        rows = self.cache.load()
+        METRICS.count('metadata_cache_rows_loaded', len(rows))
+        for filename, stat_key, metadata, body_offset in rows:
+            self._stats[filename] = stat_key
+            if metadata:
+                self._body_offsets[filename] = body_offset
+                self._set(filename, self._record(metadata, filename))
+
+    def _flush(self) -> None:
+        """Write entries changed since the last flush to the metadata cache"""
+        if self.cache is None:
+            self._dirty.clear()
+            return
+        if not self._dirty:
+            return
+        upserts, deletes = [], []
+        for filename in self._dirty:
+            if filename in self._stats:
+                task = self._tasks.get(filename)
+                upserts.append((filename, self._stats[filename], task.to_dict() if task is not None else None,
+                                self._body_offsets.get(filename, 0)))
+            else:
+                deletes.append(filename)
+        self._dirty.clear()
+        self.cache.save(upserts, deletes)
+
+    def _scan(self) -> tuple[Dict[str, str], Dict[str, tuple]]:
+        """Stat Tasks/ and its shard directories.
+
+        Returns ({filename: path relative to Tasks/}, {changed filename: stat
+        key}); a file that moved counts as changed. If a filename exists in
+        two places (an interrupted migration), the layout's location wins.
+        """
+        self.layout = TaskLayout.load(self.tasks_dir)
+        seen: Dict[str, str] = {}
+        changed: Dict[str, tuple] = {}
+        if not self.tasks_dir.exists():
+            return seen, changed
+        dirs = [(self.tasks_dir, '')]
+        while dirs:
+            directory, prefix = dirs.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.name.endswith('.md'):
+                            if not entry.is_file():
+                                continue
+                            st = entry.stat()
+                        elif not prefix and self.layout.is_shard_dir(entry.name) and entry.is_dir():
+                            dirs.append((Path(entry.path), entry.name + '/'))
+                            continue
+                        else:
+                            continue
+                    except OSError:
+                        continue
+                    relpath = prefix + entry.name
+                    if entry.name in seen:
+                        if seen[entry.name] == self.layout.relpath(entry.name):
+                            continue
+                        changed.pop(entry.name, None)
+                    seen[entry.name] = relpath
+                    stat_key = (st.st_mtime_ns, st.st_size)
+                    known = self._paths.get(entry.name)
+                    if self._stats.get(entry.name) != stat_key or (known is not None and known != relpath):
+                        changed[entry.name] = stat_key
+        METRICS.cache('task_index', hits=len(seen) - len(changed), misses=len(changed))
+        return seen, changed
+
+    def _parse_changed(self, changed: Dict[str, tuple], seen: Dict[str, str]):
+        """Yield (filename, metadata, body_offset) for changed files"""
+        if len(changed) >= PARALLEL_INGEST_MIN:
+            for relpath, metadata, body_offset in ingest_task_files(self.tasks_dir, [seen[f] for f in changed]):
+                yield relpath.rpartition('/')[2], metadata, body_offset
+            return
+        for filename in changed:
+            task_file = self.tasks_dir / seen[filename]
+            try:
+                metadata, body_offset = read_frontmatter(task_file)
+            except Exception as e:
+                logger.error(f"Error reading {task_file}: {e}")
+                metadata, body_offset = {}, 0
+            yield filename, metadata, body_offset
+
+    def refresh(self) -> None:
+        """Stat Tasks/ and re-parse only new or changed files"""
+        with self._lock:
+            if not self._warmed:
+                self._warm()
+            seen, changed = self._scan()
+            for filename in [f for f in self._stats if f not in seen]:
+                self._drop(filename)
+            self._paths.update(seen)
+            for filename, metadata, body_offset in self._parse_changed(changed, seen):
+                self._store(filename, changed[filename], metadata, body_offset)
+            self._flush()
+            self._loaded = True
+
+    def validate(self) -> None:
+        """Bring a snapshot-loaded index up to date without blocking readers.
+
+        Stat and parse run outside the lock; an entry is only replaced if no
+        one else (e.g. the watcher) updated it in the meantime.
+        """
+        with self._lock:
+            known = dict(self._stats)
+        seen, changed = self._scan()
+        parsed = list(self._parse_changed(changed, seen))
+        with self._lock:
+            for filename in [f for f in known if f not in seen]:
+                if self._stats.get(filename) == known[filename]:
+                    self._drop(filename)
+            for filename, relpath in seen.items():
+                if self._stats.get(filename) == known.get(filename):
+                    self._paths[filename] = relpath
+            for filename, metadata, body_offset in parsed:
+                if self._stats.get(filename) == known.get(filename):
+                    self._store(filename, changed[filename], metadata, body_offset)
+            self._flush()
+            self.validating = False
+
+    def validate_in_background(self) -> threading.Thread:
+        def run():
+            try:
+                self.validate()
+            except Exception as e:
+                logger.error(f"Error validating task index snapshot: {e}")
+                self.validating = False
+        thread = threading.Thread(target=run, name='index-validate', daemon=True)
+        thread.start()
+        return thread
+
+    def save_snapshot(self, path: Path) -> None:
+        """Write the whole index as one pickle for load_snapshot() at next start"""
+        with self._lock:
+            if not self._loaded:
+                return
+            state = {
+                'version': SNAPSHOT_VERSION,
+                'tasks_dir': str(self.tasks_dir),
+                'stats': self._stats,
+                'paths': self._paths,
+                'tasks': self._tasks,
+                'body_offsets': self._body_offsets,
+                'seqs': self._seqs,
+                'next_seq': self._next_seq,
+                'aggregates': self._aggregates,
+            }
+            try:
+                data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+            except pickle.PicklingError as e:
+                logger.error(f"Error writing index snapshot: {e}")
+                return
+        error, = write_files_atomic([(path, data)])
+        if error:
+            logger.error(f"Error writing index snapshot: {error}")
+
+    def load_snapshot(self, path: Path) -> bool:
+        """Seed an empty index from a snapshot, memory-mapped rather than read.
+
+        The snapshot holds the aggregates and sequence numbers as well, so
+        nothing is re-derived per task. The index then serves queries as-is
+        (validating is set) until validate() has re-checked it against Tasks/.
+        """
+        try:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                state = pickle.loads(mapped)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.error(f"Ignoring unreadable index snapshot: {e}")
+            return False
+        if state.get('version') != SNAPSHOT_VERSION or state.get('tasks_dir') != str(self.tasks_dir):
+            return False
+        with self._lock:
+            if self._loaded or self._tasks:
+                return False
+            self._stats = state['stats']
+            self._paths = state['paths']
+            self._tasks = state['tasks']
+            self._body_offsets = state['body_offsets']
+            self._seqs = state['seqs']
+            self._next_seq = state['next_seq']
+            self._aggregates = state['aggregates']
+            self._warmed = True
+            self._loaded = True
+            self.validating = True
+        return True
+
+    def apply_change(self, relpath: str) -> None:
+        """Apply a create/modify/delete event for a single file (path relative to Tasks/)"""
+        if relpath == TASK_LAYOUT_FILE:
+            self.layout = TaskLayout.load(self.tasks_dir)
+            return
+        if not relpath.endswith('.md'):
+            return
+        filename = relpath.rpartition('/')[2]
+        with self._lock:
+            try:
+                st = os.stat(self.tasks_dir / relpath)
+            except OSError:
+                # Ignore the old location of a file that moved elsewhere
+                if self._paths.get(filename, relpath) == relpath:
+                    self._drop(filename)
+            else:
+                stat_key = (st.st_mtime_ns, st.st_size)
+                if self._stats.get(filename) != stat_key or self._paths.get(filename) != relpath:
+                    self._paths[filename] = relpath
+                    self._load(filename, stat_key)
+            self._flush()
+
+    def invalidate(self, filename: str) -> None:
+        """Force a re-parse of filename on the next refresh.
+
+        Used after our own writes, since coarse filesystem mtimes can hide a
+        same-size rewrite within one tick. While sync() is skipped (watched,
+        or a snapshot is being validated) the file is re-read right away.
+        """
+        self.invalidate_many([filename])
+
+    def invalidate_many(self, filenames: List[str]) -> None:
+        """Invalidate a batch of files with a single cache flush"""
+        with self._lock:
+            for filename in filenames:
+                self._stats.pop(filename, None)
+                self._dirty.add(filename)
+            if self.watched or self.validating:
+                for filename in filenames:
+                    path = self.path(filename)
+                    self.apply_change(path.relative_to(self.tasks_dir).as_posix())
+            else:
+                self._flush()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def sync(self) -> None:
+        """Bring the index up to date unless a watcher or validation already does so"""
+        if not self.watched and not self.validating and not getattr(self._local, 'pinned', False):
+            self.refresh()
+
+    @contextmanager
+    def pinned(self):
+        """Sync once, then skip further stat passes on this thread until exit"""
+        self.sync()
+        self._local.pinned = True
+        try:
+            yield
+        finally:
+            self._local.pinned = False
+
+    def tasks(self) -> List[Dict[str, Any]]:
+        """Return all parsed tasks, refreshing changed files first"""
+        with self._lock:
+            self.sync()
+            return list(self._tasks.values())
+
+    def summary(self) -> Dict[str, Any]:
+        """Return task counts and time totals from the running aggregates"""
+        with self._lock:
+            self.sync()
+            agg = self._aggregates
+            minutes = {
+                priority: agg.active_minutes_by_priority.get(priority, 0)
+                for priority in ['P0', 'P1', 'P2', 'P3']
+            }
+            return {
+                'total': agg.total,
+                'active': agg.active,
+                'by_status': agg.counts(agg.by_status, 'n'),
+                'active_by_status': agg.counts(agg.active_by_status, 'n'),
+                'active_by_priority': agg.counts(agg.active_by_priority, 'P2'),
+                'active_by_category': agg.counts(agg.active_by_category, 'other'),
+                'active_minutes_by_priority': minutes,
+            }
+
+    def body_content(self, filename: str) -> str:
+        """Load the body preview for a task on demand"""
+        offset = self._body_offsets.get(filename)
+        if offset is None:
+            return ''
+        try:
+            return read_body(self.path(filename), offset)
+        except OSError as e:
+            logger.error(f"Error reading body of {filename}: {e}")
+            return ''
+
+    def find_similar(self, items: List[str], config: dict = DEDUP_CONFIG) -> List[List[Dict[str, Any]]]:
+        """Run duplicate detection for each item against one consistent snapshot.
+
+        Only the dedup index stays locked while scoring, and it is taken
+        after the index lock is released, so a long batch does not hold up
+        other readers of the task index. Changes arriving meanwhile are
+        queued and applied once the batch is done.
+        """
+        with self._lock:
+            self.sync()
+            dedup = self.dedup
+        dedup.lock.acquire()
+        try:
+            self._apply_dedup_pending(dedup)
+            return dedup.find_similar_batch(items, config)
+        finally:
+            dedup.lock.release()
+            self._drain_dedup()
+
+    def entries(self) -> List[tuple]:
+        """Return (task, mtime) pairs for all parsed tasks"""
+        with self._lock:
+            self.sync()
+            # A task without a stat entry is treated as just modified
+            now = time.time()
+            return [(task, self._stats[name][0] / 1e9 if name in self._stats else now)
+                    for name, task in self._tasks.items()]
+
+class NoteIndex:
+    """Frontmatter index of the markdown notes under Knowledge/.
+
+    Keyed by POSIX path relative to the root and refreshed by stat like
+    TaskIndex, but recursive and without requiring frontmatter.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._notes: Dict[str, dict] = {}
+        self._stats: Dict[str, tuple] = {}
+        self._body_offsets: Dict[str, int] = {}
+        self._listeners: List[Any] = []
+        self._lock = threading.RLock()
+        self.watched = False
+
+    def _load(self, relpath: str, stat_key: tuple) -> None:
+        path = self.root / relpath
+        try:
+            metadata, body_offset = read_frontmatter(path)
+        except OSError as e:
+            logger.error(f"Error reading {path}: {e}")
+            self._drop(relpath)
+            return
+        self._stats[relpath] = stat_key
+        self._notes[relpath] = metadata
+        self._body_offsets[relpath] = body_offset
+        for listener in self._listeners:
+            listener(relpath, path, metadata, body_offset)
+
+    def _drop(self, relpath: str) -> None:
+        self._stats.pop(relpath, None)
+        self._body_offsets.pop(relpath, None)
+        if self._notes.pop(relpath, None) is not None:
+            for listener in self._listeners:
+                listener(relpath, self.root / relpath, None, 0)
+
+    def refresh(self) -> None:
+        """Walk the notes tree and re-parse only new or changed files"""
+        with self._lock:
+            seen = set()
+            changed = 0
+            for dirpath, dirnames, filenames in os.walk(self.root):
+                dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+                for name in filenames:
+                    if not name.endswith('.md'):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    relpath = Path(os.path.relpath(path, self.root)).as_posix()
+                    seen.add(relpath)
+                    stat_key = (st.st_mtime_ns, st.st_size)
+                    if self._stats.get(relpath) != stat_key:
+                        changed += 1
+                        self._load(relpath, stat_key)
+            for relpath in [r for r in self._stats if r not in seen]:
+                self._drop(relpath)
+            METRICS.cache('note_index', hits=len(seen) - changed, misses=changed)
+
+    def apply_change(self, relpath: str) -> None:
+        """Apply a create/modify/delete event for a single note"""
+        if not relpath.endswith('.md'):
+            return
+        with self._lock:
+            try:
+                st = os.stat(self.root / relpath)
+            except OSError:
+                self._drop(relpath)
+                return
+            stat_key = (st.st_mtime_ns, st.st_size)
+            if self._stats.get(relpath) != stat_key:
+                self._load(relpath, stat_key)
+
+    def __len__(self) -> int:
+        return len(self._notes)
+
+    def sync(self) -> None:
+        if not self.watched:
+            self.refresh()
+
+    def add_listener(self, listener) -> None:
+        """Subscribe to note changes, replaying every current note first"""
+        with self._lock:
+            self.sync()
+            for relpath, metadata in self._notes.items():
+                listener(relpath, self.root / relpath, metadata, self._body_offsets[relpath])
+            self._listeners.append(listener)
+
+    def notes(self) -> Dict[str, dict]:
+        with self._lock:
+            self.sync()
+            return dict(self._notes)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+SEARCH_SNIPPET_CHARS = 160
+SEARCH_FIELDS = ('title', 'category', 'tags', 'tag', 'source', 'status')
+TOKEN_RE = re.compile(r'\w+')
+QUERY_RE = re.compile(r'(\w+):"([^"]*)"|(\w+):(\S+)|"([^"]*)"|(\S+)')
+
+def parse_search_query(query: str) -> tuple[List[str], List[List[str]], Dict[str, str]]:
+    """Split a query into free terms, "quoted phrases" and field:value filters"""
+    terms, phrases, filters = [], [], {}
+    for field_q, value_q, field, value, phrase, word in QUERY_RE.findall(query):
+        field, value = (field_q, value_q) if field_q else (field, value)
+        if field and field.lower() in SEARCH_FIELDS:
+            filters['tags' if field.lower() == 'tag' else field.lower()] = value
+        elif phrase:
+            phrase_terms = TOKEN_RE.findall(phrase.lower())
+            if phrase_terms:
+                phrases.append(phrase_terms)
+        else:
+            terms.extend(TOKEN_RE.findall((word or f"{field}:{value}").lower()))
+    return terms, phrases, filters
+
+def _note_tags(metadata: dict) -> tuple:
+    tags = metadata.get('tags') or ()
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    return tuple(str(t).strip().lower() for t in tags if str(t).strip())
+
+def _read_document(path: Path, body_offset: int) -> Optional[str]:
+    try:
+        with open(path, 'rb') as f:
+            f.seek(body_offset)
+            data = f.read()
+    except OSError:
+        return None
+    METRICS.count('files_read')
+    METRICS.count('body_bytes_read', len(data))
+    return data.decode('utf-8', errors='replace')
+
+class DocumentIndex:
+    """Base for indexes derived from task and Knowledge/ document bodies.
+
+    Attached to TaskIndex and NoteIndex on first use; their change listeners
+    queue documents (keyed 'Tasks/<file>' or 'Knowledge/<path>'), which are
+    only re-read and handed to _add_doc/_remove_doc by the next synced().
+    """
+
+    def __init__(self, tasks: TaskIndex, notes: NoteIndex):
+        self.tasks = tasks
+        self.notes = notes
+        self.lock = threading.Lock()
+        self._attach_lock = threading.Lock()
+        self._attached = False
+        self._pending: Dict[str, Optional[tuple]] = {}
+
+    def _queue(self, source: str, key: str, path: Path, metadata: Optional[dict], body_offset: int) -> None:
+        with self.lock:
+            self._pending[f"{source}/{key}"] = None if metadata is None else (source, path, metadata, body_offset)
+
+    def _attach(self) -> None:
+        self.tasks.add_listener(lambda *args: self._queue('Tasks', *args))
+        self.notes.add_listener(lambda *args: self._queue('Knowledge', *args))
+        self._attached = True
+
+    @contextmanager
+    def synced(self):
+        """Attach on first use, apply file changes and hold the lock while querying"""
+        with self._attach_lock:
+            if not self._attached:
+                self._attach()
+        self.tasks.sync()
+        self.notes.sync()
+        with self.lock:
+            self._apply_pending()
+            yield
+
+    def _apply_pending(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        for key in pending:
+            self._remove_doc(key)
+        updates = [(key, entry) for key, entry in pending.items() if entry is not None]
+        reads = [(entry[1], entry[3]) for _, entry in updates]
+        if len(reads) >= PARALLEL_INGEST_MIN:
+            with ThreadPoolExecutor(max_workers=INGEST_READ_WORKERS) as pool:
+                texts = list(pool.map(lambda r: _read_document(*r), reads))
+        else:
+            texts = [_read_document(*r) for r in reads]
+        for (key, (source, path, metadata, body_offset)), text in zip(updates, texts):
+            if text is not None:
+                self._add_doc(key, source, path, metadata, body_offset, text)
+        self._applied()
+
+    def _applied(self) -> None:
+        """Hook run after a batch of pending documents was applied"""
+
+    def _remove_doc(self, key: str) -> None:
+        raise NotImplementedError
+
+    def _add_doc(self, key: str, source: str, path: Path, metadata: dict, body_offset: int, text: str) -> None:
+        raise NotImplementedError
+
+HEADING_RE = re.compile(r'^#\s+(.+)$', re.MULTILINE)
+
+def document_title(metadata: dict, text: str, path: Path) -> str:
+    """Frontmatter title, else the first '# ' heading, else the file stem"""
+    title = metadata.get('title')
+    if not title:
+        heading = HEADING_RE.search(text)
+        title = heading.group(1).strip() if heading else path.stem
+    return str(title)
+
+class SearchIndex(DocumentIndex):
+    """BM25 full-text index over task bodies and Knowledge/ notes.
+
+    Postings are compact append-only arrays; a changed document gets a new
+    id and its old id is masked until the postings are compacted. Scoring
+    uses NumPy when available.
+    """
+
+    def __init__(self, tasks: TaskIndex, notes: NoteIndex):
+        super().__init__(tasks, notes)
+        self._postings: Dict[str, tuple] = {}
+        self._doc_ids: Dict[str, int] = {}
+        self._docs: List[Optional[dict]] = []
+        self._lengths = array('I')
+        self._live_count = 0
+        self._total_length = 0
+        self._norms = None
+
+    def _remove_doc(self, key: str) -> None:
+        doc_id = self._doc_ids.pop(key, None)
+        if doc_id is not None:
+            self._total_length -= self._lengths[doc_id]
+            self._live_count -= 1
+            self._docs[doc_id] = None
+
+    def _add_doc(self, key: str, source: str, path: Path, metadata: dict, body_offset: int, text: str) -> None:
+        title = document_title(metadata, text, path)
+        counts = Counter(TOKEN_RE.findall(text.lower()))
+        doc_id = len(self._docs)
+        self._docs.append({
+            'key': key,
+            'source': source,
+            'path': path,
+            'body_offset': body_offset,
+            'title': title,
+            'title_lower': title.lower(),
+            'source_lower': source.lower(),
+            'category': str(metadata.get('category', '')).lower(),
+            'status': str(metadata.get('status', '')).lower(),
+            'tags': _note_tags(metadata),
+        })
+        length = sum(counts.values())
+        self._lengths.append(length)
+        for term, tf in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('I'), array('H'))
+            postings[0].append(doc_id)
+            postings[1].append(min(tf, 65535))
+        self._doc_ids[key] = doc_id
+        self._live_count += 1
+        self._total_length += length
+
+    def _applied(self) -> None:
+        if len(self._docs) > 2 * self._live_count + 1024:
+            self._compact()
+        self._norms = None
+
+    def _compact(self) -> None:
+        """Renumber live documents and drop postings of replaced ones"""
+        remap = {}
+        docs, lengths = [], array('I')
+        for doc_id, doc in enumerate(self._docs):
+            if doc is not None:
+                remap[doc_id] = len(docs)
+                docs.append(doc)
+                lengths.append(self._lengths[doc_id])
+        postings = {}
+        for term, (ids, tfs) in self._postings.items():
+            new_ids, new_tfs = array('I'), array('H')
+            for doc_id, tf in zip(ids, tfs):
+                new_id = remap.get(doc_id)
+                if new_id is not None:
+                    new_ids.append(new_id)
+                    new_tfs.append(tf)
+            if new_ids:
+                postings[term] = (new_ids, new_tfs)
+        self._docs, self._lengths, self._postings = docs, lengths, postings
+        self._doc_ids = {doc['key']: doc_id for doc_id, doc in enumerate(docs)}
+
+    def _score(self, terms: List[str]) -> tuple[List[int], List[float]]:
+        """BM25-ranked ids and scores of live documents containing any of terms"""
+        n = self._live_count
+        avgdl = self._total_length / n if n else 1.0
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+
+        if np is None:
+            scores: Dict[int, float] = {}
+            for term in set(terms):
+                ids, tfs = self._postings.get(term, ((), ()))
+                live = [(d, tf) for d, tf in zip(ids, tfs) if self._docs[d] is not None]
+                if not live:
+                    continue
+                idf = math.log(1 + (n - len(live) + 0.5) / (len(live) + 0.5))
+                for doc_id, tf in live:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc_id] / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+            ranked = sorted(scores.items(), key=lambda r: (-r[1], r[0]))
+            return [r[0] for r in ranked], [r[1] for r in ranked]
+
+        if self._norms is None:
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float64)
+            alive = np.fromiter((doc is not None for doc in self._docs), dtype=bool, count=len(self._docs))
+            self._norms = (BM25_K1 * (1 - BM25_B + BM25_B * lengths / avgdl), alive)
+        norms, alive = self._norms
+        totals = np.zeros(len(self._docs))
+        for term in set(terms):
+            ids, tfs = self._postings.get(term, ((), ()))
+            if not ids:
+                continue
+            ids = np.frombuffer(ids, dtype=np.uint32)
+            keep = alive[ids]
+            ids = ids[keep]
+            if not len(ids):
+                continue
+            tf = np.frombuffer(tfs, dtype=np.uint16)[keep].astype(np.float64)
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            totals[ids] += idf * tf * (BM25_K1 + 1) / (tf + norms[ids])
+        hits = np.nonzero(totals)[0]
+        order = hits[np.lexsort((hits, -totals[hits]))]
+        return order.tolist(), totals[order].tolist()
+
+    def search(self, query: str, filters: Optional[dict] = None, limit: int = 10) -> tuple[List[dict], int]:
+        """Rank documents for query; returns (results with snippets, total matches).
+
+        Phrase order is verified by reading candidates in rank order, so with
+        phrases the total also counts candidates beyond the returned page that
+        were not verified.
+        """
+        terms, phrases, query_filters = parse_search_query(query)
+        matches = compile_search_filters(dict(query_filters, **{k: v for k, v in (filters or {}).items() if v}))
+        required = {term for phrase in phrases for term in phrase}
+
+        with self.synced():
+            if terms or required:
+                ids, scores = self._score(terms + sorted(required))
+            else:
+                # Filter-only query: every live document is a candidate
+                ids = sorted(self._doc_ids.values())
+                scores = [0.0] * len(ids)
+            if required:
+                # Phrases need all their terms; word order is checked on read
+                candidates = set.intersection(*(set(self._postings.get(term, ((),))[0]) for term in required))
+            if required or matches is not None:
+                docs = [
+                    (self._docs[doc_id], score) for doc_id, score in zip(ids, scores)
+                    if (not required or doc_id in candidates) and (matches is None or matches(self._docs[doc_id]))
+                ]
+                total = len(docs)
+            else:
+                # Only the head of the ranking is needed (plus slack for unreadable files)
+                total = len(ids)
+                docs = [(self._docs[doc_id], score) for doc_id, score in zip(ids[:2 * limit + 16], scores)]
+
+        results = []
+        for doc, score in docs:
+            if len(results) >= limit:
+                break
+            text = _read_document(doc['path'], doc['body_offset'])
+            if text is None:
+                total -= 1
+                continue
+            if phrases:
+                normalized = f" {' '.join(TOKEN_RE.findall(text.lower()))} "
+                if not all(f" {' '.join(phrase)} " in normalized for phrase in phrases):
+                    total -= 1
+                    continue
+            results.append({
+                'path': doc['key'],
+                'source': doc['source_lower'],
+                'title': doc['title'],
+                'score': round(score, 4),
+                'snippet': make_snippet(text, terms + [t for p in phrases for t in p], phrases),
+            })
+        return results, total
+
+def compile_search_filters(filters: Dict[str, str]):
+    """Build a predicate over search documents from field filters"""
+    checks = []
+    for field, value in filters.items():
+        wanted = [v.strip().lower() for v in str(value).split(',') if v.strip()]
+        if not wanted:
+            continue
+        if field == 'title':
+            checks.append(lambda doc, wanted=wanted: any(w in doc['title_lower'] for w in wanted))
+        elif field == 'tags':
+            checks.append(lambda doc, wanted=set(wanted): not wanted.isdisjoint(doc['tags']))
+        else:
+            key = 'source_lower' if field == 'source' else field
+            checks.append(lambda doc, key=key, wanted=set(wanted): doc[key] in wanted)
+    if len(checks) <= 1:
+        return checks[0] if checks else None
+    return lambda doc: all(check(doc) for check in checks)
+
+def make_snippet(text: str, terms: List[str], phrases: List[List[str]]) -> str:
+    """Excerpt of text around the first phrase or term match"""
+    patterns = [r'\W+'.join(map(re.escape, phrase)) for phrase in phrases] + [re.escape(t) for t in terms]
+    match = None
+    if patterns:
+        match = re.search(r'\b(?:' + '|'.join(patterns) + r')\b', text, re.IGNORECASE)
+    if match is None:
+        snippet = text[:SEARCH_SNIPPET_CHARS]
+        prefix, suffix = '', '...' if len(text) > SEARCH_SNIPPET_CHARS else ''
+    else:
+        start = max(0, match.start() - SEARCH_SNIPPET_CHARS // 2)
+        end = min(len(text), start + SEARCH_SNIPPET_CHARS)
+        snippet = text[start:end]
+        prefix, suffix = '...' if start else '', '...' if end < len(text) else ''
+    return prefix + ' '.join(snippet.split()) + suffix
+
+WIKI_LINK_RE = re.compile(r'\[\[([^\[\]\n]+?)\]\]')
+
+def extract_links(metadata: dict, text: str) -> List[str]:
+    """Raw [[wiki link]] targets in text plus resource_refs from frontmatter"""
+    links = [m.group(1).split('|', 1)[0].split('#', 1)[0].strip() for m in WIKI_LINK_RE.finditer(text)]
+    refs = metadata.get('resource_refs') or []
+    if isinstance(refs, str):
+        refs = [refs]
+    links.extend(str(ref).strip() for ref in refs)
+    return [link for link in links if link]
+
+def normalize_link(link: str) -> str:
+    """Canonical form of a link target: a 'Tasks/...' or 'Knowledge/...' path,
+    or 'name:<stem>' for a bare note name resolved by filename"""
+    link = link.replace('\\', '/').strip().lstrip('./')
+    if not link.lower().endswith('.md'):
+        link += '.md'
+    if link.startswith(('Tasks/', 'Knowledge/')):
+        return link
+    if '/' in link:
+        return f"Knowledge/{link}"
+    return f"name:{link[:-3].lower()}"
+
+class LinkGraph(DocumentIndex):
+    """Graph of [[wiki links]] and resource_refs between tasks and notes.
+
+    Edges are stored as normalized targets, so links to notes that do not
+    exist yet resolve as soon as the note is created.
+    """
+
+    def __init__(self, tasks: TaskIndex, notes: NoteIndex):
+        super().__init__(tasks, notes)
+        self._titles: Dict[str, str] = {}
+        self._out: Dict[str, Dict[str, str]] = {}
+        self._in: Dict[str, set] = {}
+        self._by_name: Dict[str, set] = {}
+
+    def _remove_doc(self, key: str) -> None:
+        if self._titles.pop(key, None) is None:
+            return
+        for target in self._out.pop(key, {}):
+            sources = self._in.get(target)
+            if sources is not None:
+                sources.discard(key)
+                if not sources:
+                    del self._in[target]
+        name = f"name:{Path(key).stem.lower()}"
+        self._by_name[name].discard(key)
+        if not self._by_name[name]:
+            del self._by_name[name]
+
+    def _add_doc(self, key: str, source: str, path: Path, metadata: dict, body_offset: int, text: str) -> None:
+        self._titles[key] = document_title(metadata, text, path)
+        targets: Dict[str, str] = {}
+        for link in extract_links(metadata, text):
+            target = normalize_link(link)
+            if target != key:
+                targets.setdefault(target, link)
+        self._out[key] = targets
+        for target in targets:
+            self._in.setdefault(target, set()).add(key)
+        self._by_name.setdefault(f"name:{Path(key).stem.lower()}", set()).add(key)
+
+    def _resolve(self, target: str) -> Optional[str]:
+        """Document key a normalized target points to, if it exists"""
+        if target.startswith('name:'):
+            # Bare names prefer Knowledge/ notes, then the shortest path
+            keys = self._by_name.get(target)
+            if not keys:
+                return None
+            return min(keys, key=lambda k: (not k.startswith('Knowledge/'), len(k), k))
+        return target if target in self._titles else None
+
+    def _backlinks(self, key: str) -> set:
+        sources = set(self._in.get(key, ()))
+        name = f"name:{Path(key).stem.lower()}"
+        if name in self._in and self._resolve(name) == key:
+            sources |= self._in[name]
+        return sources
+
+    def resolve(self, path: str) -> Optional[str]:
+        """Resolve a tool argument (document path, task filename or note name)"""
+        with self.synced():
+            return self._resolve(normalize_link(path))
+
+    def backlinks(self, key: str) -> List[dict]:
+        with self.synced():
+            return [
+                {'path': source, 'title': self._titles[source], 'link': self._out[source].get(key) or
+                 self._out[source].get(f"name:{Path(key).stem.lower()}")}
+                for source in sorted(self._backlinks(key))
+            ]
+
+    def related(self, key: str, depth: int = 1) -> List[dict]:
+        """Documents within depth hops, following links in either direction"""
+        with self.synced():
+            distances = {key: 0}
+            frontier = [key]
+            for hop in range(1, depth + 1):
+                next_frontier = []
+                for node in frontier:
+                    neighbors = self._backlinks(node)
+                    neighbors.update(filter(None, map(self._resolve, self._out.get(node, ()))))
+                    for neighbor in neighbors:
+                        if neighbor not in distances:
+                            distances[neighbor] = hop
+                            next_frontier.append(neighbor)
+                frontier = next_frontier
+            return [
+                {'path': node, 'title': self._titles[node], 'distance': distance}
+                for node, distance in sorted(distances.items(), key=lambda d: (d[1], d[0])) if node != key
+            ]
+
+    def broken_links(self) -> List[dict]:
+        with self.synced():
+            broken = []
+            for target, sources in self._in.items():
+                if self._resolve(target) is None:
+                    for source in sources:
+                        broken.append({'source': source, 'link': self._out[source][target]})
+            return sorted(broken, key=lambda b: (b['source'], b['link']))
+
+# Bytes before a backlog checkpoint that are hashed to detect rewrites
+BACKLOG_HASH_WINDOW = 4096
+
+def parse_backlog_lines(lines: List[str], current_item: Optional[dict] = None,
+                        offsets: Optional[List[int]] = None) -> tuple[List[dict], Optional[dict]]:
+    """Parse '- item' lines and their indented '  - subitem' lines.
+
+    current_item is an item left open by a previous chunk; subitems at the
+    start of lines are attached to it (and it is returned again if any are).
+    When offsets are given, each new item records the byte offset of its line.
+    Returns (items, open_item).
+    """
+    items = []
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped.startswith('- '):
+            continue
+        if line[:1] in (' ', '\t') and current_item is not None:
+            if not current_item['subitems'] and current_item.get('continued') and current_item not in items:
+                items.append(current_item)
+            current_item['subitems'].append(stripped[2:])
+            continue
+        current_item = {'text': stripped[2:], 'subitems': []}
+        if offsets is not None:
+            current_item['offset'] = offsets[i]
+        items.append(current_item)
+    return items, current_item
+
+class BacklogFile:
+    """Cached view of BACKLOG.md.
+
+    The full text is re-read only when the file changes, and the item count
+    is maintained incrementally: when the file only grew, just the appended
+    bytes are scanned.
+    """
+
+    def __init__(self, path: Path, cache_dir: Path):
+        self.path = path
+        self.cache_dir = cache_dir
+        self._stat: Optional[tuple] = None
+        self._content: Optional[str] = None
+        # Incremental '-' line count up to _count_offset (a line boundary)
+        self._count_stat: Optional[tuple] = None
+        self._count_offset = 0
+        self._count_hash = ''
+        self._count = 0
+        self._tail_count = 0
+        self._lock = threading.RLock()
+        self.watched = False
+        # Bumped whenever read() sees different file contents
+        self.generation = 0
+
+    def read(self) -> Optional[str]:
+        """Return the stripped backlog text, or None if the file is missing"""
+        with self._lock:
+            if self.watched and self._stat is not None:
+                return self._content
+            try:
+                st = self.path.stat()
+            except OSError:
+                if self._stat != (None, None):
+                    self.generation += 1
+                self._stat, self._content = (None, None), None
+                return None
+            stat_key = (st.st_mtime_ns, st.st_size)
+            METRICS.cache('backlog', hits=int(stat_key == self._stat), misses=int(stat_key != self._stat))
+            if stat_key != self._stat:
+                with open(self.path, 'r') as f:
+                    content = f.read().strip()
+                if content != self._content:
+                    self.generation += 1
+                self._content = content
+                self._stat = stat_key
+            return self._content
+
+    def window_hash(self, f, offset: int) -> str:
+        """Hash of the bytes just before offset in an open binary file"""
+        start = max(0, offset - BACKLOG_HASH_WINDOW)
+        f.seek(start)
+        return hashlib.sha256(f.read(offset - start)).hexdigest()
+
+    def read_lines_from(self, offset: int) -> tuple[List[str], List[int], int]:
+        """Read complete lines appended after offset.
+
+        Returns (lines, line_offsets, end_offset); a trailing line without a
+        newline is left for the next call since it may still be growing.
+        """
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        lines, offsets = [], []
+        position = offset
+        for raw in data[:end].splitlines(keepends=True):
+            lines.append(raw.decode('utf-8', errors='replace').rstrip('\r\n'))
+            offsets.append(position)
+            position += len(raw)
+        return lines, offsets, offset + end
+
+    def item_count(self) -> int:
+        """Number of '-' lines in the backlog (0 once it reads 'all done!')"""
+        with self._lock:
+            if self.watched and self._count_stat is not None:
+                return self._count + self._tail_count
+            try:
+                st = self.path.stat()
+            except OSError:
+                self._count_stat, self._count_offset, self._count, self._tail_count = (None, None), 0, 0, 0
+                return 0
+            stat_key = (st.st_mtime_ns, st.st_size)
+            if stat_key == self._count_stat:
+                return self._count + self._tail_count
+
+            with open(self.path, 'rb') as f:
+                # Only appended bytes need counting if the counted prefix is intact
+                if st.st_size < self._count_offset or self.window_hash(f, self._count_offset) != self._count_hash:
+                    self._count_offset, self._count = 0, 0
+                f.seek(self._count_offset)
+                data = f.read()
+            end = data.rfind(b'\n') + 1
+            self._count += sum(1 for line in data[:end].splitlines() if line.strip().startswith(b'-'))
+            self._tail_count = 1 if data[end:].strip().startswith(b'-') else 0
+            self._count_offset += end
+            with open(self.path, 'rb') as f:
+                self._count_hash = self.window_hash(f, self._count_offset)
+            self._count_stat = stat_key
+            return self._count + self._tail_count
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._stat = None
+            self._count_stat = None
+
+    @property
+    def checkpoint_path(self) -> Path:
+        return self.cache_dir / 'backlog_checkpoint.json'
+
+    def load_checkpoint(self) -> dict:
+        """Return the saved checkpoint, or a fresh one if missing or stale"""
+        fresh = {'offset': 0, 'hash': '', 'last_item': None}
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                checkpoint = json.load(f)
+            offset = int(checkpoint['offset'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return fresh
+        try:
+            with open(self.path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if offset > size or self.window_hash(f, offset) != checkpoint.get('hash'):
+                    # The acknowledged prefix was rewritten; start over
+                    return dict(fresh, reset=True)
+        except OSError:
+            return fresh
+        return checkpoint
+
+    def save_checkpoint(self, offset: int, last_item: Optional[str]) -> None:
+        with open(self.path, 'rb') as f:
+            checkpoint = {'offset': offset, 'hash': self.window_hash(f, offset), 'last_item': last_item}
+        self.checkpoint_path.parent.mkdir(exist_ok=True, parents=True)
+        tmp_path = self.checkpoint_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def clear_checkpoint(self) -> None:
+        self.checkpoint_path.unlink(missing_ok=True)
+
+# Frontmatter fields copied into the archive index for searching
+ARCHIVE_INDEX_FIELDS = ('title', 'category', 'priority', 'estimated_time', 'due_date')
+
+class TaskArchive:
+    """Append-only compressed archive of completed tasks.
+
+    Tasks are appended to a yearly LZMA zip pack (Archive/tasks-YYYY.zip) and
+    recorded in Archive/index.jsonl, so searches never open a pack and a
+    restore decompresses just one member. Restores are appended to the index
+    as separate records rather than rewriting it.
+    """
+
+    def __init__(self, archive_dir: Path, tasks: TaskIndex):
+        self.archive_dir = archive_dir
+        self.tasks = tasks
+        self.index_path = archive_dir / 'index.jsonl'
+        self._entries: Dict[str, dict] = {}
+        self._index_stat: Optional[tuple] = None
+        self._index_offset = 0
+        self._lock = threading.RLock()
+
+    def _read_index(self) -> None:
+        """Load index records appended since the last read"""
+        try:
+            st = self.index_path.stat()
+        except OSError:
+            self._entries, self._index_stat, self._index_offset = {}, None, 0
+            return
+        stat_key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if stat_key == self._index_stat:
+            return
+        if self._index_stat is None or st.st_ino != self._index_stat[2] or st.st_size < self._index_offset:
+            self._entries, self._index_offset = {}, 0
+        with open(self.index_path, 'rb') as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.error(f"Skipping corrupt line in {self.index_path}")
+                continue
+            if 'restored_at' in record:
+                self._entries.pop(record['member'], None)
+            else:
+                self._entries[record['member']] = record
+        self._index_offset += end
+        self._index_stat = stat_key
+
+    def _append_index(self, records: List[dict]) -> None:
+        with open(self.index_path, 'a') as f:
+            for record in records:
+                f.write(json.dumps(record, default=json_default) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def archive(self, entries: List[tuple]) -> tuple[List[str], Dict[str, str]]:
+        """Move (task, mtime) entries into the current pack.
+
+        Each task is written to the pack and indexed before its file is
+        removed, so a crash can at worst leave a task both archived and in
+        Tasks/. Returns (archived filenames, {filename: error}).
+        """
+        archived, errors = [], {}
+        if not entries:
+            return archived, errors
+        now = datetime.now()
+        pack = f"tasks-{now.year}.zip"
+        with self._lock, file_lock(self.index_path):
+            self.archive_dir.mkdir(exist_ok=True, parents=True)
+            records, sources = [], []
+            import zipfile
+            with zipfile.ZipFile(self.archive_dir / pack, 'a', compression=zipfile.ZIP_LZMA) as zf:
+                existing = set(zf.namelist())
+                for task, mtime in entries:
+                    filename = task['filename']
+                    task_file = self.tasks.path(filename)
+                    member = f"{now:%Y%m%dT%H%M%S}/{filename}"
+                    suffix = 1
+                    while member in existing:
+                        suffix += 1
+                        member = f"{now:%Y%m%dT%H%M%S}-{suffix}/{filename}"
+                    try:
+                        with open(task_file, 'rb') as f:
+                            zf.writestr(member, f.read())
+                    except OSError as e:
+                        errors[filename] = str(e)
+                        continue
+                    existing.add(member)
+                    record = {'member': member, 'pack': pack, 'filename': filename}
+                    record.update({k: task[k] for k in ARCHIVE_INDEX_FIELDS if task.get(k) is not None})
+                    record['completed_at'] = datetime.fromtimestamp(mtime).isoformat(timespec='seconds')
+                    record['archived_at'] = now.isoformat(timespec='seconds')
+                    records.append(record)
+                    sources.append(task_file)
+            with open(self.archive_dir / pack, 'rb') as f:
+                os.fsync(f.fileno())
+            self._append_index(records)
+
+        for task_file in sources:
+            try:
+                with file_lock(task_file):
+                    task_file.unlink()
+                archived.append(task_file.name)
+            except OSError as e:
+                errors[task_file.name] = str(e)
+        return archived, errors
+
+    def search(self, query: str = '', filters: Optional[dict] = None, limit: int = 50) -> tuple[List[dict], int]:
+        """Match archive index records by title/filename substring and fields"""
+        filters = filters or {}
+        query = query.lower()
+        with self._lock:
+            self._read_index()
+            records = list(self._entries.values())
+        matches = []
+        for record in records:
+            if query and query not in str(record.get('title', '')).lower() and query not in record['filename'].lower():
+                continue
+            if any(value and str(record.get(field)) not in value.split(',') for field, value in filters.items()):
+                continue
+            matches.append(record)
+        matches.sort(key=lambda r: r['archived_at'], reverse=True)
+        return [dict(r) for r in matches[:limit]], len(matches)
+
+    def resolve(self, name: str) -> Optional[dict]:
+        """Find an entry by member name, or the latest archived copy of a filename"""
+        if not name.endswith('.md'):
+            name += '.md'
+        with self._lock:
+            self._read_index()
+            if name in self._entries:
+                return self._entries[name]
+            candidates = [r for r in self._entries.values() if r['filename'] == name]
+        return max(candidates, key=lambda r: r['archived_at'], default=None)
+
+    def read(self, record: dict) -> bytes:
+        """Decompress a single archived task"""
+        import zipfile
+        with zipfile.ZipFile(self.archive_dir / record['pack']) as zf:
+            return zf.read(record['member'])
+
+    def mark_restored(self, record: dict) -> None:
+        with self._lock, file_lock(self.index_path):
+            self._append_index([{'member': record['member'], 'restored_at': datetime.now().isoformat(timespec='seconds')}])
+
+# Built-in category keywords, used when config.yaml has no category_keywords.
+# Categories are tried in order; the first with a keyword in the item wins.
+DEFAULT_CATEGORY_KEYWORDS = {
+    'outreach': ['email', 'contact', 'reach out', 'follow up', 'meeting', 'call'],
+    'technical': ['code', 'api', 'database', 'deploy', 'fix', 'bug', 'implement'],
+    'research': ['research', 'study', 'learn', 'understand', 'investigate'],
+    'writing': ['write', 'draft', 'document', 'blog', 'article', 'proposal'],
+    'admin': ['expense', 'invoice', 'schedule', 'calendar', 'organize'],
+    'marketing': ['tweet', 'post', 'linkedin', 'social', 'twitter', 'marketing', 'blog'],
+}
+
+# Active-task thresholds for check_priority_limits (config.yaml priority_limits overrides)
+DEFAULT_PRIORITY_LIMITS = {'P0': 3, 'P1': 5, 'P2': 10}
+
+class CategoryClassifier:
+    """Keyword table compiled to one regex per category.
+
+    Keywords match as lowercase substrings, as plain `in` checks would, but
+    each category is a single C-level scan instead of one scan per keyword.
+    """
+
+    def __init__(self, keywords: Dict[str, List[str]]):
+        self.categories = list(keywords)
+        self._patterns = []
+        for category, words in keywords.items():
+            words = sorted({w for w in words if w}, key=len, reverse=True)
+            if words:
+                self._patterns.append((category, re.compile('|'.join(map(re.escape, words)))))
+
+    def classify(self, item: str) -> str:
+        item_lower = item.lower()
+        for category, pattern in self._patterns:
+            if pattern.search(item_lower):
+                return category
+        return 'other'
+
+    def classify_many(self, items: List[str]) -> List[str]:
+        """classify() over a batch, scanning repeated lines once"""
+        seen: Dict[str, str] = {}
+        results = []
+        for item in items:
+            category = seen.get(item)
+            if category is None:
+                category = seen[item] = self.classify(item)
+            results.append(category)
+        return results
+
+class ServerConfig:
+    """Settings from the optional config.yaml in the workspace root.
+
+    The file is re-parsed only when its mtime or size changes, so edits take
+    effect on the next tool call without a restart. A file that fails to
+    parse is logged and the last good settings stay in use.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._stat: Optional[tuple] = None
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._apply({})
+
+    def _apply(self, data: dict) -> None:
+        keywords = data.get('category_keywords')
+        if isinstance(keywords, dict) and keywords:
+            table = {}
+            for category, words in keywords.items():
+                words = [words] if isinstance(words, str) else (words or [])
+                table[str(category)] = [str(w).lower().strip() for w in words]
+        else:
+            table = DEFAULT_CATEGORY_KEYWORDS
+        classifier = CategoryClassifier(table)
+
+        dedup = data.get('deduplication')
+        dedup = {**DEDUP_CONFIG, **(dedup if isinstance(dedup, dict) else {})}
+        dedup['similarity_threshold'] = float(dedup['similarity_threshold'])
+
+        limits = data.get('priority_limits')
+        limits = {**DEFAULT_PRIORITY_LIMITS, **(limits if isinstance(limits, dict) else {})}
+        limits = {str(p): int(n) for p, n in limits.items() if n is not None}
+
+        self._classifier, self._dedup, self._priority_limits = classifier, dedup, limits
+        self.generation += 1
+
+    def sync(self) -> None:
+        with self._lock:
+            try:
+                st = self.path.stat()
+                stat_key = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                stat_key = None
+            if stat_key == self._stat:
+                return
+            self._stat = stat_key
+            if stat_key is None:
+                self._apply({})
+                return
+            try:
+                with open(self.path, 'r') as f:
+                    data = yaml.load(f, Loader=YAML_LOADER) or {}
+                if not isinstance(data, dict):
+                    raise ValueError("top level is not a mapping")
+                self._apply(data)
+                logger.info(f"Loaded configuration from {self.path}")
+            except Exception as e:
+                logger.error(f"Ignoring invalid {self.path.name}: {e}")
+
+    def classifier(self) -> CategoryClassifier:
+        self.sync()
+        return self._classifier
+
+    def dedup_config(self) -> dict:
+        self.sync()
+        return self._dedup
+
+    def priority_limits(self) -> Dict[str, int]:
+        self.sync()
+        return self._priority_limits
+
+# MANAGER_AI_CACHE=0 disables the on-disk caches
+_cache_enabled = os.environ.get('MANAGER_AI_CACHE', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+# Optional live watch mode: MANAGER_AI_WATCH=1|auto|inotify|poll
+_watch_setting = os.environ.get('MANAGER_AI_WATCH', '').strip().lower()
+WATCH_MODE = None if _watch_setting in ('', '0', 'false', 'no', 'off') else ('poll' if _watch_setting == 'poll' else 'auto')
+
+# Extra named workspaces, MANAGER_AI_WORKSPACES="work=/path/a:personal=/path/b"
+# (os.pathsep-separated); the MANAGER_AI_BASE_DIR workspace is always "default"
+DEFAULT_WORKSPACE = 'default'
+WORKSPACE_MEMORY_MB = float(os.environ.get('MANAGER_AI_MEMORY_MB', '1024') or 0)
+# Rough footprint of one indexed task or note with every index built
+WORKSPACE_BYTES_PER_DOC = 6 * 1024
+
+class Workspace:
+    """One vault: its directories plus the indexes and caches built over them"""
+
+    def __init__(self, name: str, base_dir: Path):
+        self.name = name
+        self.base_dir = base_dir
+        self.tasks_dir = base_dir / 'Tasks'
+        self.cache_dir = base_dir / '.mcp_cache'
+        self.snapshot_path = self.cache_dir / 'index.snapshot'
+        self.task_index = TaskIndex(self.tasks_dir, cache=MetadataCache(self.cache_dir / 'tasks.sqlite') if _cache_enabled else None)
+        self.backlog = BacklogFile(base_dir / 'BACKLOG.md', self.cache_dir)
+        self.archive = TaskArchive(base_dir / 'Archive', self.task_index)
+        self.knowledge = NoteIndex(base_dir / 'Knowledge')
+        self.search_index = SearchIndex(self.task_index, self.knowledge)
+        self.link_graph = LinkGraph(self.task_index, self.knowledge)
+        self.config = ServerConfig(base_dir / 'config.yaml')
+        self.watcher: Optional['TaskWatcher'] = None
+        # Per-instance base so generations of an evicted and reopened
+        # workspace (or an earlier server run) never match current ones
+        self._generation_base = time.time_ns() // 1000
+        self.active_calls = 0
+        self.last_used = time.monotonic()
+        self._opened = False
+        self._open_lock = threading.Lock()
+
+    def generation(self) -> int:
+        """Sum of the change counters of everything read-only tools depend on"""
+        self.backlog.read()
+        self.config.sync()
+        return self._generation_base + self.task_index.generation + self.backlog.generation + self.config.generation
+
+    def estimated_bytes(self) -> int:
+        return (len(self.task_index) + len(self.knowledge)) * WORKSPACE_BYTES_PER_DOC
+
+    def open(self) -> None:
+        """Start serving: seed the index from its snapshot and watch if configured"""
+        self.tasks_dir.mkdir(exist_ok=True, parents=True)
+        # Answer first requests from the last shutdown's snapshot while it is re-checked
+        snapshot_loaded = _cache_enabled and self.task_index.load_snapshot(self.snapshot_path)
+        if WATCH_MODE:
+            self.watcher = TaskWatcher(self.task_index, self.backlog, mode=WATCH_MODE, notes=self.knowledge)
+            self.watcher.start()
+        if snapshot_loaded:
+            self.task_index.validate_in_background()
+
+    def ensure_open(self) -> None:
+        """open() once; concurrent first callers wait for it instead of racing"""
+        with self._open_lock:
+            if not self._opened:
+                logger.info(f"Opening workspace {self.name}: {self.base_dir}")
+                self.open()
+                self._opened = True
+
+    def close(self) -> None:
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+        if _cache_enabled:
+            self.task_index.save_snapshot(self.snapshot_path)
+        if self.task_index.cache is not None:
+            with self.task_index._lock:
+                self.task_index.cache.close()
+
+class WorkspaceRegistry:
+    """Named workspaces, opened on first use.
+
+    When the open workspaces' estimated footprint exceeds
+    MANAGER_AI_MEMORY_MB, the least recently used idle ones are closed
+    (snapshot saved, watcher stopped) and dropped; the next call reopens
+    them from their snapshot. The default workspace is never evicted.
+    """
+
+    def __init__(self, default_dir: Path, paths: Dict[str, Path], memory_budget: int):
+        self.paths = {DEFAULT_WORKSPACE: default_dir, **paths}
+        self.memory_budget = memory_budget
+        self.default = Workspace(DEFAULT_WORKSPACE, default_dir)
+        self._open: Dict[str, Workspace] = {DEFAULT_WORKSPACE: self.default}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse(spec: str) -> Dict[str, Path]:
+        paths = {}
+        for entry in spec.split(os.pathsep):
+            name, sep, path = entry.partition('=')
+            if sep and name.strip() and path.strip():
+                paths[name.strip()] = Path(path.strip()).expanduser()
+        return paths
+
+    @contextmanager
+    def use(self, name: Optional[str]):
+        """Yield the named (default: default) workspace for the duration of a call"""
+        name = name or DEFAULT_WORKSPACE
+        with self._lock:
+            workspace = self._open.get(name)
+            if workspace is None:
+                if name not in self.paths:
+                    raise ValueError(f"Unknown workspace: {name} (configured: {', '.join(self.paths)})")
+                workspace = self._open[name] = Workspace(name, self.paths[name])
+            workspace.active_calls += 1
+        try:
+            # The default workspace is opened by main()
+            if workspace is not self.default:
+                workspace.ensure_open()
+            yield workspace
+        finally:
+            with self._lock:
+                workspace.active_calls -= 1
+                workspace.last_used = time.monotonic()
+                evicted = self._evict()
+            for idle in evicted:
+                logger.info(f"Closing idle workspace {idle.name} to stay within the memory budget")
+                idle.close()
+                RESPONSES.discard(idle.name)
+
+    def _evict(self) -> List[Workspace]:
+        """Drop LRU idle workspaces until within budget (caller holds the lock)"""
+        evicted = []
+        total = sum(ws.estimated_bytes() for ws in self._open.values())
+        idle = sorted((ws for ws in self._open.values() if ws.active_calls == 0 and ws is not self.default),
+                      key=lambda ws: ws.last_used)
+        for workspace in idle:
+            if total <= self.memory_budget:
+                break
+            total -= workspace.estimated_bytes()
+            del self._open[workspace.name]
+            evicted.append(workspace)
+        return evicted
+
+    def status(self) -> List[dict]:
+        with self._lock:
+            return [{
+                "name": name,
+                "base_dir": str(path),
+                "open": name in self._open,
+                "estimated_mb": round(self._open[name].estimated_bytes() / (1024 * 1024), 1) if name in self._open else 0
+            } for name, path in self.paths.items()]
+
+    def close(self, name: str) -> None:
+        """Close and drop a named workspace now (it must be idle); the next call reopens it"""
+        with self._lock:
+            workspace = self._open.pop(name, None) if name != DEFAULT_WORKSPACE else None
+        if workspace is not None:
+            workspace.close()
+            RESPONSES.discard(name)
+
+    def close_all(self) -> None:
+        with self._lock:
+            workspaces = list(self._open.values())
+        for workspace in workspaces:
+            workspace.close()
+
+WORKSPACES = WorkspaceRegistry(BASE_DIR, WorkspaceRegistry.parse(os.environ.get('MANAGER_AI_WORKSPACES', '')),
+                               int(WORKSPACE_MEMORY_MB * 1024 * 1024))
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                 IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+class TaskWatcher:
+    """Keeps a workspace's task index, backlog and notes live by applying filesystem events.
 
-# Duplicate detection configuration
-DEDUP_CONFIG = {
-    "similarity_threshold": 0.6,  # How similar before flagging as potential duplicate
-    "check_categories": True,     # Same category increases similarity score
-}
+    Uses inotify on Linux and falls back to a background polling thread
+    elsewhere. While running, tool calls read the in-process state directly
+    instead of stat-ing every task file.
+    """
 
-def parse_yaml_frontmatter(content: str) -> tuple[dict, str]:
-    """Parse YAML frontmatter from markdown content"""
-    if not content.startswith('---'):
-        return {}, content
-    
-    try:
-        parts = content.split('---', 2)[1:]
-        if len(parts) >= 1:
-            metadata = yaml.safe_load(parts[0])
-            body = parts[1] if len(parts) > 1 else ''
-            return metadata or {}, body
-    except Exception as e:
-        logger.error(f"Error parsing YAML: {e}")
-        return {}, content
+    def __init__(self, index: TaskIndex, backlog: BacklogFile, mode: str = 'auto', interval: float = 1.0,
+                 notes: Optional[NoteIndex] = None):
+        self.index = index
+        self.backlog = backlog
+        self.notes = notes
+        self.mode = mode
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._fd: Optional[int] = None
+        self._libc = None
+        self._wds: Dict[int, Path] = {}
+
+    def start(self) -> str:
+        """Start watching and return the mode actually used"""
+        if self.mode != 'poll' and sys.platform.startswith('linux'):
+            try:
+                self._init_inotify()
+                self.mode = 'inotify'
+            except OSError as e:
+                logger.warning(f"inotify unavailable ({e}), falling back to polling")
+                self.mode = 'poll'
+        else:
+            self.mode = 'poll'
+
+        # Full pass before going live so no event is lost in between (a
+        # snapshot-loaded index gets its pass from the background validation)
+        if not self.index.validating:
+            self.index.refresh()
+        self.backlog.invalidate()
+        self.index.watched = True
+        self.backlog.watched = True
+        if self.notes is not None:
+            self.notes.refresh()
+            self.notes.watched = True
+
+        target = self._run_inotify if self.mode == 'inotify' else self._run_poll
+        self._thread = threading.Thread(target=target, name='task-watcher', daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {self.index.tasks_dir} ({self.mode})")
+        return self.mode
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self.index.watched = False
+        self.backlog.watched = False
+        if self.notes is not None:
+            self.notes.watched = False
+
+    def _init_inotify(self) -> None:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._libc = libc
+        self._fd = fd
+        self._add_watch(self.backlog.path.parent)
+        self._add_task_watches()
+        if self.notes is not None:
+            self._add_note_watches(self.notes.root)
+
+    def _add_watch(self, path: Path) -> None:
+        if not path.is_dir():
+            return
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(path)), IN_WATCH_MASK)
+        if wd < 0:
+            import ctypes
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(path))
+        self._wds[wd] = path
+
+    def _add_task_watches(self) -> None:
+        """Watch Tasks/ and its shard directories"""
+        tasks_dir = self.index.tasks_dir
+        if not tasks_dir.is_dir():
+            return
+        watched = set(self._wds.values())
+        layout = TaskLayout.load(tasks_dir)
+        for path in [tasks_dir] + [p for p in tasks_dir.iterdir() if layout.is_shard_dir(p.name) and p.is_dir()]:
+            if path not in watched:
+                self._add_watch(path)
+
+    def _is_task_dir(self, path: Path) -> bool:
+        return path == self.index.tasks_dir or path.parent == self.index.tasks_dir
+
+    def _add_note_watches(self, root: Path) -> None:
+        """Watch a notes directory and all its subdirectories"""
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            if Path(dirpath) not in self._wds.values():
+                self._add_watch(Path(dirpath))
+
+    def _is_note_dir(self, path: Path) -> bool:
+        return self.notes is not None and (path == self.notes.root or self.notes.root in path.parents)
+
+    def _run_inotify(self) -> None:
+        header = struct.Struct('iIII')
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._fd], [], [], self.interval)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            except OSError:
+                break
+
+            offset = 0
+            while offset + header.size <= len(data):
+                wd, mask, _cookie, length = header.unpack_from(data, offset)
+                offset += header.size
+                name = data[offset:offset + length].rstrip(b'\0').decode(errors='surrogateescape')
+                offset += length
+                try:
+                    self._handle_event(wd, mask, name)
+                except Exception as e:
+                    logger.error(f"Error applying file event for {name}: {e}")
+
+    def _handle_event(self, wd: int, mask: int, name: str) -> None:
+        if mask & IN_Q_OVERFLOW:
+            # Events were dropped by the kernel; resync everything
+            self.index.refresh()
+            self.backlog.invalidate()
+            if self.notes is not None:
+                self.notes.refresh()
+            return
+
+        path = self._wds.get(wd)
+        if path is None:
+            return
+
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+            self._wds.pop(wd, None)
+            if self._is_task_dir(path):
+                self.index.refresh()
+            elif self._is_note_dir(path):
+                self.notes.refresh()
+            return
+
+        if self._is_task_dir(path):
+            if mask & IN_ISDIR:
+                # A shard directory appeared or vanished
+                self._add_task_watches()
+                self.index.refresh()
+            else:
+                self.index.apply_change((path / name).relative_to(self.index.tasks_dir).as_posix())
+        elif self._is_note_dir(path):
+            if mask & IN_ISDIR:
+                # A directory appeared or vanished: watch new subtrees and resync
+                if (path / name).is_dir():
+                    self._add_note_watches(path / name)
+                self.notes.refresh()
+            else:
+                self.notes.apply_change((path / name).relative_to(self.notes.root).as_posix())
+        elif name == self.backlog.path.name:
+            self.backlog.invalidate()
+        elif name == self.index.tasks_dir.name and self.index.tasks_dir.is_dir():
+            # Tasks/ was (re)created, e.g. by a git checkout
+            self._add_task_watches()
+            self.index.refresh()
+        elif self.notes is not None and name == self.notes.root.name and self.notes.root.is_dir():
+            self._add_note_watches(self.notes.root)
+            self.notes.refresh()
+
+    def _run_poll(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.index.refresh()
+                self.backlog.invalidate()
+                if self.notes is not None:
+                    self.notes.refresh()
+            except Exception as e:
+                logger.error(f"Error polling {self.index.tasks_dir}: {e}")
 
-def get_all_tasks() -> List[Dict[str, Any]]:
-    """Get all tasks from the Tasks directory"""
-    tasks = []
-    if not TASKS_DIR.exists():
+def filter_tasks(tasks: List[Dict[str, Any]], arguments: Optional[dict]) -> List[Dict[str, Any]]:
+    """Apply list_tasks-style category/priority/status/include_done filters"""
+    if not arguments or not arguments.get('include_done', False):
+        tasks = [t for t in tasks if t.get('status') != 'd']
+    if not arguments:
         return tasks
     
-    for task_file in TASKS_DIR.glob('*.md'):
-        try:
-            with open(task_file, 'r') as f:
-                content = f.read()
-                metadata, body = parse_yaml_frontmatter(content)
-                if metadata:
-                    metadata['filename'] = task_file.name
-                    metadata['body_content'] = body[:500] if body else ''
-                    tasks.append(metadata)
-        except Exception as e:
-            logger.error(f"Error reading {task_file}: {e}")
+    if arguments.get('category'):
+        categories = [c.strip() for c in arguments['category'].split(',')]
+        tasks = [t for t in tasks if t.get('category') in categories]
+    
+    if arguments.get('priority'):
+        priorities = [p.strip() for p in arguments['priority'].split(',')]
+        tasks = [t for t in tasks if t.get('priority') in priorities]
+    
+    if arguments.get('status'):
+        statuses = [s.strip() for s in arguments['status'].split(',')]
+        tasks = [t for t in tasks if t.get('status') in statuses]
     
     return tasks
 
-def calculate_similarity(text1: str, text2: str) -> float:
-    """Calculate similarity between two strings (0-1 score)"""
-    return SequenceMatcher(None, text1.lower(), text2.lower()).ratio()
+SORT_FIELDS = ('priority', 'estimated_time', 'due_date')
+LIST_TASKS_MAX_LIMIT = 1000
+PRIORITY_RANK = {'P0': 0, 'P1': 1, 'P2': 2, 'P3': 3}
 
-def extract_keywords(text: str) -> set:
-    """Extract meaningful keywords from text"""
-    # Remove common words and extract meaningful terms
-    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'with', 'from', 'up', 'out'}
-    words = re.findall(r'\b\w+\b', text.lower())
-    return {w for w in words if w not in stop_words and len(w) > 2}
+def task_sort_key(task: Dict[str, Any], sort_by: Optional[str]) -> list:
+    """JSON-safe, totally ordered sort key; tasks missing the field sort last"""
+    filename = task.get('filename', '')
+    if not sort_by:
+        return [filename]
+    value = task.get(sort_by)
+    if value is None:
+        return [1, 0, '', filename]
+    if sort_by == 'priority':
+        return [0, PRIORITY_RANK.get(value, len(PRIORITY_RANK)), str(value), filename]
+    if sort_by == 'estimated_time':
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return [0, value, '', filename]
+        return [1, 0, str(value), filename]
+    # due_date: YAML dates and ISO strings both order correctly as ISO text
+    return [0, 0, value.isoformat() if isinstance(value, (date, datetime)) else str(value), filename]
 
-def find_similar_tasks(item: str, existing_tasks: List[Dict[str, Any]], config: dict = DEDUP_CONFIG) -> List[Dict[str, Any]]:
-    """Find tasks similar to the given item"""
-    similar = []
-    item_keywords = extract_keywords(item)
-    
-    for task in existing_tasks:
-        # Skip completed tasks
-        if task.get('status') == 'd':
-            continue
-            
-        # Calculate title similarity
-        title = task.get('title', '')
-        title_similarity = calculate_similarity(item, title)
-        
-        # Calculate keyword overlap
-        task_keywords = extract_keywords(title)
-        if item_keywords and task_keywords:
-            keyword_overlap = len(item_keywords & task_keywords) / len(item_keywords | task_keywords)
-        else:
-            keyword_overlap = 0
-        
-        # Combined score
-        similarity_score = (title_similarity * 0.7) + (keyword_overlap * 0.3)
-        
-        # Check if it's a potential duplicate
-        if similarity_score >= config['similarity_threshold']:
-            similar.append({
-                'title': title,
-                'filename': task.get('filename', ''),
-                'category': task.get('category', ''),
-                'status': task.get('status', ''),
-                'similarity_score': round(similarity_score, 2)
-            })
-    
-    # Sort by similarity score
-    similar.sort(key=lambda x: x['similarity_score'], reverse=True)
-    return similar[:3]  # Return top 3 matches
+def encode_cursor(sort_by: Optional[str], descending: bool, key: list) -> str:
+    payload = json.dumps({'sort_by': sort_by, 'desc': descending, 'after': key}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a list_tasks cursor; raises ValueError if it is malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(payload.get('after'), list):
+            raise ValueError
+        return payload
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def json_default(value: Any) -> Any:
+    """Serialize frontmatter values json can't handle (e.g. YAML dates, task records)"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, TaskRecord):
+        return value.to_dict()
+    return str(value)
+
+VAGUE_PATTERNS = [re.compile(pattern) for pattern in (
+    r'^(fix|update|improve|check|review|look at|work on)\s+(the|a|an)?\s*\w+$',  # "fix bug", "update docs"
+    r'^\w+\s+(stuff|thing|issue|problem)$',  # "database stuff", "API thing"
+    r'^(follow up|reach out|contact|email)$',  # Missing who/what
+    r'^(investigate|research|explore)\s*\w{0,20}$',  # Too broad
+)]
+
+# Characters stripped from, and runs collapsed in, backlog items used as filenames
+UNSAFE_FILENAME_CHARS_RE = re.compile(r'[^\w\s-]')
+FILENAME_SEPARATORS_RE = re.compile(r'[-\s]+')
 
 def is_ambiguous(item: str) -> bool:
     """Check if an item is too vague or ambiguous"""
-    vague_patterns = [
-        r'^(fix|update|improve|check|review|look at|work on)\s+(the|a|an)?\s*\w+$',  # "fix bug", "update docs"
-        r'^\w+\s+(stuff|thing|issue|problem)$',  # "database stuff", "API thing"
-        r'^(follow up|reach out|contact|email)$',  # Missing who/what
-        r'^(investigate|research|explore)\s*\w{0,20}$',  # Too broad
-    ]
-    
     item_lower = item.lower().strip()
     
     # Check if too short
@@ -136,36 +3106,39 @@ def is_ambiguous(item: str) -> bool:
         return True
     
     # Check vague patterns
-    for pattern in vague_patterns:
-        if re.match(pattern, item_lower):
+    for pattern in VAGUE_PATTERNS:
+        if pattern.match(item_lower):
             return True
     
     return False
 
+CLARIFICATION_RULES = [(re.compile('|'.join(map(re.escape, words))), questions) for words, questions in (
+    # Technical ambiguity
+    (['fix', 'bug', 'error', 'issue'],
+     ["Which specific bug or error? Can you provide more details or error messages?",
+      "What component or feature is affected?"]),
+    # Scope ambiguity
+    (['update', 'improve', 'refactor'],
+     ["What specific aspects need updating/improvement?",
+      "What's the success criteria for this task?"]),
+    # Missing target
+    (['email', 'contact', 'reach out', 'follow up'],
+     ["Who should be contacted?",
+      "What's the purpose or goal of this outreach?"]),
+    # Missing context
+    (['research', 'investigate', 'explore'],
+     ["What specific questions need to be answered?",
+      "What decisions will this research inform?"]),
+)]
+
 def generate_clarification_questions(item: str) -> List[str]:
     """Generate clarification questions for ambiguous items"""
     questions = []
     item_lower = item.lower()
     
-    # Technical ambiguity
-    if any(word in item_lower for word in ['fix', 'bug', 'error', 'issue']):
-        questions.append("Which specific bug or error? Can you provide more details or error messages?")
-        questions.append("What component or feature is affected?")
-    
-    # Scope ambiguity
-    if any(word in item_lower for word in ['update', 'improve', 'refactor']):
-        questions.append("What specific aspects need updating/improvement?")
-        questions.append("What's the success criteria for this task?")
-    
-    # Missing target
-    if any(word in item_lower for word in ['email', 'contact', 'reach out', 'follow up']):
-        questions.append("Who should be contacted?")
-        questions.append("What's the purpose or goal of this outreach?")
-    
-    # Missing context
-    if any(word in item_lower for word in ['research', 'investigate', 'explore']):
-        questions.append("What specific questions need to be answered?")
-        questions.append("What decisions will this research inform?")
+    for pattern, rule_questions in CLARIFICATION_RULES:
+        if pattern.search(item_lower):
+            questions.extend(rule_questions)
     
     # Generic catch-all
     if not questions:
@@ -174,25 +3147,9 @@ def generate_clarification_questions(item: str) -> List[str]:
     
     return questions
 
-def guess_category(item: str) -> str:
-    """Guess the category based on item text"""
-    item_lower = item.lower()
-    
-    # Check for category indicators
-    if any(word in item_lower for word in ['email', 'contact', 'reach out', 'follow up', 'meeting', 'call']):
-        return 'outreach'
-    elif any(word in item_lower for word in ['code', 'api', 'database', 'deploy', 'fix', 'bug', 'implement']):
-        return 'technical'
-    elif any(word in item_lower for word in ['research', 'study', 'learn', 'understand', 'investigate']):
-        return 'research'
-    elif any(word in item_lower for word in ['write', 'draft', 'document', 'blog', 'article', 'proposal']):
-        return 'writing'
-    elif any(word in item_lower for word in ['expense', 'invoice', 'schedule', 'calendar', 'organize']):
-        return 'admin'
-    elif any(word in item_lower for word in ['tweet', 'post', 'linkedin', 'social', 'twitter', 'marketing', 'blog']):
-        return 'marketing'
-    else:
-        return 'other'
+def guess_category(item: str, config: Optional[ServerConfig] = None) -> str:
+    """Guess the category based on item text (config.yaml category_keywords)"""
+    return (config or WORKSPACES.default.config).classifier().classify(item)
 
 def generate_task_content(item: str, category: str) -> str:
     """Generate rich task content based on item and category"""
@@ -336,107 +3293,447 @@ def get_next_actions(item: str, category: str) -> str:
     
     return '\n'.join(actions)
 
-def update_file_frontmatter(filepath: Path, updates: dict) -> bool:
-    """Update YAML frontmatter in a file"""
+# Per-file locks so concurrent tool calls never interleave writes to one file
+_file_locks: Dict[str, threading.Lock] = {}
+_file_locks_guard = threading.Lock()
+
+@contextmanager
+def file_lock(filepath: Path):
+    """Serialize writes (and read-modify-writes) to a single file"""
+    key = os.path.abspath(filepath)
+    with _file_locks_guard:
+        lock = _file_locks.setdefault(key, threading.Lock())
+    with lock:
+        yield
+
+@contextmanager
+def file_locks(filepaths):
+    """Hold file_lock() for several files, acquired in one global order.
+
+    Every multi-file writer goes through here, ordering by the same key
+    file_lock() uses, so two batches sharing files can't deadlock.
+    """
+    with ExitStack() as stack:
+        for key in sorted({os.path.abspath(fp) for fp in filepaths}):
+            stack.enter_context(file_lock(Path(key)))
+        yield
+
+def render_task_file(metadata: dict, content: str) -> str:
+    """Render a task file from its frontmatter and markdown body"""
+    yaml_str = yaml.dump(metadata, default_flow_style=False, sort_keys=False)
+    return f"---\n{yaml_str}---\n\n# {metadata['title']}\n\n{content}"
+
+def fsync_dir(path: Path) -> None:
+    """Persist renames in a directory (a no-op where directories can't be opened)"""
     try:
-        with open(filepath, 'r') as f:
-            content = f.read()
-        
-        metadata, body = parse_yaml_frontmatter(content)
-        metadata.update(updates)
-        
-        # Reconstruct file
-        yaml_str = yaml.dump(metadata, default_flow_style=False, sort_keys=False)
-        new_content = f"---\n{yaml_str}---\n{body}"
-        
-        with open(filepath, 'w') as f:
-            f.write(new_content)
-        
-        return True
-    except Exception as e:
-        logger.error(f"Error updating {filepath}: {e}")
-        return False
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def write_files_atomic(files: List[tuple], overwrite: bool = True) -> List[Optional[str]]:
+    """Write (filepath, content) pairs via temp file + rename.
+
+    All temp files are written and synced first, then renamed into place, and
+    each parent directory is fsynced once for the whole batch. A crash leaves
+    every file either absent, as before, or complete. Returns one error
+    message (or None on success) per file.
+    """
+    with file_locks(fp for fp, _ in files):
+        return _write_files_locked(files, overwrite)
+
+def _file_stat_key(filepath: Path) -> Optional[tuple]:
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+def _write_files_locked(files: List[tuple], overwrite: bool = True,
+                        expected: Optional[List[Optional[tuple]]] = None) -> List[Optional[str]]:
+    """write_files_atomic for callers already holding the file locks.
+
+    content may be str or bytes. With expected, a file whose _file_stat_key
+    no longer matches (e.g. an editor saved it since it was read) is left
+    alone and reported as a conflict.
+    """
+    errors: List[Optional[str]] = [None] * len(files)
+    temp_paths: List[Optional[Path]] = [None] * len(files)
+    for parent in {filepath.parent for filepath, _ in files}:
+        parent.mkdir(parents=True, exist_ok=True)
+    for i, (filepath, content) in enumerate(files):
+        if not overwrite and filepath.exists():
+            errors[i] = f"File already exists: {filepath.name}"
+            continue
+        temp_path = filepath.with_name(f".{filepath.name}.tmp")
+        try:
+            with open(temp_path, 'wb' if isinstance(content, bytes) else 'w') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            temp_paths[i] = temp_path
+        except OSError as e:
+            temp_path.unlink(missing_ok=True)
+            errors[i] = str(e)
+
+    parents = set()
+    for i, (filepath, _) in enumerate(files):
+        if temp_paths[i] is None:
+            continue
+        if expected is not None and _file_stat_key(filepath) != expected[i]:
+            temp_paths[i].unlink(missing_ok=True)
+            errors[i] = f"File changed while updating: {filepath.name}"
+            continue
+        try:
+            os.replace(temp_paths[i], filepath)
+            parents.add(filepath.parent)
+        except OSError as e:
+            temp_paths[i].unlink(missing_ok=True)
+            errors[i] = str(e)
+    for parent in parents:
+        fsync_dir(parent)
+    return errors
+
+def _frontmatter_key_pattern(key: str) -> re.Pattern:
+    return re.compile(rb'^' + re.escape(key.encode('utf-8')) + rb'\s*:(\s|$)')
+
+def patch_frontmatter(data: bytes, updates: dict) -> bytes:
+    """Apply updates to the frontmatter of a task file's bytes.
+
+    Only the lines of the updated keys are rewritten; other frontmatter lines
+    and the body stay byte-identical. Falls back to re-dumping the
+    frontmatter block (still leaving the body alone) if a key's layout is
+    too unusual to patch line by line.
+    """
+    newline = b'\r\n' if data.split(b'\n', 1)[0].endswith(b'\r') else b'\n'
+
+    def dump(values: dict) -> List[bytes]:
+        text = yaml.dump(values, default_flow_style=False, sort_keys=False, allow_unicode=True)
+        return [line.encode('utf-8') + newline for line in text.splitlines()]
+
+    lines = data.splitlines(keepends=True)
+    close = None
+    if lines and lines[0].rstrip() == b'---':
+        close = next((i for i in range(1, len(lines)) if lines[i].rstrip() == b'---'), None)
+    if close is None:
+        # No frontmatter yet: add one in front of the untouched content
+        return b'---' + newline + b''.join(dump(updates)) + b'---' + newline + data
+
+    block = lines[1:close]
+    expected = _load_frontmatter(b''.join(block))
+    expected.update(updates)
+
+    patched = list(block)
+    for key, value in updates.items():
+        pattern = _frontmatter_key_pattern(key)
+        start = next((i for i, line in enumerate(patched) if pattern.match(line)), None)
+        if start is None:
+            patched.extend(dump({key: value}))
+            continue
+        # A value may continue on indented or '- ' lines below its key
+        stop = start + 1
+        while stop < len(patched) and patched[stop][:1] in (b' ', b'\t', b'-'):
+            stop += 1
+        patched[start:stop] = dump({key: value})
+
+    try:
+        ok = _load_frontmatter(b''.join(patched)) == expected
+    except Exception:
+        ok = False
+    if not ok:
+        patched = dump(expected)
+    return b''.join(lines[:1] + patched + lines[close:])
+
+def update_file_frontmatter(filepath: Path, updates: dict) -> bool:
+    """Update YAML frontmatter in a file (the caller holds its file_lock)"""
+    return patch_task_files([filepath], updates)[0] is None
+
+def patch_task_files(filepaths: List[Path], updates: dict) -> List[Optional[str]]:
+    """Patch frontmatter of several files and write them as one atomic batch.
+
+    The caller holds the file locks. Returns an error (or None) per file.
+    """
+    errors: List[Optional[str]] = [None] * len(filepaths)
+    files, stats, indexes = [], [], []
+    for i, filepath in enumerate(filepaths):
+        stat_key = _file_stat_key(filepath)
+        try:
+            with open(filepath, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            errors[i] = str(e)
+            continue
+        try:
+            new_data = patch_frontmatter(data, updates)
+        except Exception as e:
+            logger.error(f"Error updating {filepath}: {e}")
+            errors[i] = str(e)
+            continue
+        if new_data == data:
+            continue
+        files.append((filepath, new_data))
+        stats.append(stat_key)
+        indexes.append(i)
+
+    for i, error in zip(indexes, _write_files_locked(files, expected=stats)):
+        if error is not None:
+            logger.error(f"Error updating {filepaths[i]}: {error}")
+            errors[i] = error
+    return errors
 
 # Create the MCP server
 app = Server("manager-ai-mcp")
 
+# Accepted by the read-only tools served through ResponseCache
+IF_GENERATION_SCHEMA = {
+    "type": "integer",
+    "description": "generation from an earlier reply; returns only {\"unchanged\": true} if nothing changed since"
+}
+
+# Accepted by every tool
+WORKSPACE_SCHEMA = {
+    "type": "string",
+    "description": "Workspace to operate on (see list_workspaces); defaults to \"default\""
+}
+
 @app.list_tools()
 async def handle_list_tools() -> list[types.Tool]:
     """List all available tools"""
-    return [
+    tools = [
+        types.Tool(
+            name="list_tasks",
+            description="List tasks with optional filters (category, priority, status)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "category": {"type": "string", "description": "Filter by category (comma-separated)"},
+                    "priority": {"type": "string", "description": "Filter by priority (comma-separated, e.g., P0,P1)"},
+                    "status": {"type": "string", "description": "Filter by status (n,s,b,d)"},
+                    "include_done": {"type": "boolean", "description": "Include completed tasks", "default": False},
+                    "limit": {"type": "integer", "minimum": 1, "maximum": LIST_TASKS_MAX_LIMIT, "description": f"Maximum tasks to return (at most {LIST_TASKS_MAX_LIMIT}); a next_cursor is returned when more remain"},
+                    "cursor": {"type": "string", "description": "next_cursor from a previous call, to fetch the following page"},
+                    "fields": {"type": "string", "description": "Fields to return (comma-separated, e.g., title,priority,status); filename is always included"},
+                    "sort_by": {"type": "string", "enum": ["priority", "estimated_time", "due_date"], "description": "Sort field"},
+                    "sort_order": {"type": "string", "enum": ["asc", "desc"], "description": "Sort direction", "default": "asc"},
+                    "compact": {"type": "boolean", "description": "Return compact JSON without indentation", "default": False},
+                    "if_generation": IF_GENERATION_SCHEMA
+                }
+            }
+        ),
+        types.Tool(
+            name="create_task",
+            description="Create a new task",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string", "description": "Task title"},
+                    "category": {"type": "string", "description": "Task category", "default": "other"},
+                    "priority": {"type": "string", "description": "Priority (P0-P3)", "default": "P2"},
+                    "estimated_time": {"type": "integer", "description": "Estimated time in minutes", "default": 30},
+                    "content": {"type": "string", "description": "Task content/description"}
+                },
+                "required": ["title"]
+            }
+        ),
+        types.Tool(
+            name="create_tasks",
+            description="Create many tasks in one atomic batch, with a result per task",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "tasks": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "title": {"type": "string", "description": "Task title"},
+                                "category": {"type": "string", "description": "Task category (guessed from the title if omitted)"},
+                                "priority": {"type": "string", "description": "Priority (P0-P3)", "default": "P2"},
+                                "estimated_time": {"type": "integer", "description": "Estimated time in minutes", "default": 30},
+                                "due_date": {"type": "string", "description": "Due date (YYYY-MM-DD)"},
+                                "content": {"type": "string", "description": "Task content (generated from the category if omitted)"}
+                            },
+                            "required": ["title"]
+                        }
+                    },
+                    "overwrite": {"type": "boolean", "description": "Replace existing task files", "default": False}
+                },
+                "required": ["tasks"]
+            }
+        ),
+        types.Tool(
+            name="update_task_status",
+            description="Update task status (n=not started, s=started, b=blocked, d=done)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "task_file": {"type": "string", "description": "Task filename"},
+                    "status": {"type": "string", "description": "New status (n,s,b,d)"}
+                },
+                "required": ["task_file", "status"]
+            }
+        ),
+        types.Tool(
+            name="bulk_update_tasks",
+            description="Update frontmatter fields (e.g. status, priority) of many tasks, selected by filename or by filter",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "task_files": {"type": "array", "items": {"type": "string"}, "description": "Task filenames to update"},
+                    "filter": {
+                        "type": "object",
+                        "description": "Select tasks like list_tasks instead of by filename",
+                        "properties": {
+                            "category": {"type": "string", "description": "Filter by category (comma-separated)"},
+                            "priority": {"type": "string", "description": "Filter by priority (comma-separated, e.g., P0,P1)"},
+                            "status": {"type": "string", "description": "Filter by status (n,s,b,d)"},
+                            "include_done": {"type": "boolean", "description": "Include completed tasks", "default": False}
+                        }
+                    },
+                    "updates": {"type": "object", "description": "Fields to set, e.g. {\"status\": \"b\"}"}
+                },
+                "required": ["updates"]
+            }
+        ),
+        types.Tool(
+            name="get_task_summary",
+            description="Get summary statistics for all tasks",
+            inputSchema={"type": "object", "properties": {"if_generation": IF_GENERATION_SCHEMA}}
+        ),
+        types.Tool(
+            name="check_priority_limits",
+            description="Check if priority limits are exceeded",
+            inputSchema={"type": "object", "properties": {"if_generation": IF_GENERATION_SCHEMA}}
+        ),
+        types.Tool(
+            name="get_system_status",
+            description="Get comprehensive system status",
+            inputSchema={"type": "object", "properties": {"if_generation": IF_GENERATION_SCHEMA}}
+        ),
+        types.Tool(
+            name="process_backlog",
+            description="Read and return backlog contents",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "incremental": {
+                        "type": "boolean",
+                        "description": "Only return items appended since the last acknowledge_backlog checkpoint",
+                        "default": False
+                    }
+                }
+            }
+        ),
+        types.Tool(
+            name="acknowledge_backlog",
+            description="Mark backlog items as processed up to an offset returned by process_backlog (incremental)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "offset": {"type": "integer", "description": "Byte offset to checkpoint (an item's end_offset or next_offset)"}
+                },
+                "required": ["offset"]
+            }
+        ),
+        types.Tool(
+            name="clear_backlog",
+            description="Clear the backlog after processing",
+            inputSchema={"type": "object", "properties": {}}
+        ),
+        types.Tool(
+            name="prune_completed_tasks",
+            description="Delete (or archive) completed tasks older than specified days",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "days": {"type": "integer", "description": "Days old", "default": 30},
+                    "mode": {"type": "string", "enum": ["delete", "archive"], "description": "Delete tasks or move them into the compressed archive", "default": "delete"}
+                }
+            }
+        ),
         types.Tool(
-            name="list_tasks",
-            description="List tasks with optional filters (category, priority, status)",
+            name="search",
+            description="Full-text search (BM25) over task bodies and Knowledge/ notes, with snippets",
             inputSchema={
                 "type": "object",
                 "properties": {
+                    "query": {"type": "string", "description": "Search terms; supports \"exact phrases\" and field:value filters (title, category, tags, source, status)"},
+                    "title": {"type": "string", "description": "Only documents whose title contains this text"},
                     "category": {"type": "string", "description": "Filter by category (comma-separated)"},
-                    "priority": {"type": "string", "description": "Filter by priority (comma-separated, e.g., P0,P1)"},
-                    "status": {"type": "string", "description": "Filter by status (n,s,b,d)"},
-                    "include_done": {"type": "boolean", "description": "Include completed tasks", "default": False}
+                    "tags": {"type": "string", "description": "Filter by tag (comma-separated, any match)"},
+                    "source": {"type": "string", "enum": ["tasks", "knowledge"], "description": "Only search tasks or knowledge notes"},
+                    "status": {"type": "string", "description": "Filter tasks by status (n,s,b,d)"},
+                    "limit": {"type": "integer", "description": "Maximum results", "default": 10}
                 }
             }
         ),
         types.Tool(
-            name="create_task",
-            description="Create a new task",
+            name="get_backlinks",
+            description="List tasks and Knowledge/ notes that link to a document",
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "title": {"type": "string", "description": "Task title"},
-                    "category": {"type": "string", "description": "Task category", "default": "other"},
-                    "priority": {"type": "string", "description": "Priority (P0-P3)", "default": "P2"},
-                    "estimated_time": {"type": "integer", "description": "Estimated time in minutes", "default": 30},
-                    "content": {"type": "string", "description": "Task content/description"}
+                    "path": {"type": "string", "description": "Document path (e.g. Knowledge/api-docs.md), task filename or note name"}
                 },
-                "required": ["title"]
+                "required": ["path"]
             }
         ),
         types.Tool(
-            name="update_task_status",
-            description="Update task status (n=not started, s=started, b=blocked, d=done)",
+            name="get_related",
+            description="List documents linked to or from a document, up to n hops away",
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "task_file": {"type": "string", "description": "Task filename"},
-                    "status": {"type": "string", "description": "New status (n,s,b,d)"}
+                    "path": {"type": "string", "description": "Document path (e.g. Knowledge/api-docs.md), task filename or note name"},
+                    "depth": {"type": "integer", "description": "Number of hops (1-5)", "default": 1}
                 },
-                "required": ["task_file", "status"]
+                "required": ["path"]
             }
         ),
         types.Tool(
-            name="get_task_summary",
-            description="Get summary statistics for all tasks",
-            inputSchema={"type": "object", "properties": {}}
-        ),
-        types.Tool(
-            name="check_priority_limits",
-            description="Check if priority limits are exceeded",
-            inputSchema={"type": "object", "properties": {}}
-        ),
-        types.Tool(
-            name="get_system_status",
-            description="Get comprehensive system status",
+            name="find_broken_links",
+            description="Find [[links]] and resource_refs that point to missing documents",
             inputSchema={"type": "object", "properties": {}}
         ),
         types.Tool(
-            name="process_backlog",
-            description="Read and return backlog contents",
-            inputSchema={"type": "object", "properties": {}}
+            name="get_server_metrics",
+            description="Get per-tool latency histograms, file-read counters and cache hit rates",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "reset": {"type": "boolean", "description": "Reset the metrics after reading them", "default": False}
+                }
+            }
         ),
         types.Tool(
-            name="clear_backlog",
-            description="Clear the backlog after processing",
-            inputSchema={"type": "object", "properties": {}}
+            name="search_archive",
+            description="Search archived tasks by title and fields",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Text to match in title or filename"},
+                    "category": {"type": "string", "description": "Filter by category (comma-separated)"},
+                    "priority": {"type": "string", "description": "Filter by priority (comma-separated, e.g., P0,P1)"},
+                    "limit": {"type": "integer", "description": "Maximum results", "default": 50},
+                    "include_content": {"type": "boolean", "description": "Include each result's file content", "default": False}
+                }
+            }
         ),
         types.Tool(
-            name="prune_completed_tasks",
-            description="Delete completed tasks older than specified days",
+            name="restore_task",
+            description="Restore an archived task back into Tasks/",
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "days": {"type": "integer", "description": "Days old", "default": 30}
-                }
+                    "task_file": {"type": "string", "description": "Task filename (latest archived copy) or archive member"},
+                    "overwrite": {"type": "boolean", "description": "Replace an existing task file", "default": False}
+                },
+                "required": ["task_file"]
             }
         ),
         types.Tool(
@@ -458,44 +3755,516 @@ async def handle_list_tools() -> list[types.Tool]:
                 },
                 "required": ["items"]
             }
+        ),
+        types.Tool(
+            name="classify_items",
+            description="Suggest a category for many items at once (defaults to the current BACKLOG.md items)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "items": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Items to classify"
+                    },
+                    "text": {
+                        "type": "string",
+                        "description": "Markdown list ('- item' lines) to classify instead of items"
+                    }
+                }
+            }
+        ),
+        types.Tool(
+            name="list_workspaces",
+            description="List configured workspaces, whether each is open and its estimated memory",
+            inputSchema={"type": "object", "properties": {}}
         )
     ]
+    for tool in tools:
+        tool.inputSchema["properties"]["workspace"] = WORKSPACE_SCHEMA
+    return tools
+
+def process_backlog_incremental(ws: Workspace) -> dict:
+    """Parse only backlog lines appended since the acknowledged checkpoint"""
+    if not ws.backlog.path.exists():
+        return {"success": False, "error": "BACKLOG.md not found"}
+    
+    with file_lock(ws.backlog.path):
+        checkpoint = ws.backlog.load_checkpoint()
+        lines, offsets, end_offset = ws.backlog.read_lines_from(checkpoint['offset'])
+    
+    open_item = None
+    if checkpoint.get('last_item') is not None:
+        # Subitems appended under the last acknowledged item
+        open_item = {'text': checkpoint['last_item'], 'subitems': [], 'continued': True}
+    items, _ = parse_backlog_lines(lines, open_item, offsets)
+    
+    # Each item spans up to the next item's line, so acknowledging an item's
+    # end_offset also consumes its subitems
+    for item, next_item in zip(items, items[1:] + [None]):
+        if 'offset' not in item:
+            item['offset'] = checkpoint['offset']
+        item['end_offset'] = next_item['offset'] if next_item and 'offset' in next_item else end_offset
+    
+    result = {
+        "success": True,
+        "parsed_items": items,
+        "count": len(items),
+        "checkpoint_offset": checkpoint['offset'],
+        "next_offset": end_offset,
+    }
+    if checkpoint.get('reset'):
+        result["checkpoint_reset"] = True
+    return result
+
+def acknowledge_backlog(ws: Workspace, offset: int) -> dict:
+    """Advance the backlog checkpoint to offset without rewriting BACKLOG.md"""
+    with file_lock(ws.backlog.path):
+        if not ws.backlog.path.exists():
+            return {"success": False, "error": "BACKLOG.md not found"}
+        checkpoint = ws.backlog.load_checkpoint()
+        if offset < checkpoint['offset']:
+            return {"success": False, "error": f"Offset {offset} is before the checkpoint ({checkpoint['offset']})"}
+        
+        lines, offsets, end_offset = ws.backlog.read_lines_from(checkpoint['offset'])
+        if offset != checkpoint['offset'] and offset not in offsets[1:] and offset != end_offset:
+            return {"success": False, "error": f"Offset {offset} is not at a line boundary"}
+        
+        # Carry the open item forward so later subitems can be attributed to it
+        open_item = None
+        if checkpoint.get('last_item') is not None:
+            open_item = {'text': checkpoint['last_item'], 'subitems': []}
+        consumed = [line for line, line_offset in zip(lines, offsets) if line_offset < offset]
+        _, open_item = parse_backlog_lines(consumed, open_item)
+        
+        ws.backlog.save_checkpoint(offset, open_item['text'] if open_item else None)
+    
+    return {
+        "success": True,
+        "checkpoint_offset": offset,
+        "pending_bytes": end_offset - offset
+    }
+
+VALID_PRIORITIES = ('P0', 'P1', 'P2', 'P3')
+
+def create_tasks(ws: Workspace, specs: List[dict], overwrite: bool = False) -> dict:
+    """Validate, render and atomically write a batch of tasks"""
+    results: List[Dict[str, Any]] = [{} for _ in specs]
+    files: List[tuple] = []
+    file_indexes: List[int] = []
+    seen = set()
+    
+    for i, spec in enumerate(specs):
+        title = spec.get('title') if isinstance(spec, dict) else None
+        if not isinstance(title, str) or not title.strip():
+            results[i] = {"success": False, "error": "Missing title"}
+            continue
+        priority = spec.get('priority', 'P2')
+        estimated_time = spec.get('estimated_time', 30)
+        category = spec.get('category') or guess_category(title, ws.config)
+        if priority not in VALID_PRIORITIES:
+            results[i] = {"success": False, "title": title, "error": f"Invalid priority: {priority}"}
+            continue
+        if not isinstance(estimated_time, int) or isinstance(estimated_time, bool) or estimated_time <= 0:
+            results[i] = {"success": False, "title": title, "error": f"Invalid estimated_time: {estimated_time}"}
+            continue
+        
+        filename = title.replace('/', '_').replace('\\', '_') + '.md'
+        if filename in seen:
+            results[i] = {"success": False, "title": title, "error": f"Duplicate filename in batch: {filename}"}
+            continue
+        seen.add(filename)
+        
+        metadata = {
+            'title': title,
+            'category': category,
+            'priority': priority,
+            'status': 'n',
+            'estimated_time': estimated_time
+        }
+        if spec.get('due_date'):
+            metadata['due_date'] = spec['due_date']
+        content = spec.get('content') or generate_task_content(title, category)
+        files.append((ws.task_index.find(filename), render_task_file(metadata, content)))
+        file_indexes.append(i)
+    
+    errors = write_files_atomic(files, overwrite=overwrite)
+    created = []
+    for i, (filepath, _), error in zip(file_indexes, files, errors):
+        if error is None:
+            results[i] = {"success": True, "filename": filepath.name}
+            created.append(filepath.name)
+        else:
+            results[i] = {"success": False, "title": specs[i]['title'], "error": error}
+    
+    # One index update for the whole batch
+    if created:
+        ws.task_index.invalidate_many(created)
+    
+    return {
+        "success": len(created) == len(specs),
+        "created": len(created),
+        "failed": len(specs) - len(created),
+        "results": results
+    }
+
+VALID_STATUSES = ('n', 's', 'b', 'd')
+
+def bulk_update_tasks(ws: Workspace, arguments: dict) -> dict:
+    """Patch frontmatter fields of tasks selected by filename or by filter"""
+    updates = arguments.get('updates') or {}
+    if not isinstance(updates, dict) or not updates:
+        return {"success": False, "error": "No updates provided"}
+    if 'filename' in updates:
+        return {"success": False, "error": "filename cannot be updated"}
+    if 'status' in updates and updates['status'] not in VALID_STATUSES:
+        return {"success": False, "error": f"Invalid status: {updates['status']}"}
+    if 'priority' in updates and updates['priority'] not in VALID_PRIORITIES:
+        return {"success": False, "error": f"Invalid priority: {updates['priority']}"}
+    
+    results: Dict[str, Optional[str]] = {}
+    if arguments.get('task_files') is not None:
+        task_files = []
+        for task_file in arguments['task_files']:
+            if not task_file.endswith('.md'):
+                task_file += '.md'
+            if ws.task_index.find(task_file).exists():
+                task_files.append(task_file)
+            else:
+                results[task_file] = f"Task file not found: {task_file}"
+    elif arguments.get('filter'):
+        task_files = [t['filename'] for t in filter_tasks(ws.task_index.tasks(), arguments['filter'])]
+    else:
+        return {"success": False, "error": "Provide task_files or filter"}
+    
+    task_files = sorted(set(task_files))
+    filepaths = [ws.task_index.find(task_file) for task_file in task_files]
+    with file_locks(filepaths):
+        errors = patch_task_files(filepaths, updates)
+    
+    updated = [task_file for task_file, error in zip(task_files, errors) if error is None]
+    ws.task_index.invalidate_many(updated)
+    results.update(zip(task_files, errors))
+    
+    return {
+        "success": all(error is None for error in results.values()),
+        "updated": len(updated),
+        "updated_files": updated,
+        "failed": {task_file: error for task_file, error in results.items() if error is not None}
+    }
+
+# Tool calls do blocking file I/O, YAML parsing and similarity scoring, so
+# they run on a bounded pool instead of the event loop
+TOOL_WORKERS = int(os.environ.get('MANAGER_AI_TOOL_WORKERS', '4'))
+TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix='tool')
+
+# Opt-in profiling: MANAGER_AI_PROFILE=N keeps cProfile and tracemalloc dumps
+# of the N slowest tool calls under .mcp_cache/profiles
+PROFILE_SLOWEST = int(os.environ.get('MANAGER_AI_PROFILE', '0') or 0)
+
+class SlowCallProfiler:
+    """Profiles tool calls and keeps dumps for the slowest ones.
+
+    Each kept call gets a .prof file (load with pstats or snakeviz), and
+    slowest_calls.json summarizes them with the top allocation sites from
+    tracemalloc. Only one call is profiled at a time; calls overlapping a
+    profiled one run unprofiled.
+    """
+
+    def __init__(self, directory: Path, keep: int):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._slowest: List[dict] = []
+        self._seq = 0
+
+    def run(self, name: str, arguments: Optional[dict], func):
+        import cProfile
+        import tracemalloc
+
+        if not self._lock.acquire(blocking=False):
+            return func()
+        try:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            profiler = cProfile.Profile()
+            started_at = datetime.now()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                return func()
+            finally:
+                profiler.disable()
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if len(self._slowest) < self.keep or elapsed_ms > self._slowest[-1]['elapsed_ms']:
+                    self._record(name, arguments, elapsed_ms, started_at, profiler, before)
+        finally:
+            self._lock.release()
+
+    def _record(self, name: str, arguments: Optional[dict], elapsed_ms: float, started_at: datetime,
+                profiler, before) -> None:
+        import tracemalloc
+
+        self._seq += 1
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_file = self.directory / f"{started_at:%Y%m%dT%H%M%S}-{self._seq}-{name}.prof"
+        profiler.dump_stats(str(profile_file))
+        _, peak = tracemalloc.get_traced_memory()
+        allocations = tracemalloc.take_snapshot().compare_to(before, 'lineno')[:10]
+        self._slowest.append({
+            'tool': name,
+            'arguments': json.dumps(arguments, default=json_default)[:500],
+            'elapsed_ms': round(elapsed_ms, 3),
+            'started_at': started_at.isoformat(timespec='seconds'),
+            'profile': profile_file.name,
+            'traced_peak_kb': round(peak / 1024, 1),
+            'top_allocations': [str(stat) for stat in allocations],
+        })
+        self._slowest.sort(key=lambda call: call['elapsed_ms'], reverse=True)
+        for evicted in self._slowest[self.keep:]:
+            (self.directory / evicted['profile']).unlink(missing_ok=True)
+        del self._slowest[self.keep:]
+        with open(self.directory / 'slowest_calls.json', 'w') as f:
+            json.dump(self._slowest, f, indent=2)
+
+    def summary(self) -> dict:
+        return {
+            'directory': str(self.directory),
+            'keep': self.keep,
+            'slowest': [{k: call[k] for k in ('tool', 'elapsed_ms', 'started_at', 'profile')} for call in self._slowest],
+        }
+
+PROFILER = SlowCallProfiler(CACHE_DIR / 'profiles', PROFILE_SLOWEST) if PROFILE_SLOWEST > 0 else None
+
+# Rendered responses of read-only tools kept per corpus generation;
+# MANAGER_AI_RESPONSE_CACHE_MB=0 disables the cache (if_generation still works)
+RESPONSE_CACHE_MB = float(os.environ.get('MANAGER_AI_RESPONSE_CACHE_MB', '32') or 0)
+RESPONSE_CACHE_ENTRIES = 256
+
+def time_insights(now: datetime) -> List[str]:
+    """Time-of-day hints for get_system_status"""
+    hour = now.hour
+    insights = []
+    if 9 <= hour < 12:
+        insights.append("Morning - ideal for outreach tasks")
+    elif 14 <= hour < 17:
+        insights.append("Afternoon - good for deep work")
+    elif hour >= 17:
+        insights.append("End of day - quick admin tasks")
+    return insights
+
+class ResponseCache:
+    """LRU of rendered read-only tool responses, stamped with a corpus generation.
+
+    The generation is the workspace's (see Workspace.generation), so any
+    write tool or file change moves it. A call is keyed by workspace, tool
+    name and normalized arguments and served from the cache while the
+    generation is unchanged. Callers passing
+    if_generation equal to the current generation get a short "unchanged"
+    reply instead. Time-dependent fields (get_system_status's time_insights
+    and timestamp) are recomputed on every cache hit and included in the
+    "unchanged" reply too.
+    """
+
+    # Tools whose output depends only on the corpus (and fields refreshed on every hit)
+    TOOLS = ('list_tasks', 'get_task_summary', 'check_priority_limits', 'get_system_status')
+
+    def __init__(self, max_bytes: int, max_entries: int = RESPONSE_CACHE_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: Dict[tuple, tuple] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def generation(self, ws: Workspace) -> int:
+        """Generation of the current call, or of the workspace right now"""
+        pinned = getattr(self._local, 'generation', None)
+        if pinned is not None:
+            return pinned
+        return ws.generation()
+
+    def respond(self, name: str, arguments: Optional[dict], ws: Workspace, dispatch) -> list:
+        arguments = dict(arguments or {})
+        if_generation = arguments.pop('if_generation', None)
+        with ws.task_index.pinned():
+            generation = self.generation(ws)
+            if if_generation is not None and if_generation == generation:
+                METRICS.cache('responses', hits=1)
+                unchanged = {"unchanged": True, "generation": generation}
+                unchanged.update(self._time_fields(name))
+                return [types.TextContent(type="text", text=json.dumps(unchanged))]
+
+            key = (ws.name, name, json.dumps(arguments, sort_keys=True, default=str))
+            with self._lock:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    if entry[0] == generation:
+                        self._entries[key] = entry
+                    else:
+                        self._bytes -= len(entry[1])
+                        entry = None
+            METRICS.cache('responses', hits=int(entry is not None), misses=int(entry is None))
+            if entry is not None:
+                return [types.TextContent(type="text", text=self._refresh(name, entry[1]))]
+
+            self._local.generation = generation
+            try:
+                content = dispatch(name, arguments, ws)
+            finally:
+                self._local.generation = None
+        text = content[0].text
+        if self.max_bytes > 0 and len(text) <= self.max_bytes:
+            with self._lock:
+                self._entries[key] = (generation, text)
+                self._bytes += len(text)
+                while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                    evicted = self._entries.pop(next(iter(self._entries)))
+                    self._bytes -= len(evicted[1])
+        return content
+
+    def discard(self, workspace: str) -> None:
+        """Drop every cached response of a closed workspace"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == workspace]:
+                self._bytes -= len(self._entries.pop(key)[1])
+
+    @staticmethod
+    def _time_fields(name: str) -> dict:
+        """Fields of a tool's reply that depend on the clock, not the corpus"""
+        if name != 'get_system_status':
+            return {}
+        now = datetime.now()
+        return {"time_insights": time_insights(now), "timestamp": now.isoformat()}
+
+    def _refresh(self, name: str, text: str) -> str:
+        """Recompute the time-dependent fields of a cached response"""
+        fields = self._time_fields(name)
+        if not fields:
+            return text
+        result = json.loads(text)
+        result.update(fields)
+        return json.dumps(result, indent=2)
+
+RESPONSES = ResponseCache(int(RESPONSE_CACHE_MB * 1024 * 1024))
 
 @app.call_tool()
 async def handle_call_tool(
     name: str, arguments: dict | None
 ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
     """Handle tool calls"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(TOOL_EXECUTOR, call_tool, name, arguments)
+
+def call_tool(
+    name: str, arguments: dict | None
+) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
+    """Run a tool call synchronously (on a TOOL_EXECUTOR thread), recording its latency"""
+    start = time.perf_counter()
+    failed = True
+    arguments = dict(arguments or {})
+    workspace = arguments.pop('workspace', None)
+    try:
+        with WORKSPACES.use(workspace) as ws:
+            if name in ResponseCache.TOOLS:
+                run = lambda: RESPONSES.respond(name, arguments, ws, dispatch_tool)
+            elif name == "list_workspaces":
+                run = lambda: [types.TextContent(type="text", text=json.dumps(
+                    {"success": True, "workspaces": WORKSPACES.status()}, indent=2))]
+            else:
+                run = lambda: dispatch_tool(name, arguments, ws)
+            if PROFILER is not None:
+                result = PROFILER.run(name, arguments, run)
+            else:
+                result = run()
+        failed = False
+        return result
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        METRICS.observe(name, elapsed_ms, error=failed)
+        logger.debug(f"Tool {name} took {elapsed_ms:.1f} ms")
+
+def dispatch_tool(
+    name: str, arguments: dict | None, ws: Workspace
+) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
+    """Route a tool call to its implementation in workspace ws"""
     
     if name == "list_tasks":
-        tasks = get_all_tasks()
+        arguments = arguments or {}
+        tasks = filter_tasks(ws.task_index.tasks(), arguments)
+        total_count = len(tasks)
         
-        # Apply filters
-        if arguments:
-            if not arguments.get('include_done', False):
-                tasks = [t for t in tasks if t.get('status') != 'd']
-            
-            if arguments.get('category'):
-                categories = [c.strip() for c in arguments['category'].split(',')]
-                tasks = [t for t in tasks if t.get('category') in categories]
-            
-            if arguments.get('priority'):
-                priorities = [p.strip() for p in arguments['priority'].split(',')]
-                tasks = [t for t in tasks if t.get('priority') in priorities]
-            
-            if arguments.get('status'):
-                statuses = [s.strip() for s in arguments['status'].split(',')]
-                tasks = [t for t in tasks if t.get('status') in statuses]
-        else:
-            # Default: exclude done tasks
-            tasks = [t for t in tasks if t.get('status') != 'd']
+        limit = arguments.get('limit')
+        cursor = arguments.get('cursor')
+        sort_by = arguments.get('sort_by')
+        descending = arguments.get('sort_order') == 'desc'
+        if sort_by and sort_by not in SORT_FIELDS:
+            return [types.TextContent(type="text", text=json.dumps({
+                "error": f"Unknown sort_by: {sort_by} (use one of {', '.join(SORT_FIELDS)})"
+            }, indent=2))]
+        if limit is not None:
+            if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+                return [types.TextContent(type="text", text=json.dumps({
+                    "error": f"Invalid limit: {limit!r} (use a positive integer)"
+                }, indent=2))]
+            limit = min(limit, LIST_TASKS_MAX_LIMIT)
         
+        # Keyset pagination: the cursor holds the last returned sort key, so
+        # tasks created or deleted between pages never shift the next page
+        next_cursor = None
+        if sort_by or limit is not None or cursor:
+            keyed = sorted(((task_sort_key(t, sort_by), t) for t in tasks),
+                           key=lambda kt: kt[0], reverse=descending)
+            if cursor:
+                try:
+                    position = decode_cursor(cursor)
+                except ValueError as e:
+                    return [types.TextContent(type="text", text=json.dumps({"error": str(e)}, indent=2))]
+                if position.get('sort_by') != sort_by or position.get('desc', False) != descending:
+                    return [types.TextContent(type="text", text=json.dumps({
+                        "error": "Cursor was issued for a different sort_by/sort_order"
+                    }, indent=2))]
+                after = position['after']
+                keyed = [kt for kt in keyed if (kt[0] < after if descending else kt[0] > after)]
+            if limit is not None and len(keyed) > limit:
+                keyed = keyed[:limit]
+                next_cursor = encode_cursor(sort_by, descending, keyed[-1][0])
+            tasks = [t for _, t in keyed]
+        
+        # Bodies are only loaded for the tasks actually returned
+        fields = arguments.get('fields')
+        if fields:
+            wanted = [f.strip() for f in fields.split(',') if f.strip()]
+            projected = []
+            for t in tasks:
+                row = {'filename': t['filename']}
+                for field in wanted:
+                    if field == 'body_content':
+                        row[field] = ws.task_index.body_content(t['filename'])
+                    elif field in t:
+                        row[field] = t[field]
+                projected.append(row)
+            tasks = projected
+        else:
+            tasks = [dict(t.to_dict(), body_content=ws.task_index.body_content(t.filename)) for t in tasks]
+
         result = {
             "tasks": tasks,
             "count": len(tasks),
-            "filters_applied": arguments or {}
+            "filters_applied": arguments,
+            "generation": RESPONSES.generation(ws)
         }
-        return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+        if sort_by or limit is not None or cursor:
+            result["total_count"] = total_count
+            result["next_cursor"] = next_cursor
+        
+        if arguments.get('compact'):
+            text = json.dumps(result, separators=(',', ':'), default=json_default)
+        else:
+            text = json.dumps(result, indent=2, default=json_default)
+        return [types.TextContent(type="text", text=text)]
     
     elif name == "create_task":
         title = arguments['title']
@@ -506,7 +4275,7 @@ async def handle_call_tool(
         
         # Create filename
         filename = title.replace('/', '_').replace('\\', '_') + '.md'
-        filepath = TASKS_DIR / filename
+        filepath = ws.task_index.find(filename)
         
         # Create task metadata
         metadata = {
@@ -518,26 +4287,29 @@ async def handle_call_tool(
         }
         
         # Create file content
-        yaml_str = yaml.dump(metadata, default_flow_style=False, sort_keys=False)
-        file_content = f"---\n{yaml_str}---\n\n# {title}\n\n{content}"
+        file_content = render_task_file(metadata, content)
         
-        try:
-            with open(filepath, 'w') as f:
-                f.write(file_content)
+        error, = write_files_atomic([(filepath, file_content)])
+        if error is None:
+            ws.task_index.invalidate(filename)
             
             result = {
                 "success": True,
                 "filename": filename,
                 "message": f"Task '{title}' created successfully"
             }
-        except Exception as e:
+        else:
             result = {
                 "success": False,
-                "error": str(e)
+                "error": error
             }
         
         return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
     
+    elif name == "create_tasks":
+        result = create_tasks(ws, arguments.get('tasks', []), arguments.get('overwrite', False))
+        return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+    
     elif name == "update_task_status":
         task_file = arguments['task_file']
         status = arguments['status']
@@ -545,14 +4317,16 @@ async def handle_call_tool(
         if not task_file.endswith('.md'):
             task_file += '.md'
         
-        filepath = TASKS_DIR / task_file
+        filepath = ws.task_index.find(task_file)
         if not filepath.exists():
             result = {
                 "success": False,
                 "error": f"Task file not found: {task_file}"
             }
         else:
-            success = update_file_frontmatter(filepath, {'status': status})
+            with file_lock(filepath):
+                success = update_file_frontmatter(filepath, {'status': status})
+            ws.task_index.invalidate(task_file)
             status_names = {'n': 'not started', 's': 'started', 'b': 'blocked', 'd': 'done'}
             result = {
                 "success": success,
@@ -562,40 +4336,37 @@ async def handle_call_tool(
         
         return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
     
+    elif name == "bulk_update_tasks":
+        result = bulk_update_tasks(ws, arguments)
+        return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+    
     elif name == "get_task_summary":
-        tasks = get_all_tasks()
-        active_tasks = [t for t in tasks if t.get('status') != 'd']
-        
-        by_priority = Counter(t.get('priority', 'P2') for t in active_tasks)
-        by_category = Counter(t.get('category', 'other') for t in active_tasks)
-        by_status = Counter(t.get('status', 'n') for t in tasks)
+        summary = ws.task_index.summary()
         
         # Calculate time estimates
         time_by_priority = {}
-        for priority in ['P0', 'P1', 'P2', 'P3']:
-            priority_tasks = [t for t in active_tasks if t.get('priority') == priority]
-            total_time = sum(t.get('estimated_time', 30) for t in priority_tasks)
+        for priority, total_time in summary['active_minutes_by_priority'].items():
             time_by_priority[priority] = {
                 'total_minutes': total_time,
                 'total_hours': round(total_time / 60, 1)
             }
         
         result = {
-            "total_tasks": len(tasks),
-            "active_tasks": len(active_tasks),
-            "by_priority": dict(by_priority),
-            "by_category": dict(by_category),
-            "by_status": dict(by_status),
-            "time_by_priority": time_by_priority
+            "total_tasks": summary['total'],
+            "active_tasks": summary['active'],
+            "by_priority": summary['active_by_priority'],
+            "by_category": summary['active_by_category'],
+            "by_status": summary['by_status'],
+            "time_by_priority": time_by_priority,
+            "generation": RESPONSES.generation(ws)
         }
         
         return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
     
     elif name == "check_priority_limits":
-        tasks = [t for t in get_all_tasks() if t.get('status') != 'd']
-        by_priority = Counter(t.get('priority', 'P2') for t in tasks)
+        by_priority = ws.task_index.summary()['active_by_priority']
         
-        thresholds = {'P0': 3, 'P1': 5, 'P2': 10}
+        thresholds = ws.config.priority_limits()
         alerts = []
         
         for priority, threshold in thresholds.items():
@@ -604,67 +4375,44 @@ async def handle_call_tool(
                 alerts.append(f"{priority} has {count} tasks (limit: {threshold})")
         
         result = {
-            "priority_counts": dict(by_priority),
+            "priority_counts": by_priority,
             "alerts": alerts,
-            "balanced": len(alerts) == 0
+            "balanced": len(alerts) == 0,
+            "generation": RESPONSES.generation(ws)
         }
         
         return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
 
     elif name == "get_system_status":
-        all_tasks = get_all_tasks()
-        active_tasks = [t for t in all_tasks if t.get('status') != 'd']
-
-        priority_counts = Counter(task['priority'] for task in active_tasks)
-        status_counts = Counter(task['status'] for task in active_tasks)
-        category_counts = Counter(task['category'] for task in active_tasks)
-
-        # Check backlog
-        backlog_items = 0
-        backlog_file = BASE_DIR / 'BACKLOG.md'
-        if backlog_file.exists():
-            with open(backlog_file, 'r') as f:
-                content = f.read().strip()
-                if content and content != 'all done!':
-                    backlog_items = len([l for l in content.split('\n') if l.strip().startswith('-')])
-
-        # Time insights
-        now = datetime.now()
-        hour = now.hour
-        day_name = now.strftime('%A')
-
-        time_insights = []
-        if 9 <= hour < 12:
-            time_insights.append("Morning - ideal for outreach tasks")
-        elif 14 <= hour < 17:
-            time_insights.append("Afternoon - good for deep work")
-        elif hour >= 17:
-            time_insights.append("End of day - quick admin tasks")
+        summary = ws.task_index.summary()
+        backlog_items = ws.backlog.item_count()
 
+        now = datetime.now()
         result = {
-            "total_active_tasks": len(active_tasks),
-            "priority_distribution": dict(priority_counts),
-            "status_distribution": dict(status_counts),
-            "category_distribution": dict(category_counts),
+            "total_active_tasks": summary['active'],
+            "priority_distribution": summary['active_by_priority'],
+            "status_distribution": summary['active_by_status'],
+            "category_distribution": summary['active_by_category'],
             "backlog_items": backlog_items,
-            "time_insights": time_insights,
-            "timestamp": now.isoformat()
+            "time_insights": time_insights(now),
+            "timestamp": now.isoformat(),
+            "generation": RESPONSES.generation(ws)
         }
         
         return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
     
     elif name == "process_backlog":
-        backlog_file = BASE_DIR / 'BACKLOG.md'
+        if arguments and arguments.get('incremental'):
+            return [types.TextContent(type="text", text=json.dumps(process_backlog_incremental(ws), indent=2))]
+
+        content = ws.backlog.read()
         
-        if not backlog_file.exists():
+        if content is None:
             result = {
                 "success": False,
                 "error": "BACKLOG.md not found"
             }
         else:
-            with open(backlog_file, 'r') as f:
-                content = f.read().strip()
-            
             if not content or content == 'all done!':
                 result = {
                     "success": True,
@@ -672,25 +4420,7 @@ async def handle_call_tool(
                     "message": "Backlog is already clear"
                 }
             else:
-                # Parse items
-                lines = content.split('\n')
-                items = []
-                current_item = None
-                
-                for line in lines:
-                    stripped = line.strip()
-                    if stripped.startswith('- '):
-                        if current_item:
-                            items.append(current_item)
-                        current_item = {
-                            'text': stripped[2:],
-                            'subitems': []
-                        }
-                    elif stripped.startswith('  - ') and current_item:
-                        current_item['subitems'].append(stripped[4:])
-                
-                if current_item:
-                    items.append(current_item)
+                items, _ = parse_backlog_lines(content.split('\n'))
                 
                 result = {
                     "success": True,
@@ -701,12 +4431,36 @@ async def handle_call_tool(
         
         return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
     
-    elif name == "clear_backlog":
-        backlog_file = BASE_DIR / 'BACKLOG.md'
+    elif name == "classify_items":
+        if arguments and 'items' in arguments:
+            items = [str(item) for item in arguments['items']]
+        else:
+            text = arguments.get('text') if arguments else None
+            if text is None:
+                text = ws.backlog.read() or ''
+            parsed, _ = parse_backlog_lines(text.splitlines())
+            items = [item['text'] for item in parsed]
+        
+        categories = ws.config.classifier().classify_many(items)
+        result = {
+            "success": True,
+            "count": len(items),
+            "by_category": dict(Counter(categories)),
+            "results": [{"item": item, "category": category} for item, category in zip(items, categories)]
+        }
         
+        return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+    
+    elif name == "acknowledge_backlog":
+        return [types.TextContent(type="text", text=json.dumps(acknowledge_backlog(ws, arguments['offset']), indent=2))]
+    
+    elif name == "clear_backlog":
         try:
-            with open(backlog_file, 'w') as f:
-                f.write("all done!")
+            with file_lock(ws.backlog.path):
+                with open(ws.backlog.path, 'w') as f:
+                    f.write("all done!")
+                ws.backlog.clear_checkpoint()
+            ws.backlog.invalidate()
             
             result = {
                 "success": True,
@@ -722,21 +4476,40 @@ async def handle_call_tool(
     
     elif name == "prune_completed_tasks":
         days = arguments.get('days', 30) if arguments else 30
+        mode = arguments.get('mode', 'delete') if arguments else 'delete'
         cutoff_date = datetime.now() - timedelta(days=days)
-        deleted = []
         
-        for task_file in TASKS_DIR.glob('*.md'):
+        # Status and mtime come from the index, so only pruned files are touched
+        expired = [
+            (task, mtime) for task, mtime in ws.task_index.entries()
+            if task.get('status') == 'd' and datetime.fromtimestamp(mtime) < cutoff_date
+        ]
+        
+        if mode == 'archive':
+            archived, errors = ws.archive.archive(expired)
+            ws.task_index.invalidate_many(archived)
+            for filename, error in errors.items():
+                logger.error(f"Error archiving {filename}: {error}")
+            result = {
+                "success": True,
+                "archived_count": len(archived),
+                "archived_files": archived,
+                "message": f"Archived {len(archived)} tasks older than {days} days"
+            }
+            if errors:
+                result["errors"] = errors
+            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+        
+        deleted = []
+        for task, mtime in expired:
+            task_file = ws.task_index.find(task['filename'])
             try:
-                mtime = datetime.fromtimestamp(task_file.stat().st_mtime)
-                if mtime < cutoff_date:
-                    with open(task_file, 'r') as f:
-                        content = f.read()
-                        metadata, _ = parse_yaml_frontmatter(content)
-                        if metadata.get('status') == 'd':
-                            task_file.unlink()
-                            deleted.append(task_file.name)
+                with file_lock(task_file):
+                    task_file.unlink()
+                deleted.append(task_file.name)
             except Exception as e:
                 logger.error(f"Error processing {task_file}: {e}")
+        ws.task_index.invalidate_many(deleted)
         
         result = {
             "success": True,
@@ -747,6 +4520,97 @@ async def handle_call_tool(
         
         return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
     
+    elif name == "search":
+        filters = {k: arguments.get(k) for k in ('title', 'category', 'tags', 'source', 'status')}
+        results, total = ws.search_index.search(arguments.get('query', ''), filters, arguments.get('limit', 10))
+        result = {
+            "success": True,
+            "total_matches": total,
+            "results": results
+        }
+        return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+    
+    elif name in ("get_backlinks", "get_related"):
+        key = ws.link_graph.resolve(arguments['path'])
+        if key is None:
+            result = {
+                "success": False,
+                "error": f"Document not found: {arguments['path']}"
+            }
+        elif name == "get_backlinks":
+            backlinks = ws.link_graph.backlinks(key)
+            result = {
+                "success": True,
+                "path": key,
+                "count": len(backlinks),
+                "backlinks": backlinks
+            }
+        else:
+            depth = max(1, min(int(arguments.get('depth', 1)), 5))
+            related = ws.link_graph.related(key, depth)
+            result = {
+                "success": True,
+                "path": key,
+                "depth": depth,
+                "count": len(related),
+                "related": related
+            }
+        return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+    
+    elif name == "find_broken_links":
+        broken = ws.link_graph.broken_links()
+        result = {
+            "success": True,
+            "count": len(broken),
+            "broken_links": broken
+        }
+        return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+    
+    elif name == "get_server_metrics":
+        result = METRICS.snapshot()
+        result["profiling"] = PROFILER.summary() if PROFILER is not None else {"enabled": False}
+        if arguments and arguments.get('reset'):
+            METRICS.reset()
+        return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+    
+    elif name == "search_archive":
+        filters = {k: arguments[k] for k in ('category', 'priority') if arguments.get(k)}
+        matches, total = ws.archive.search(arguments.get('query', ''), filters, arguments.get('limit', 50))
+        if arguments.get('include_content'):
+            for record in matches:
+                record['content'] = ws.archive.read(record).decode('utf-8', errors='replace')
+        result = {
+            "success": True,
+            "total_matches": total,
+            "results": matches
+        }
+        return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+    
+    elif name == "restore_task":
+        record = ws.archive.resolve(arguments['task_file'])
+        if record is None:
+            result = {
+                "success": False,
+                "error": f"Task not found in archive: {arguments['task_file']}"
+            }
+        else:
+            filepath = ws.task_index.find(record['filename'])
+            error, = write_files_atomic([(filepath, ws.archive.read(record))], overwrite=arguments.get('overwrite', False))
+            if error is None:
+                ws.archive.mark_restored(record)
+                ws.task_index.invalidate(record['filename'])
+                result = {
+                    "success": True,
+                    "task_file": record['filename'],
+                    "archived_at": record['archived_at']
+                }
+            else:
+                result = {
+                    "success": False,
+                    "error": error
+                }
+        return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+    
     elif name == "process_backlog_with_dedup":
         items = arguments.get('items', [])
         auto_create = arguments.get('auto_create', False)
@@ -756,28 +4620,39 @@ async def handle_call_tool(
                 "error": "No items provided to process"
             }, indent=2))]
 
-        existing_tasks = get_all_tasks()
+        dedup_config = ws.config.dedup_config()
+
+        # Collapse duplicates within the batch first; only one representative
+        # (the earliest capture) per cluster goes on to be compared and created
+        clusters = cluster_items(items, dedup_config['similarity_threshold'])
+        representatives = [items[cluster[0]] for cluster in clusters]
+
+        # Score every item before any auto-creation so the batch is compared
+        # against the corpus as it was when the call started
+        similar_by_item = ws.task_index.find_similar(representatives, dedup_config)
 
         result = {
             "new_tasks": [],
             "potential_duplicates": [],
             "needs_clarification": [],
             "auto_created": [],
+            "needs_review": [],
             "summary": {}
         }
+        pending_files: List[tuple] = []
+        pending_merged: List[tuple] = []
         
-        for item in items:
-            # Check for duplicates
-            similar_tasks = find_similar_tasks(item, existing_tasks)
-            
+        for cluster, item, similar_tasks in zip(clusters, representatives, similar_by_item):
+            merged_items = [items[i] for i in cluster[1:]]
             if similar_tasks:
-                result["potential_duplicates"].append({
+                entry = {
                     "item": item,
                     "similar_tasks": similar_tasks,
                     "recommended_action": "merge" if similar_tasks[0]['similarity_score'] > 0.8 else "review"
-                })
+                }
+                result["potential_duplicates"].append(entry)
             elif is_ambiguous(item):
-                result["needs_clarification"].append({
+                entry = {
                     "item": item,
                     "questions": generate_clarification_questions(item),
                     "suggestions": [
@@ -785,53 +4660,74 @@ async def handle_call_tool(
                         "Include success criteria",
                         "Specify scope or boundaries"
                     ]
-                })
+                }
+                result["needs_clarification"].append(entry)
             else:
                 # This is a new, clear task
-                result["new_tasks"].append({
+                entry = {
                     "item": item,
-                    "suggested_category": guess_category(item),
+                    "suggested_category": guess_category(item, ws.config),
                     "suggested_priority": "P2",  # Default priority
                     "ready_to_create": True
-                })
+                }
+                result["new_tasks"].append(entry)
                 
                 # Auto-create if requested
                 if auto_create:
                     # Create the task file
-                    safe_filename = re.sub(r'[^\w\s-]', '', item).strip()
-                    safe_filename = re.sub(r'[-\s]+', ' ', safe_filename)
-                    task_file = TASKS_DIR / f"{safe_filename}.md"
+                    safe_filename = UNSAFE_FILENAME_CHARS_RE.sub('', item).strip()
+                    safe_filename = FILENAME_SEPARATORS_RE.sub(' ', safe_filename)
+                    task_file = ws.task_index.find(f"{safe_filename}.md")
                     
                     metadata = {
                         "title": item,
-                        "category": guess_category(item),
+                        "category": guess_category(item, ws.config),
                         "priority": "P2",
                         "status": "n",
                         "estimated_time": 60
                     }
                     
-                    yaml_str = yaml.dump(metadata, default_flow_style=False, sort_keys=False)
-                    
                     # Generate richer task content based on category
                     task_content = generate_task_content(item, metadata['category'])
-                    content = f"---\n{yaml_str}---\n\n# {item}\n\n{task_content}"
-                    
-                    with open(task_file, 'w') as f:
-                        f.write(content)
-                    
-                    result["auto_created"].append(safe_filename + ".md")
+                    pending_files.append((task_file, render_task_file(metadata, task_content)))
+                    pending_merged.append((item, merged_items))
+            
+            if merged_items:
+                entry["merged_items"] = merged_items
+        
+        # Write all auto-created tasks as one batch
+        if pending_files:
+            errors = write_files_atomic(pending_files)
+            written = [fp.name for (fp, _), error in zip(pending_files, errors) if error is None]
+            ws.task_index.invalidate_many(written)
+            result["auto_created"] = written
+            # Items folded into an auto-created task get no file of their own;
+            # list them so any detail they add beyond the created one isn't lost
+            for (task_file, _), error, (item, merged_items) in zip(pending_files, errors, pending_merged):
+                if error is None:
+                    result["needs_review"].extend(
+                        {"item": merged, "merged_into": item, "task_file": task_file.name}
+                        for merged in merged_items
+                    )
         
         # Add summary
         result["summary"] = {
             "total_items": len(items),
+            "batch_duplicates": len(items) - len(clusters),
             "new_tasks": len(result["new_tasks"]),
             "duplicates_found": len(result["potential_duplicates"]),
             "needs_clarification": len(result["needs_clarification"]),
             "auto_created": len(result["auto_created"]),
+            "needs_review": len(result["needs_review"]),
             "recommendations": []
         }
         
         # Add recommendations
+        if len(clusters) < len(items):
+            result["summary"]["recommendations"].append(
+                f"Merged {len(items) - len(clusters)} repeated items into their first occurrence (see merged_items)"
+            )
+        
         if result["potential_duplicates"]:
             result["summary"]["recommendations"].append(
                 f"Review {len(result['potential_duplicates'])} potential duplicates before creating tasks"
@@ -842,6 +4738,11 @@ async def handle_call_tool(
                 f"Clarify {len(result['needs_clarification'])} ambiguous items for better task definition"
             )
         
+        if result["needs_review"]:
+            result["summary"]["recommendations"].append(
+                f"Check {len(result['needs_review'])} repeated items merged into auto-created tasks (see needs_review)"
+            )
+        
         if result["new_tasks"] and not auto_create:
             result["summary"]["recommendations"].append(
                 f"Ready to create {len(result['new_tasks'])} new tasks - use auto_create=true or create manually"
@@ -857,24 +4758,55 @@ async def handle_call_tool(
 
 async def main():
     """Main entry point for the MCP server"""
+    import mcp.server.stdio
+    from mcp.server import NotificationOptions
+    from mcp.server.models import InitializationOptions
+
     logger.info(f"Starting Manager AI MCP Server")
     logger.info(f"Working directory: {BASE_DIR}")
     logger.info(f"Tasks directory: {TASKS_DIR}")
-    
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="manager-ai-mcp",
-                server_version="0.1.0",
-                capabilities=app.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
+    for name, path in WORKSPACES.paths.items():
+        if name != DEFAULT_WORKSPACE:
+            logger.info(f"Workspace {name}: {path}")
+
+    # Other workspaces are opened on their first call
+    WORKSPACES.default.open()
+
+    try:
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name="manager-ai-mcp",
+                    server_version="0.1.0",
+                    capabilities=app.get_capabilities(
+                        notification_options=NotificationOptions(),
+                        experimental_capabilities={},
+                    ),
                 ),
-            ),
-        )
+            )
+    finally:
+        TOOL_EXECUTOR.shutdown(wait=False)
+        WORKSPACES.close_all()
+
+def migrate_layout_main(argv: List[str]) -> int:
+    """python server.py migrate-layout {flat,hash} [--width N] [--workspace NAME]"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='server.py migrate-layout',
+                                     description='Move Tasks/ files between the flat and hash-sharded layouts')
+    parser.add_argument('layout', choices=TaskLayout.KINDS)
+    parser.add_argument('--width', type=int, default=SHARD_WIDTH, help='hex digits per shard directory name')
+    parser.add_argument('--workspace', default=DEFAULT_WORKSPACE)
+    args = parser.parse_args(argv)
+    if args.workspace not in WORKSPACES.paths:
+        parser.error(f"unknown workspace: {args.workspace}")
+    result = migrate_task_layout(WORKSPACES.paths[args.workspace] / 'Tasks', args.layout, args.width)
+    print(json.dumps(result, indent=2))
+    return 0 if result['complete'] else 1
 
 if __name__ == "__main__":
-    import asyncio
+    if sys.argv[1:2] == ['migrate-layout']:
+        sys.exit(migrate_layout_main(sys.argv[2:]))
     asyncio.run(main())
\ No newline at end of file
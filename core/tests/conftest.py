@@ -0,0 +1,75 @@
+"""Shared fixtures for the MCP server tests.
+
+The server module is imported once, with MANAGER_AI_BASE_DIR pointing at a
+scratch directory. Each test registers its own workspace under tmp_path
+and calls tools through server.call_tool, the same path the MCP handler
+takes.
+
+    python -m pytest core/tests
+"""
+
+import os
+import sys
+import json
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'mcp'))
+os.environ['MANAGER_AI_BASE_DIR'] = tempfile.mkdtemp(prefix='manager-ai-tests-')
+os.environ.pop('MANAGER_AI_WATCH', None)
+os.environ.pop('MANAGER_AI_WORKSPACES', None)
+
+import server  # noqa: E402
+
+
+def render(metadata: dict, body: str = 'Body text.\n') -> str:
+    """A task file with the given frontmatter"""
+    return server.render_task_file(metadata, body)
+
+
+class Vault:
+    """A workspace directory registered with the server for one test"""
+
+    def __init__(self, base_dir: Path):
+        self.name = f"test-{uuid.uuid4().hex[:8]}"
+        self.base_dir = base_dir
+        self.tasks_dir = base_dir / 'Tasks'
+        self.tasks_dir.mkdir(parents=True, exist_ok=True)
+        server.WORKSPACES.paths[self.name] = base_dir
+
+    def call(self, tool: str, **arguments):
+        """Call a tool in this workspace and decode its JSON reply"""
+        response = server.call_tool(tool, dict(arguments, workspace=self.name))
+        text = response[0].text
+        return json.loads(text) if text.startswith('{') else text
+
+    @property
+    def workspace(self) -> 'server.Workspace':
+        with server.WORKSPACES.use(self.name) as ws:
+            return ws
+
+    def write_task(self, filename: str, mtime: float = None, body: str = 'Body text.\n', **metadata) -> Path:
+        metadata.setdefault('title', filename[:-3])
+        path = self.tasks_dir / filename
+        path.write_text(render(metadata, body))
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def reopen(self) -> None:
+        """Close the workspace (saving its snapshot); the next call opens it again"""
+        server.WORKSPACES.close(self.name)
+
+    def close(self) -> None:
+        server.WORKSPACES.close(self.name)
+        server.WORKSPACES.paths.pop(self.name, None)
+
+
+@pytest.fixture
+def vault(tmp_path):
+    vault = Vault(tmp_path)
+    yield vault
+    vault.close()
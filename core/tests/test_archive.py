@@ -0,0 +1,63 @@
+import time
+
+import server
+
+OLD = time.time() - 90 * 86400
+
+
+def test_archive_search_and_restore(vault):
+    vault.write_task('old.md', mtime=OLD, status='d', category='admin', title='Renew the domain')
+    vault.write_task('recent.md', status='d')
+    vault.write_task('open.md', mtime=OLD, status='n')
+    original = (vault.tasks_dir / 'old.md').read_bytes()
+
+    archived = vault.call('prune_completed_tasks', days=30, mode='archive')
+    assert archived['archived_files'] == ['old.md']
+    assert not (vault.tasks_dir / 'old.md').exists()
+    assert (vault.tasks_dir / 'recent.md').exists() and (vault.tasks_dir / 'open.md').exists()
+
+    found = vault.call('search_archive', query='domain', include_content=True)
+    assert [r['filename'] for r in found['results']] == ['old.md']
+    assert found['results'][0]['content'] == original.decode()
+    assert vault.call('search_archive', category='other')['total_matches'] == 0
+
+    restored = vault.call('restore_task', task_file='old')
+    assert restored['success'] and restored['task_file'] == 'old.md'
+    assert (vault.tasks_dir / 'old.md').read_bytes() == original
+    assert 'old.md' in [t['filename'] for t in vault.call('list_tasks', include_done=True)['tasks']]
+
+
+def test_restore_does_not_overwrite_by_default(vault):
+    vault.write_task('old.md', mtime=OLD, status='d')
+    vault.call('prune_completed_tasks', days=30, mode='archive')
+    vault.write_task('old.md', status='n', body='Recreated since.\n')
+
+    assert not vault.call('restore_task', task_file='old.md')['success']
+    assert 'Recreated since.' in (vault.tasks_dir / 'old.md').read_text()
+    assert vault.call('restore_task', task_file='old.md', overwrite=True)['success']
+    assert 'Recreated since.' not in (vault.tasks_dir / 'old.md').read_text()
+
+
+def test_archive_survives_reopen(vault):
+    vault.write_task('old.md', mtime=OLD, status='d', title='Quarterly report')
+    vault.call('prune_completed_tasks', days=30, mode='archive')
+    vault.reopen()
+    assert vault.call('search_archive', query='quarterly')['total_matches'] == 1
+    assert vault.call('restore_task', task_file='missing.md')['success'] is False
+
+
+def test_archived_tasks_leave_the_index_while_validating(vault, monkeypatch):
+    vault.write_task('a.md', mtime=OLD, status='d')
+    vault.write_task('b.md', mtime=OLD, status='d')
+    vault.write_task('c.md', status='n')
+    assert vault.call('list_tasks', include_done=True)['count'] == 3
+    vault.reopen()
+    # Keep the snapshot-loaded index in its validation window (no stat passes)
+    monkeypatch.setattr(server.TaskIndex, 'validate_in_background', lambda self: None)
+    assert vault.workspace.task_index.validating
+
+    archived = vault.call('prune_completed_tasks', days=30, mode='archive')
+    assert sorted(archived['archived_files']) == ['a.md', 'b.md']
+    listed = vault.call('list_tasks', include_done=True)
+    assert [t['filename'] for t in listed['tasks']] == ['c.md']
+    assert vault.call('get_task_summary')['total_tasks'] == 1
@@ -0,0 +1,60 @@
+def append(vault, text):
+    with open(vault.base_dir / 'BACKLOG.md', 'a') as f:
+        f.write(text)
+
+
+def incremental(vault):
+    return vault.call('process_backlog', incremental=True)
+
+
+def test_only_items_after_the_checkpoint_are_returned(vault):
+    append(vault, '# Backlog\n- first\n- second\n')
+    batch = incremental(vault)
+    assert [item['text'] for item in batch['parsed_items']] == ['first', 'second']
+
+    ack = vault.call('acknowledge_backlog', offset=batch['next_offset'])
+    assert ack['success'] and ack['pending_bytes'] == 0
+    assert incremental(vault)['parsed_items'] == []
+
+    append(vault, '- third\n')
+    assert [item['text'] for item in incremental(vault)['parsed_items']] == ['third']
+
+
+def test_partial_acknowledgement_resumes_mid_batch(vault):
+    append(vault, '- one\n- two\n- three\n')
+    items = incremental(vault)['parsed_items']
+    assert vault.call('acknowledge_backlog', offset=items[0]['end_offset'])['success']
+
+    # A restarted server picks up where the checkpoint left off
+    vault.reopen()
+    assert [item['text'] for item in incremental(vault)['parsed_items']] == ['two', 'three']
+
+
+def test_subitems_appended_under_an_acknowledged_item(vault):
+    append(vault, '- plan trip\n')
+    batch = incremental(vault)
+    vault.call('acknowledge_backlog', offset=batch['next_offset'])
+
+    append(vault, '  - book hotel\n- call mom\n')
+    items = incremental(vault)['parsed_items']
+    assert items[0]['text'] == 'plan trip' and items[0]['subitems'] == ['book hotel']
+    assert items[0].get('continued')
+    assert items[1]['text'] == 'call mom'
+
+
+def test_invalid_offsets_rejected(vault):
+    append(vault, '- one\n- two\n')
+    batch = incremental(vault)
+    assert not vault.call('acknowledge_backlog', offset=3)['success']
+    vault.call('acknowledge_backlog', offset=batch['parsed_items'][1]['offset'])
+    assert not vault.call('acknowledge_backlog', offset=0)['success']
+
+
+def test_rewritten_backlog_resets_the_checkpoint(vault):
+    append(vault, '- one\n- two\n')
+    vault.call('acknowledge_backlog', offset=incremental(vault)['next_offset'])
+
+    (vault.base_dir / 'BACKLOG.md').write_text('- fresh start\n- another\n')
+    batch = incremental(vault)
+    assert batch['checkpoint_reset']
+    assert [item['text'] for item in batch['parsed_items']] == ['fresh start', 'another']
@@ -0,0 +1,101 @@
+import random
+import sys
+
+import pytest
+
+import server
+
+
+def test_repeated_items_clustered_and_reported_when_auto_created(vault):
+    items = [
+        'Renew the company domain registration',
+        'renew the  company domain registration',
+        'Renew company domain registration before it lapses in March',
+        'Book dentist appointment for next week',
+    ]
+    result = vault.call('process_backlog_with_dedup', items=items, auto_create=True)
+
+    assert result['summary']['batch_duplicates'] == len(items) - len(result['new_tasks'])
+    created = set(result['auto_created'])
+    assert len(created) == len(result['new_tasks'])
+    reviewed = {entry['item'] for entry in result['needs_review']}
+    assert items[1] in reviewed
+    # Every input is either a created task's title or listed for review
+    titles = {entry['item'] for entry in result['new_tasks']}
+    assert titles | reviewed == set(items)
+    assert all(entry['task_file'] in created for entry in result['needs_review'])
+    assert result['summary']['needs_review'] == len(result['needs_review'])
+
+
+def test_no_review_list_without_auto_create(vault):
+    items = ['Renew the company domain registration', 'renew the company domain registration']
+    result = vault.call('process_backlog_with_dedup', items=items)
+    assert result['needs_review'] == [] and result['auto_created'] == []
+    assert result['new_tasks'][0]['merged_items'] == [items[1]]
+
+
+def test_cluster_items_groups_exact_and_near_duplicates():
+    items = ['Call the bank about the loan', 'call the bank  about the loan',
+             'Call the bank about the car loan', 'Water the plants']
+    clusters = server.cluster_items(items, 0.6)
+    assert clusters[0][:2] == [0, 1]
+    assert [3] in clusters
+    assert sorted(i for cluster in clusters for i in cluster) == list(range(len(items)))
+
+
+def pairwise_clusters(items, threshold):
+    """Reference: union of every pair scoring at least threshold"""
+    from difflib import SequenceMatcher
+    texts = [' '.join(item.lower().split()) for item in items]
+    parent = list(range(len(items)))
+
+    def find(i):
+        while parent[i] != i:
+            i = parent[i]
+        return i
+
+    for a in range(len(items)):
+        for b in range(a + 1, len(items)):
+            ka, kb = server.extract_keywords(texts[a]), server.extract_keywords(texts[b])
+            overlap = len(ka & kb) / len(ka | kb) if ka and kb else 0
+            if SequenceMatcher(None, texts[a], texts[b]).ratio() * 0.7 + overlap * 0.3 >= threshold:
+                root_a, root_b = find(a), find(b)
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+    clusters = {}
+    for i in range(len(items)):
+        clusters.setdefault(find(i), []).append(i)
+    return sorted(clusters.values())
+
+
+MISSPELLED = ['email sarah about contract', 'emial sarh abot contrcat', 'water the plants',
+              'call bank re loan', 'cal bnak re laon', 'fix bug', 'fxi bgu', 'Email Sarah about  contract']
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_misspelled_duplicates_without_shared_keywords_cluster(numpy, monkeypatch):
+    if not numpy:
+        monkeypatch.setitem(sys.modules, 'numpy', None)
+    clusters = server.cluster_items(MISSPELLED, 0.6)
+    assert [0, 1, 7] in clusters
+    for threshold in (0.4, 0.6, 0.8):
+        assert sorted(server.cluster_items(MISSPELLED, threshold)) == pairwise_clusters(MISSPELLED, threshold)
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_clusters_match_full_pairwise_comparison(numpy, monkeypatch):
+    if not numpy:
+        monkeypatch.setitem(sys.modules, 'numpy', None)
+    rng = random.Random(11)
+    base = ['email sarah about contract', 'call bank about the loan', 'deploy api to staging', 'fix login bug',
+            'write blog post about pricing', 'schedule team meeting', 'renew domain name']
+
+    def typo(text):
+        chars = list(text)
+        for _ in range(rng.randint(0, 3)):
+            i = rng.randrange(len(chars) - 1)
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        return ''.join(chars)
+
+    items = [typo(rng.choice(base)) + rng.choice(['', ' asap', ' today', ' for q3']) for _ in range(80)]
+    for threshold in (0.5, 0.6, 0.8):
+        assert sorted(server.cluster_items(items, threshold)) == pairwise_clusters(items, threshold)
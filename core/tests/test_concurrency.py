@@ -0,0 +1,39 @@
+import threading
+
+import server
+
+
+def test_index_readers_not_blocked_by_a_scoring_batch(vault, monkeypatch):
+    vault.write_task('a.md', status='n', title='Renew the domain')
+    vault.call('process_backlog_with_dedup', items=['warm up'])
+    scoring, release = threading.Event(), threading.Event()
+    real_batch = server.DedupIndex.find_similar_batch
+
+    def held_batch(self, items, config=server.DEDUP_CONFIG):
+        scoring.set()
+        assert release.wait(10)
+        return real_batch(self, items, config)
+
+    monkeypatch.setattr(server.DedupIndex, 'find_similar_batch', held_batch)
+    results = []
+    batch = threading.Thread(target=lambda: results.append(
+        vault.call('process_backlog_with_dedup', items=['Renew the domain'])))
+    batch.start()
+    try:
+        assert scoring.wait(10)
+        # A task changes mid-batch: the index takes it without waiting
+        vault.write_task('b.md', status='n', title='Pay the phone bill')
+        done = []
+        reader = threading.Thread(target=lambda: done.append(vault.call('list_tasks')))
+        reader.start()
+        reader.join(2)
+        assert done and done[0]['count'] == 2
+    finally:
+        release.set()
+        batch.join(10)
+    assert results[0]['potential_duplicates'][0]['similar_tasks'][0]['filename'] == 'a.md'
+
+    monkeypatch.setattr(server.DedupIndex, 'find_similar_batch', real_batch)
+    # The change queued during the batch reached the dedup index afterwards
+    after = vault.call('process_backlog_with_dedup', items=['Pay the phone bill'])
+    assert after['potential_duplicates'][0]['similar_tasks'][0]['filename'] == 'b.md'
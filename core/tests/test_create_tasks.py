@@ -0,0 +1,61 @@
+import os
+
+import server
+
+
+def leftovers(vault):
+    return [p.name for p in vault.tasks_dir.rglob('.*.tmp')]
+
+
+def test_batch_created_and_indexed(vault):
+    result = vault.call('create_tasks', tasks=[
+        {'title': 'Send invoice', 'priority': 'P1', 'estimated_time': 15},
+        {'title': 'Write blog post', 'category': 'content', 'due_date': '2030-01-02'},
+    ])
+    assert result['success'] and result['created'] == 2
+    assert [r['filename'] for r in result['results']] == ['Send invoice.md', 'Write blog post.md']
+    tasks = {t['filename']: t for t in vault.call('list_tasks')['tasks']}
+    assert tasks['Send invoice.md']['priority'] == 'P1'
+    assert tasks['Write blog post.md']['category'] == 'content'
+    assert leftovers(vault) == []
+
+
+def test_invalid_specs_reported_per_item(vault):
+    result = vault.call('create_tasks', tasks=[
+        {'title': 'Good one'},
+        {'title': ''},
+        {'title': 'Bad priority', 'priority': 'P9'},
+        {'title': 'Bad estimate', 'estimated_time': 0},
+        {'title': 'Good one'},
+    ])
+    assert not result['success'] and (result['created'], result['failed']) == (1, 4)
+    errors = [r.get('error', '') for r in result['results']]
+    assert errors[0] == '' and 'Missing title' in errors[1]
+    assert 'priority' in errors[2] and 'estimated_time' in errors[3] and 'Duplicate' in errors[4]
+
+
+def test_existing_files_kept_unless_overwrite(vault):
+    vault.write_task('Send invoice.md', status='s', body='Mine.\n')
+    result = vault.call('create_tasks', tasks=[{'title': 'Send invoice'}, {'title': 'Other'}])
+    assert result['created'] == 1 and 'already exists' in result['results'][0]['error']
+    assert 'Mine.' in (vault.tasks_dir / 'Send invoice.md').read_text()
+
+    assert vault.call('create_tasks', tasks=[{'title': 'Send invoice'}], overwrite=True)['success']
+    assert 'Mine.' not in (vault.tasks_dir / 'Send invoice.md').read_text()
+
+
+def test_failed_rename_leaves_no_partial_files(vault, monkeypatch):
+    real_replace = os.replace
+
+    def failing_replace(src, dst):
+        if str(dst).endswith('Second.md'):
+            raise OSError('disk full')
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(server.os, 'replace', failing_replace)
+    result = vault.call('create_tasks', tasks=[{'title': 'First'}, {'title': 'Second'}, {'title': 'Third'}])
+    assert [r['success'] for r in result['results']] == [True, False, True]
+    assert 'disk full' in result['results'][1]['error']
+    assert not (vault.tasks_dir / 'Second.md').exists()
+    assert leftovers(vault) == []
+    assert sorted(t['filename'] for t in vault.call('list_tasks')['tasks']) == ['First.md', 'Third.md']
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+import server
+
+WORDS = ['invoice', 'client', 'deploy', 'api', 'review', 'draft', 'blog', 'post', 'call',
+         'bank', 'loan', 'schedule', 'meeting', 'update', 'website', 'fix', 'bug', 'login']
+
+
+def corpus(seed: int, size: int):
+    rng = random.Random(seed)
+    tasks = []
+    for i in range(size):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 6)))
+        if i % 7 == 0:
+            title = title.title()
+        tasks.append({'title': title, 'filename': f'{i}.md', 'category': 'other',
+                      'status': 'd' if i % 11 == 0 else 'n'})
+    items = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 6))) for _ in range(25)]
+    # Exact and near copies of indexed titles
+    items += [tasks[i]['title'] for i in range(0, size, 17)]
+    items += [tasks[i]['title'] + ' today' for i in range(3, size, 19)]
+    return tasks, items
+
+
+def build_index(tasks):
+    dedup = server.DedupIndex()
+    for seq, task in enumerate(tasks):
+        dedup.add(seq, task)
+    return dedup
+
+
+@pytest.mark.parametrize('threshold', [0.3, 0.6, 0.85])
+def test_batch_matches_linear_scan(threshold):
+    tasks, items = corpus(threshold * 100, 150)
+    config = dict(server.DEDUP_CONFIG, similarity_threshold=threshold)
+    expected = [server.find_similar_tasks(item, tasks, config) for item in items]
+    assert build_index(tasks).find_similar_batch(items, config) == expected
+
+
+def test_batch_split_across_worker_processes(monkeypatch):
+    tasks, items = corpus(3, 60)
+    config = server.DEDUP_CONFIG
+    dedup = build_index(tasks)
+    expected = dedup.find_similar_batch(items, config)
+    # Small enough that the batch is scored in several chunks
+    monkeypatch.setattr(server, 'BATCH_MATRIX_BUDGET', len(dedup) * server.BATCH_BYTES_PER_CELL * 10)
+    assert dedup.find_similar_batch(items, config) == expected
+
+
+@pytest.mark.parametrize('threshold', [0.3, 0.6, 0.85])
+def test_indexed_matches_linear_scan(threshold):
+    tasks, items = corpus(threshold * 100, 150)
+    config = dict(server.DEDUP_CONFIG, similarity_threshold=threshold)
+    dedup = build_index(tasks)
+    expected = [server.find_similar_tasks(item, tasks, config) for item in items]
+
+    assert [dedup.find_similar(item, config) for item in items] == expected
+
+
+def test_index_follows_updates_and_removals():
+    tasks, items = corpus(7, 120)
+    dedup = build_index(tasks)
+    for seq in range(0, 120, 5):
+        tasks[seq] = dict(tasks[seq], title=tasks[seq]['title'][::-1])
+        dedup.add(seq, tasks[seq])
+    for seq in range(1, 120, 9):
+        dedup.remove(seq)
+    remaining = [task for seq, task in enumerate(tasks) if seq % 9 != 1]
+
+    config = server.DEDUP_CONFIG
+    expected = [server.find_similar_tasks(item, remaining, config) for item in items]
+    assert [dedup.find_similar(item, config) for item in items] == expected
+    assert dedup.find_similar_batch(items, config) == expected
@@ -0,0 +1,66 @@
+import server
+
+TASK = (b'---\n'
+        b'title: Ship it   # keep this comment\n'
+        b'priority: P2\n'
+        b'status: n\n'
+        b'tags:\n'
+        b'- a\n'
+        b'- b\n'
+        b'---\n'
+        b'\n# Ship it\n\nBody with --- and status: n inside.\n')
+
+
+def test_patch_rewrites_only_the_updated_lines():
+    patched = server.patch_frontmatter(TASK, {'status': 'd', 'tags': ['c']})
+    assert patched == TASK.replace(b'status: n\n', b'status: d\n', 1).replace(b'- a\n- b\n', b'- c\n')
+
+
+def test_patch_adds_missing_keys_and_frontmatter():
+    assert server.patch_frontmatter(TASK, {'estimated_time': 45}) == TASK.replace(b'- b\n---', b'- b\nestimated_time: 45\n---')
+    assert server.patch_frontmatter(b'Just a body.\n', {'status': 's'}) == b'---\nstatus: s\n---\nJust a body.\n'
+
+
+def test_patch_keeps_crlf_line_endings():
+    crlf = TASK.replace(b'\n', b'\r\n')
+    patched = server.patch_frontmatter(crlf, {'priority': 'P0'})
+    assert patched == crlf.replace(b'priority: P2\r\n', b'priority: P0\r\n')
+
+
+def test_bulk_update_by_filter_touches_only_frontmatter(vault):
+    (vault.tasks_dir / 'a.md').write_bytes(TASK)
+    vault.write_task('b.md', status='n', priority='P3')
+    vault.write_task('c.md', status='s', priority='P2')
+
+    result = vault.call('bulk_update_tasks', filter={'status': 'n'}, updates={'priority': 'P1'})
+    assert result['success'] and sorted(result['updated_files']) == ['a.md', 'b.md']
+    assert (vault.tasks_dir / 'a.md').read_bytes() == TASK.replace(b'priority: P2', b'priority: P1')
+    priorities = {t['filename']: t['priority'] for t in vault.call('list_tasks')['tasks']}
+    assert priorities == {'a.md': 'P1', 'b.md': 'P1', 'c.md': 'P2'}
+
+
+def test_bulk_update_validation(vault):
+    vault.write_task('a.md', status='n')
+    assert not vault.call('bulk_update_tasks', task_files=['a'], updates={'status': 'x'})['success']
+    assert not vault.call('bulk_update_tasks', task_files=['a'], updates={'filename': 'b.md'})['success']
+    missing = vault.call('bulk_update_tasks', task_files=['a', 'nope'], updates={'status': 's'})
+    assert missing['updated_files'] == ['a.md'] and 'nope.md' in missing['failed']
+
+
+def test_concurrent_edit_is_reported_as_conflict(vault, monkeypatch):
+    vault.write_task('a.md', status='n')
+    vault.write_task('b.md', status='n')
+    real_patch = server.patch_frontmatter
+
+    def patch_while_edited(data, updates):
+        # Another program saves a.md after it was read
+        if b'title: a\n' in data:
+            (vault.tasks_dir / 'a.md').write_text(server.render_task_file({'title': 'a', 'status': 'b'}, 'Edited.\n'))
+        return real_patch(data, updates)
+
+    monkeypatch.setattr(server, 'patch_frontmatter', patch_while_edited)
+    result = vault.call('bulk_update_tasks', task_files=['a.md', 'b.md'], updates={'status': 'd'})
+    assert result['updated_files'] == ['b.md']
+    assert 'changed while updating' in result['failed']['a.md']
+    assert 'Edited.' in (vault.tasks_dir / 'a.md').read_text()
+    assert list(vault.tasks_dir.glob('.*.tmp')) == []
@@ -0,0 +1,124 @@
+import os
+import time
+
+import pytest
+
+import server
+
+
+def relpaths(vault):
+    return sorted(p.relative_to(vault.tasks_dir).as_posix() for p in vault.tasks_dir.rglob('*.md'))
+
+
+def test_migrate_to_hash_and_back(vault):
+    for i in range(5):
+        vault.write_task(f'task-{i}.md', status='n')
+    assert vault.call('list_tasks')['count'] == 5
+
+    result = server.migrate_task_layout(vault.tasks_dir, 'hash')
+    assert result['moved'] == 5 and result['complete']
+    layout = server.TaskLayout.load(vault.tasks_dir)
+    assert (layout.kind, layout.migrating) == ('hash', False)
+    assert relpaths(vault) == sorted(layout.relpath(f'task-{i}.md') for i in range(5))
+
+    assert vault.call('list_tasks')['count'] == 5
+    assert vault.call('update_task_status', task_file='task-3.md', status='s')['success']
+    assert vault.call('list_tasks', status='s')['tasks'][0]['filename'] == 'task-3.md'
+
+    result = server.migrate_task_layout(vault.tasks_dir, 'flat')
+    assert result['moved'] == 5 and result['complete']
+    assert relpaths(vault) == [f'task-{i}.md' for i in range(5)]
+    assert not (vault.tasks_dir / server.TASK_LAYOUT_FILE).exists()
+    assert vault.call('list_tasks')['count'] == 5
+
+
+def test_interrupted_migration_resumes(vault):
+    for i in range(4):
+        vault.write_task(f'task-{i}.md', status='n')
+    target = server.TaskLayout('hash', migrating=True)
+    target.save(vault.tasks_dir)
+    moved = vault.tasks_dir / target.relpath('task-0.md')
+    moved.parent.mkdir()
+    os.rename(vault.tasks_dir / 'task-0.md', moved)
+
+    # Mid-migration, files in either place are served
+    assert vault.call('list_tasks')['count'] == 4
+
+    result = server.migrate_task_layout(vault.tasks_dir, 'hash')
+    assert (result['moved'], result['already_in_place'], result['complete']) == (3, 1, True)
+    assert not server.TaskLayout.load(vault.tasks_dir).migrating
+
+
+def test_conflicting_copy_keeps_migration_open(vault):
+    vault.write_task('dup.md', status='n')
+    target = server.TaskLayout('hash')
+    sharded = vault.tasks_dir / target.relpath('dup.md')
+    sharded.parent.mkdir()
+    sharded.write_text(server.render_task_file({'title': 'dup'}, 'Other copy.\n'))
+
+    result = server.migrate_task_layout(vault.tasks_dir, 'hash')
+    assert result['conflicts'] == ['dup.md'] and not result['complete']
+    assert server.TaskLayout.load(vault.tasks_dir).migrating
+
+
+def test_bulk_update_locks_files_in_path_order(vault, monkeypatch):
+    layout = server.TaskLayout('hash')
+    # A sharded file whose path sorts before a flat one it follows by name
+    late = next(f'z-{i}.md' for i in range(100) if layout.shard(f'z-{i}.md')[0].isdigit())
+    vault.write_task('a.md', status='n')
+    server.TaskLayout('hash', migrating=True).save(vault.tasks_dir)
+    assert vault.call('create_task', title=late[:-3], content='Body')['success']
+    assert (vault.tasks_dir / layout.relpath(late)).exists()
+
+    acquired = []
+    original = server.file_lock
+
+    def recording_lock(filepath):
+        acquired.append(os.path.abspath(filepath))
+        return original(filepath)
+
+    monkeypatch.setattr(server, 'file_lock', recording_lock)
+    result = vault.call('bulk_update_tasks', task_files=['a.md', late], updates={'priority': 'P1'})
+    assert result['updated'] == 2
+    assert acquired == sorted(acquired)
+    assert acquired[0].endswith(layout.relpath(late))
+
+
+def write_in(vault, subdir, filename):
+    (vault.tasks_dir / subdir).mkdir(exist_ok=True)
+    (vault.tasks_dir / subdir / filename).write_text(server.render_task_file({'title': filename[:-3], 'status': 'n'}, ''))
+
+
+@pytest.mark.parametrize('kind', ['flat', 'hash'])
+def test_non_shard_subdirectories_are_not_tasks(vault, kind):
+    server.TaskLayout(kind).save(vault.tasks_dir)
+    vault.write_task('a.md', status='n')
+    write_in(vault, 'templates', 'tmpl.md')
+    # Shard-like names only count under the hash layout
+    write_in(vault, 'ab', 'sharded.md')
+    expected = ['a.md', 'sharded.md'] if kind == 'hash' else ['a.md']
+    assert sorted(t['filename'] for t in vault.call('list_tasks')['tasks']) == expected
+
+    server.migrate_task_layout(vault.tasks_dir, 'hash' if kind == 'flat' else 'flat')
+    assert (vault.tasks_dir / 'templates' / 'tmpl.md').exists()
+
+
+@pytest.mark.parametrize('mode', ['auto', 'poll'])
+def test_watcher_ignores_non_shard_subdirectories(vault, mode):
+    vault.write_task('a.md', status='n')
+    index = server.TaskIndex(vault.tasks_dir)
+    watcher = server.TaskWatcher(index, server.BacklogFile(vault.base_dir / 'BACKLOG.md', vault.base_dir / '.cache'),
+                                 mode=mode, interval=0.05)
+    watcher.start()
+    try:
+        write_in(vault, 'templates', 'tmpl.md')
+        time.sleep(0.1)
+        write_in(vault, 'templates', 'other.md')
+        vault.write_task('b.md', status='n')
+        deadline = time.monotonic() + 5
+        while 'b.md' not in [t['filename'] for t in index.tasks()] and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert sorted(t['filename'] for t in index.tasks()) == ['a.md', 'b.md']
+        assert all(path.name != 'templates' for path in watcher._wds.values())
+    finally:
+        watcher.stop()
@@ -0,0 +1,79 @@
+import json
+
+import server
+
+
+def page_through(vault, **arguments):
+    pages, cursor = [], None
+    while True:
+        page = vault.call('list_tasks', fields='priority', cursor=cursor, **arguments)
+        pages.append([t['filename'] for t in page['tasks']])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_task_once_in_sort_order(vault):
+    for i in range(10):
+        vault.write_task(f't{i}.md', status='n', priority=f'P{i % 4}')
+    pages = page_through(vault, limit=3, sort_by='priority')
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    names = [name for page in pages for name in page]
+    assert sorted(names) == sorted(f't{i}.md' for i in range(10))
+    assert names == sorted(names, key=lambda n: (int(n[1:-3]) % 4, n))
+
+
+def test_cursor_is_stable_across_inserts_and_deletes(vault):
+    for i in range(6):
+        vault.write_task(f't{i}.md', status='n')
+    first = vault.call('list_tasks', limit=3)
+    assert [t['filename'] for t in first['tasks']] == ['t0.md', 't1.md', 't2.md']
+
+    (vault.tasks_dir / 't1.md').unlink()
+    vault.write_task('t0a.md', status='n')
+    second = vault.call('list_tasks', limit=3, cursor=first['next_cursor'])
+    assert [t['filename'] for t in second['tasks']] == ['t3.md', 't4.md', 't5.md']
+    assert second['next_cursor'] is None
+
+
+def test_descending_reverses_ascending(vault):
+    vault.write_task('a.md', status='n', estimated_time=30)
+    vault.write_task('b.md', status='n', estimated_time=90)
+    vault.write_task('c.md', status='n')
+    asc = vault.call('list_tasks', sort_by='estimated_time')
+    desc = vault.call('list_tasks', sort_by='estimated_time', sort_order='desc')
+    # Tasks without the field sort after the others
+    assert [t['filename'] for t in asc['tasks']] == ['a.md', 'b.md', 'c.md']
+    assert [t['filename'] for t in desc['tasks']] == ['c.md', 'b.md', 'a.md']
+
+
+def test_cursor_rejected_for_another_sort(vault):
+    for i in range(3):
+        vault.write_task(f't{i}.md', status='n')
+    cursor = vault.call('list_tasks', limit=1)['next_cursor']
+    assert 'error' in vault.call('list_tasks', limit=1, cursor=cursor, sort_by='priority')
+    assert 'error' in vault.call('list_tasks', limit=1, cursor='not-a-cursor')
+
+
+def test_projection_and_compact_output(vault):
+    vault.write_task('a.md', status='n', priority='P1', body='Long body.\n')
+    response = server.call_tool('list_tasks', {'workspace': vault.name, 'fields': 'title,priority', 'compact': True})
+    text = response[0].text
+    assert '\n' not in text
+    assert json.loads(text)['tasks'] == [{'filename': 'a.md', 'title': 'a', 'priority': 'P1'}]
+
+
+def test_invalid_limit_is_rejected(vault):
+    for i in range(3):
+        vault.write_task(f't{i}.md', status='n')
+    for limit in (0, -1, 1.5, '2', True):
+        assert vault.call('list_tasks', limit=limit)['error'].startswith('Invalid limit')
+
+
+def test_limit_is_clamped(vault, monkeypatch):
+    monkeypatch.setattr(server, 'LIST_TASKS_MAX_LIMIT', 2)
+    for i in range(3):
+        vault.write_task(f't{i}.md', status='n')
+    page = vault.call('list_tasks', limit=100)
+    assert [t['filename'] for t in page['tasks']] == ['t0.md', 't1.md']
+    assert page['next_cursor'] is not None
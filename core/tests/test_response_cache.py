@@ -0,0 +1,48 @@
+import server
+
+
+def test_unchanged_corpus_served_from_cache(vault):
+    vault.write_task('a.md', status='n')
+    first = vault.call('list_tasks')
+    assert vault.call('list_tasks', if_generation=first['generation']) == {
+        'unchanged': True, 'generation': first['generation']}
+
+    vault.call('update_task_status', task_file='a.md', status='s')
+    second = vault.call('list_tasks', if_generation=first['generation'])
+    assert second['generation'] != first['generation']
+    assert second['tasks'][0]['status'] == 's'
+
+
+def later_clock(monkeypatch):
+    class Later(server.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return server.datetime(2030, 1, 1, 18, 30)
+
+    monkeypatch.setattr(server, 'datetime', Later)
+
+
+def test_cached_system_status_refreshes_time_fields(vault, monkeypatch):
+    vault.write_task('a.md', status='n')
+    first = vault.call('get_system_status')
+    calls = []
+    monkeypatch.setattr(server.TaskIndex, 'summary', lambda self: calls.append(1))
+    later_clock(monkeypatch)
+
+    cached = vault.call('get_system_status')
+    assert calls == []
+    assert cached['generation'] == first['generation']
+    assert cached['total_active_tasks'] == first['total_active_tasks'] == 1
+    assert cached['timestamp'] == '2030-01-01T18:30:00'
+    assert cached['time_insights'] == ['End of day - quick admin tasks']
+
+
+def test_unchanged_system_status_still_carries_time_fields(vault, monkeypatch):
+    vault.write_task('a.md', status='n')
+    first = vault.call('get_system_status')
+    later_clock(monkeypatch)
+
+    unchanged = vault.call('get_system_status', if_generation=first['generation'])
+    assert unchanged == {'unchanged': True, 'generation': first['generation'],
+                         'timestamp': '2030-01-01T18:30:00',
+                         'time_insights': ['End of day - quick admin tasks']}
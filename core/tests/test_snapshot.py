@@ -0,0 +1,48 @@
+import server
+
+
+def open_from_snapshot(vault, monkeypatch):
+    """Reopen the vault from its snapshot and keep it in the validation window"""
+    assert vault.call('list_tasks')['count'] > 0
+    vault.reopen()
+    monkeypatch.setattr(server.TaskIndex, 'validate_in_background', lambda self: None)
+    index = vault.workspace.task_index
+    assert index.validating
+    return index
+
+
+def test_snapshot_serves_tasks_until_validated(vault, monkeypatch):
+    vault.write_task('a.md', status='n')
+    vault.write_task('b.md', status='n')
+    index = open_from_snapshot(vault, monkeypatch)
+
+    (vault.tasks_dir / 'b.md').unlink()
+    assert sorted(t['filename'] for t in vault.call('list_tasks')['tasks']) == ['a.md', 'b.md']
+
+    index.validate()
+    assert not index.validating
+    assert [t['filename'] for t in vault.call('list_tasks')['tasks']] == ['a.md']
+
+
+def test_writes_during_validation_are_visible(vault, monkeypatch):
+    vault.write_task('a.md', status='n')
+    vault.write_task('b.md', status='n')
+    open_from_snapshot(vault, monkeypatch)
+
+    assert vault.call('update_task_status', task_file='a.md', status='d')['success']
+    assert vault.call('list_tasks', status='d', include_done=True)['count'] == 1
+
+    pruned = vault.call('prune_completed_tasks', days=-1)
+    assert pruned['deleted_files'] == ['a.md']
+    assert not (vault.tasks_dir / 'a.md').exists()
+    assert [t['filename'] for t in vault.call('list_tasks')['tasks']] == ['b.md']
+
+
+def test_new_file_created_during_validation_is_indexed(vault, monkeypatch):
+    vault.write_task('a.md', status='n')
+    open_from_snapshot(vault, monkeypatch)
+
+    created = vault.call('create_task', title='New task', content='Body')
+    assert created['success']
+    titles = [t['title'] for t in vault.call('list_tasks')['tasks']]
+    assert 'New task' in titles
@@ -0,0 +1,38 @@
+import pickle
+from datetime import date
+
+import server
+
+
+def test_records_share_values_within_one_index(vault):
+    for i in range(3):
+        vault.write_task(f't{i}.md', status='n', due_date=date(2030, 1, 2), tags=['home', 'errand'])
+    records = sorted(vault.workspace.task_index.tasks(), key=lambda t: t['filename'])
+    assert records[0]['due_date'] is records[1]['due_date'] is records[2]['due_date']
+    assert records[0]['tags'] is records[1]['tags']
+    assert records[0].to_dict()['tags'] == ('home', 'errand')
+
+
+def test_shared_table_belongs_to_the_index(tmp_path):
+    first = server.TaskIndex(tmp_path / 'a')
+    second = server.TaskIndex(tmp_path / 'b')
+    a = first._record({'title': 'x', 'due_date': date(2030, 1, 2)}, 'x.md')
+    b = second._record({'title': 'x', 'due_date': date(2030, 1, 2)}, 'x.md')
+    assert a['due_date'] is not b['due_date']
+    assert first._shared and first._shared is not second._shared
+
+
+def test_shared_table_is_bounded(tmp_path):
+    index = server.TaskIndex(tmp_path)
+    for day in range(1, 29):
+        for month in range(1, 13):
+            for year in (2030, 2031, 2032, 2033):
+                index._record({'due_date': date(year, month, day)}, 'x.md')
+    assert len(index._shared) <= 2 * len(index._tasks) + 1025
+
+
+def test_records_pickle_without_the_table():
+    record = server.TaskRecord({'title': 'x', 'tags': ['a'], 'priority': 'P1', 'owner': 'sam'}, 'x.md', {})
+    copy = pickle.loads(pickle.dumps(record))
+    assert copy.to_dict() == record.to_dict() == {
+        'title': 'x', 'priority': 'P1', 'tags': ('a',), 'owner': 'sam', 'filename': 'x.md'}
@@ -0,0 +1,43 @@
+import threading
+import time
+
+import server
+
+
+def test_concurrent_first_calls_open_once(vault, monkeypatch):
+    vault.write_task('a.md', status='todo')
+    opened = []
+    original = server.Workspace.open
+
+    def slow_open(self):
+        opened.append(self.name)
+        time.sleep(0.05)
+        original(self)
+
+    monkeypatch.setattr(server.Workspace, 'open', slow_open)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(vault.call('list_tasks')))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert opened == [vault.name]
+    assert all('a.md' in str(result) for result in results)
+
+
+def test_idle_workspace_evicted_over_budget_and_reopened(vault, monkeypatch):
+    vault.write_task('a.md', status='todo')
+    monkeypatch.setattr(server.WORKSPACES, 'memory_budget', 0)
+    assert 'a.md' in str(vault.call('list_tasks'))
+    assert vault.name not in server.WORKSPACES._open
+
+    monkeypatch.setattr(server.WORKSPACES, 'memory_budget', 1 << 30)
+    vault.write_task('b.md', status='todo')
+    # Reopened from its snapshot; wait for the background re-check
+    index = vault.workspace.task_index
+    deadline = time.monotonic() + 5
+    while index.validating and time.monotonic() < deadline:
+        time.sleep(0.01)
+    listing = str(vault.call('list_tasks'))
+    assert 'a.md' in listing and 'b.md' in listing